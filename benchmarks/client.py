@@ -0,0 +1,107 @@
+"""
+Pipelining benchmark for the `robotd.client` library.
+
+Runs a fake board in a real `BoardRunner` and sends it the same number of
+commands through one pooled `Client` connection at each pipeline depth: with
+a depth of 1 each command waits for the previous reply, while deeper
+pipelines keep that many commands in flight.
+
+Usage::
+
+    python -m benchmarks.client --commands 2000 --depths 1,4,16 --serial-delay 0.001
+"""
+
+import argparse
+import asyncio
+import time
+
+from robotd.client import Client
+
+from .fakes import FAKE_BOARDS, make_fake_board
+from .harness import emit, running_board, summarise
+
+
+async def _bench_depth(client, board, command, commands, depth):
+    connection = await client.connection(board)
+    latencies = []
+
+    async def timed_request():
+        start = time.perf_counter()
+        await connection.request(command)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for _ in range(commands // depth):
+        await asyncio.gather(*[timed_request() for _ in range(depth)])
+    return summarise(latencies, time.perf_counter() - start)
+
+
+def bench_board(board_type_id, commands, depths, delays):
+    """Benchmark one board type at each pipeline depth."""
+    board = make_fake_board(board_type_id, delays)
+    _, _, command = FAKE_BOARDS[board_type_id]
+
+    with running_board(board) as socket_path:
+        loop = asyncio.new_event_loop()
+        try:
+            client = Client(socket_path.parent.parent, loop=loop)
+            name = '{}/{}'.format(socket_path.parent.name, socket_path.name)
+            results = {
+                str(depth): loop.run_until_complete(
+                    _bench_depth(client, name, command, commands, depth),
+                )
+                for depth in depths
+            }
+            loop.run_until_complete(client.close())
+        finally:
+            loop.close()
+    return results
+
+
+def main(args=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument(
+        '--boards',
+        default='motor',
+        help='comma-separated board types to run (default: motor)',
+    )
+    parser.add_argument(
+        '--commands',
+        type=int,
+        default=2000,
+        help='commands sent at each depth',
+    )
+    parser.add_argument(
+        '--depths',
+        default='1,4,16',
+        help='comma-separated pipeline depths (default: 1,4,16)',
+    )
+    parser.add_argument('--serial-delay', type=float, default=0)
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args(args)
+
+    depths = [int(depth) for depth in args.depths.split(',')]
+    delays = {'serial': args.serial_delay}
+
+    emit({
+        'benchmark': 'client',
+        'parameters': {
+            'commands': args.commands,
+            'depths': depths,
+            'serial_delay': args.serial_delay,
+        },
+        'boards': {
+            board_type_id: bench_board(
+                board_type_id,
+                args.commands,
+                depths,
+                delays,
+            )
+            for board_type_id in args.boards.split(',')
+        },
+    }, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Load benchmark of the real serial boards against emulated firmware.
+
+Runs `MotorBoard` and `ServoAssembly` unchanged, each in a real
+`BoardRunner`, against the pty emulators in `robotd.emulators`, and drives
+them from concurrent clients. Replies from the emulated firmware can be
+delayed, jittered and dropped, to see how the boards' throughput and retries
+hold up on a bad link.
+
+Usage::
+
+    python -m benchmarks.emulated --latency 0.001 --jitter 0.002 --drop-rate 0.01
+"""
+
+import argparse
+import collections
+
+from robotd.devices import MotorBoard, ServoAssembly
+from robotd.emulators import MotorBoardEmulator, ServoAssemblyEmulator
+
+from .harness import emit, running_board
+from .sockets import bench_socket
+
+
+class EmulatedMotorBoard(MotorBoard):
+    """A motor board which is only ever created by this benchmark."""
+
+    enabled = False
+    board_type_id = 'motor'
+
+
+class EmulatedServoAssembly(ServoAssembly):
+    """A servo assembly which is only ever created by this benchmark."""
+
+    enabled = False
+    board_type_id = 'servo_assembly'
+
+
+# Board type ID -> (board, emulator, representative command)
+EMULATED_BOARDS = collections.OrderedDict([
+    ('motor', (
+        EmulatedMotorBoard,
+        MotorBoardEmulator,
+        {'m0': 0.5, 'm1': -0.5},
+    )),
+    ('servo_assembly', (
+        EmulatedServoAssembly,
+        ServoAssemblyEmulator,
+        {'servos': {'0': 0.5}},
+    )),
+])
+
+
+def bench_board(board_type_id, clients, commands, emulator_options):
+    """Benchmark one emulated board, returning a summary dict."""
+    board_class, emulator_class, command = EMULATED_BOARDS[board_type_id]
+
+    with emulator_class(**emulator_options) as emulator:
+        board = board_class({
+            'DEVNAME': emulator.device,
+            'ID_SERIAL_SHORT': 'EMULATED',
+            'MINOR': '0',
+        })
+        with running_board(board) as socket_path:
+            result = bench_socket(socket_path, command, clients, commands)
+
+        result['replies_dropped'] = emulator.replies_dropped
+
+    return result
+
+
+def main(args=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument(
+        '--boards',
+        default=','.join(EMULATED_BOARDS.keys()),
+        help='comma-separated board types to run (default: all)',
+    )
+    parser.add_argument('--clients', type=int, default=4)
+    parser.add_argument(
+        '--commands',
+        type=int,
+        default=100,
+        help='commands sent by each client',
+    )
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--drop-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args(args)
+
+    emulator_options = {
+        'latency': args.latency,
+        'jitter': args.jitter,
+        'drop_rate': args.drop_rate,
+        'seed': args.seed,
+    }
+
+    emit({
+        'benchmark': 'emulated',
+        'parameters': {
+            'clients': args.clients,
+            'commands_per_client': args.commands,
+            'emulator': emulator_options,
+        },
+        'boards': {
+            board_type_id: bench_board(
+                board_type_id,
+                args.clients,
+                args.commands,
+                emulator_options,
+            )
+            for board_type_id in args.boards.split(',')
+        },
+    }, args.output)
+
+
+if __name__ == '__main__':
+    main()
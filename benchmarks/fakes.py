@@ -0,0 +1,383 @@
+"""
+Fake boards for benchmarking.
+
+Each fake is the real board class with its hardware connection swapped for an
+in-process stand-in which sleeps for a configurable time on each I/O call, so
+that the benchmarks exercise the real command handling code without needing
+any hardware attached.
+"""
+
+import collections
+import collections.abc
+import random
+import re
+import time
+
+from robotd.devices import GameState, MotorBoard, PowerBoard, ServoAssembly
+from robotd.devices_base import Board
+
+
+class FakeSerial:
+    """A serial port which swallows writes."""
+
+    def __init__(self, delay=0):
+        self.delay = delay
+        self.written = bytearray()
+        # Read timeout, as on `serial.Serial`; reads never wait for it
+        self.timeout = None
+
+    def _wait(self):
+        if self.delay:
+            time.sleep(self.delay)
+
+    def write(self, data):
+        self._wait()
+        self.written += data
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def reset_input_buffer(self):
+        pass
+
+
+class FakeServoSerial(FakeSerial):
+    """A serial port which speaks the servo assembly line protocol."""
+
+    COMMAND_REGEX = re.compile(rb'@(\d+) (\S+)(.*)')
+
+    RESULTS = {
+        b'V': [b'fake-servo-assembly'],
+        b'R': [b'0'],
+        b'A': [b'a0 512', b'a1 512', b'a2 512', b'a3 512'],
+        b'U': [b'1000'],
+    }
+
+    def __init__(self, delay=0):
+        super().__init__(delay)
+        self.lines = collections.deque()
+
+    def write(self, data):
+        super().write(data)
+
+        while b'\n' in self.written:
+            line, _, rest = bytes(self.written).partition(b'\n')
+            self.written = bytearray(rest)
+            self._respond(line.lstrip(b'\0'))
+
+        return len(data)
+
+    def _respond(self, line):
+        match = self.COMMAND_REGEX.match(line)
+        if match is None:
+            return
+
+        prefix = b'@' + match.group(1) + b' '
+        for result in self.RESULTS.get(match.group(2), []):
+            self.lines.append(prefix + b'> ' + result + b'\n')
+        self.lines.append(prefix + b'+ ok\n')
+
+    def readline(self):
+        self._wait()
+        if not self.lines:
+            return b''
+        return self.lines.popleft()
+
+
+class FakeUSBDevice:
+    """A USB device which acknowledges all control transfers."""
+
+    def __init__(self, delay=0):
+        self.delay = delay
+
+    def _wait(self):
+        if self.delay:
+            time.sleep(self.delay)
+
+    def control_write(self, request, value, index, data=None, timeout=3000):
+        self._wait()
+
+    def control_read(self, request, value, index, length, timeout=3000):
+        self._wait()
+        return bytes(length)
+
+
+class FakeMotorBoard(MotorBoard):
+    """A motor board with a fake serial port."""
+
+    board_type_id = 'motor'
+    enabled = False
+
+    def __init__(self, node, delay=0):
+        super().__init__(node)
+        self.delay = delay
+
+    def _open_connection(self, device):
+        return FakeSerial(self.delay)
+
+
+class FakeServoAssembly(ServoAssembly):
+    """A servo assembly with a fake serial port."""
+
+    board_type_id = 'servo_assembly'
+    enabled = False
+
+    def __init__(self, node, delay=0):
+        super().__init__(node)
+        self.delay = delay
+
+    def _open_connection(self, device):
+        return FakeServoSerial(self.delay)
+
+
+class FakePowerBoard(PowerBoard):
+    """A power board with a fake USB device."""
+
+    board_type_id = 'power'
+    enabled = False
+
+    def __init__(self, node, delay=0):
+        super().__init__(node)
+        self.delay = delay
+
+    def start(self):
+        self.device = FakeUSBDevice(self.delay)
+        self.make_safe()
+        self.tick(None)
+
+
+class FakeCamera(Board):
+    """
+    A camera which never sees anything.
+
+    This stands in for `robotd.camera.Camera`, which cannot be imported
+    without `sb_vision`; `see` commands just take `delay` seconds.
+    """
+
+    board_type_id = 'camera'
+    enabled = False
+
+    def __init__(self, node, delay=0):
+        super().__init__(node)
+        self.delay = delay
+        self._status = {'snapshot_timestamp': None, 'markers': []}
+
+    @classmethod
+    def name(cls, node):
+        return node['DEVNAME'].rsplit('/', 1)[-1]
+
+    def status(self):
+        return self._status
+
+    def command(self, cmd):
+        if cmd.get('see', False):
+            if self.delay:
+                time.sleep(self.delay)
+            self._status = {'snapshot_timestamp': time.time(), 'markers': []}
+
+
+class FakeUdevDevice(collections.abc.Mapping):
+    """
+    A stand-in for a `pyudev.Device`, as listed by `FakeUdevContext`.
+
+    Its properties are looked up in a dict, which is rather cheaper than
+    pyudev asking libudev for each one, so code which reads a lot of them
+    looks faster against these than it really is.
+    """
+
+    def __init__(self, device_path, properties):
+        self.device_path = device_path
+        self.sys_path = '/sys' + device_path
+        self.sys_name = device_path.rsplit('/', 1)[-1]
+        self.is_initialized = True
+        self._properties = properties
+
+    @property
+    def properties(self):
+        return self
+
+    def __getitem__(self, key):
+        return self._properties[key]
+
+    def __iter__(self):
+        return iter(self._properties)
+
+    def __len__(self):
+        return len(self._properties)
+
+
+class FakeUdevContext:
+    """
+    A stand-in for a `pyudev.Context` with a synthetic device tree.
+
+    Like libudev, matching devices against a subsystem and properties costs
+    next to nothing, but a new device object is made for each match every
+    time the devices are listed. Every device added or removed is reported
+    to any `FakeUdevMonitor`s.
+    """
+
+    def __init__(self):
+        # Device path -> properties, including the subsystem
+        self.devices = collections.OrderedDict()
+        # Match key -> {device path: properties} of the devices it matches
+        self._matches = {}
+        self.monitors = []
+
+    @staticmethod
+    def _key_matches(key, properties):
+        return all(properties.get(name) == value for name, value in key)
+
+    def add(self, device_path, subsystem, **properties):
+        properties['SUBSYSTEM'] = subsystem
+        self.devices[device_path] = properties
+        for key, matches in self._matches.items():
+            if self._key_matches(key, properties):
+                matches[device_path] = properties
+        self._notify('add', device_path)
+
+    def remove(self, device_path):
+        del self.devices[device_path]
+        for matches in self._matches.values():
+            matches.pop(device_path, None)
+        self._notify('remove', device_path)
+
+    def _notify(self, action, device_path):
+        for monitor in self.monitors:
+            monitor.events.append((action, device_path))
+
+    def list_devices(self, subsystem=None, **properties):
+        if subsystem is not None:
+            properties['SUBSYSTEM'] = subsystem
+
+        key = tuple(sorted(properties.items()))
+        if key not in self._matches:
+            self._matches[key] = collections.OrderedDict(
+                (device_path, device_properties)
+                for device_path, device_properties in self.devices.items()
+                if self._key_matches(key, device_properties)
+            )
+
+        return [
+            FakeUdevDevice(device_path, device_properties)
+            for device_path, device_properties in self._matches[key].items()
+        ]
+
+
+class FakeUdevMonitor:
+    """A stand-in for a `pyudev.Monitor` of a `FakeUdevContext`."""
+
+    def __init__(self, context):
+        self.events = collections.deque()
+        context.monitors.append(self)
+
+    def poll(self, timeout=None):
+        if not self.events:
+            return None
+        return self.events.popleft()
+
+
+# Properties of the udev nodes of each type of board, by subsystem
+UDEV_BOARDS = {
+    'motor': ('tty', {
+        'ID_VENDOR_ID': '0403',
+        'ID_MODEL_ID': '6001',
+        'ID_MODEL': 'MCV4B',
+    }),
+    'servo_assembly': ('tty', {'ID_VENDOR_ID': '2a03', 'ID_MODEL_ID': '0043'}),
+    'power': ('usb', {'ID_VENDOR_ID': '1bda', 'ID_MODEL_ID': '0010'}),
+}
+
+
+def add_udev_board(context, board_type_id, index):
+    """Plug a board of the given type into a `FakeUdevContext`."""
+    subsystem, properties = UDEV_BOARDS[board_type_id]
+    device_path = '/devices/platform/robot/{}{}'.format(board_type_id, index)
+    context.add(
+        device_path,
+        subsystem,
+        DEVNAME='/dev/{}{}'.format(board_type_id, index),
+        ID_SERIAL_SHORT='{}{}'.format(board_type_id.upper(), index),
+        MINOR=str(index),
+        **properties,
+    )
+    return device_path
+
+
+def make_udev_context(num_devices, seed=0):
+    """
+    Build a `FakeUdevContext` with `num_devices` devices which aren't boards.
+
+    They're split between serial ports (most of them virtual terminals, which
+    every board type which looks at ttys has to consider), USB devices from
+    various vendors, and devices in subsystems no board looks at.
+    """
+    random_ = random.Random(seed)
+    context = FakeUdevContext()
+
+    for index in range(num_devices):
+        kind = index % 5
+        if kind in (0, 1):
+            context.add(
+                '/devices/virtual/tty/tty{}'.format(index),
+                'tty',
+                DEVNAME='/dev/tty{}'.format(index),
+                MINOR=str(index),
+            )
+        elif kind == 2:
+            context.add(
+                '/devices/pci0000:00/usb1/1-{}/tty/ttyUSB{}'.format(index, index),
+                'tty',
+                ID_VENDOR_ID=random_.choice(('0403', '067b', '10c4')),
+                ID_MODEL_ID='{:04x}'.format(random_.randrange(0x10000)),
+                ID_MODEL='Serial',
+                MINOR=str(index),
+            )
+        elif kind == 3:
+            context.add(
+                '/devices/pci0000:00/usb1/1-{}'.format(index),
+                'usb',
+                ID_VENDOR_ID=random_.choice(('046d', '1bda', '0bda', '8087')),
+                ID_MODEL_ID='{:04x}'.format(random_.randrange(0x10000)),
+            )
+        else:
+            context.add(
+                '/devices/virtual/block/loop{}'.format(index),
+                'block',
+            )
+
+    return context
+
+
+def fake_node(index=0):
+    """Build a stand-in for a udev node which satisfies every fake board."""
+    return {
+        'DEVNAME': '/dev/fake{}'.format(index),
+        'ID_SERIAL_SHORT': 'FAKE{}'.format(index),
+        'MINOR': str(index),
+    }
+
+
+# Board type ID -> (factory, delay kind, representative command)
+FAKE_BOARDS = collections.OrderedDict([
+    ('motor', (FakeMotorBoard, 'serial', {'m0': 0.5, 'm1': -0.5})),
+    ('servo_assembly', (
+        FakeServoAssembly,
+        'serial',
+        {'servos': {'0': 0.5, '1': -0.5}},
+    )),
+    ('power', (FakePowerBoard, 'usb', {'start-led': True})),
+    ('camera', (FakeCamera, 'vision', {'see': True})),
+    ('game', (lambda node, delay=0: GameState(), None, {})),
+])
+
+
+def make_fake_board(board_type_id, delays, index=0):
+    """
+    Build a fake board of the given type.
+
+    `delays` maps each delay kind (``serial``, ``usb``, ``vision``) to the
+    number of seconds each I/O call should take.
+    """
+    factory, delay_kind, _ = FAKE_BOARDS[board_type_id]
+    return factory(fake_node(index), delay=delays.get(delay_kind, 0))
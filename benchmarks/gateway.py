@@ -0,0 +1,122 @@
+"""
+Control-cycle benchmark: one socket per board against the gateway.
+
+Runs several fake motor boards, each in a real `BoardRunner`, and times a
+control cycle which sends every board a speed command, first over each
+board's own socket in turn and then as a single batch through the gateway.
+
+Usage::
+
+    python -m benchmarks.gateway --boards 4 --cycles 200 --serial-delay 0.001
+"""
+
+import argparse
+import contextlib
+import json
+import socket
+import tempfile
+import time
+from pathlib import Path
+
+from robotd.gateway import Gateway
+
+from .fakes import FAKE_BOARDS, make_fake_board
+from .harness import BenchClient, emit, running_board, summarise
+
+
+class GatewayClient:
+    """A minimal blocking gateway client."""
+
+    def __init__(self, path):
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.socket.connect(str(path))
+        self.file = self.socket.makefile('rb')
+
+    def close(self):
+        self.file.close()
+        self.socket.close()
+
+    def request(self, message):
+        self.socket.sendall(json.dumps(message).encode('utf-8') + b'\n')
+        return json.loads(self.file.readline().decode('utf-8'))
+
+
+def _time_cycles(cycles, run_cycle):
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(cycles):
+        cycle_start = time.perf_counter()
+        run_cycle()
+        latencies.append(time.perf_counter() - cycle_start)
+    return summarise(latencies, time.perf_counter() - start)
+
+
+def bench(num_boards, cycles, serial_delay):
+    """Time control cycles both ways, returning a summary dict."""
+    _, _, command = FAKE_BOARDS['motor']
+
+    with contextlib.ExitStack() as stack:
+        root_dir = Path(stack.enter_context(tempfile.TemporaryDirectory()))
+
+        socket_paths = [
+            stack.enter_context(running_board(
+                make_fake_board('motor', {'serial': serial_delay}, index),
+                root_dir,
+            ))
+            for index in range(num_boards)
+        ]
+        addresses = [
+            '{}/{}'.format(path.parent.name, path.name)
+            for path in socket_paths
+        ]
+
+        gateway = Gateway(root_dir, root_dir / 'gateway')
+        gateway.start()
+        stack.callback(gateway.stop)
+
+        direct_clients = [BenchClient(path) for path in socket_paths]
+        for client in direct_clients:
+            stack.callback(client.close)
+
+        gateway_client = GatewayClient(root_dir / 'gateway')
+        stack.callback(gateway_client.close)
+
+        batch = [dict(command, board=address) for address in addresses]
+
+        def direct_cycle():
+            for client in direct_clients:
+                client.request(command)
+
+        def gateway_cycle():
+            gateway_client.request(batch)
+
+        return {
+            'direct': _time_cycles(cycles, direct_cycle),
+            'gateway': _time_cycles(cycles, gateway_cycle),
+        }
+
+
+def main(args=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--boards', type=int, default=4)
+    parser.add_argument('--cycles', type=int, default=200)
+    parser.add_argument('--serial-delay', type=float, default=0.0)
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args(args)
+
+    results = {
+        'benchmark': 'gateway',
+        'parameters': {
+            'boards': args.boards,
+            'cycles': args.cycles,
+            'serial_delay': args.serial_delay,
+        },
+        'results': bench(args.boards, args.cycles, args.serial_delay),
+    }
+
+    emit(results, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""Shared plumbing for running boards and reporting benchmark results."""
+
+import contextlib
+import json
+import math
+import socket
+import sys
+import tempfile
+import time
+
+from robotd.runner import BoardRunner
+
+
+@contextlib.contextmanager
+def running_board(board, root_dir=None, **kwargs):
+    """
+    Run `board` in a `BoardRunner` for the duration of the block.
+
+    Yields the path to the board's socket.
+    """
+    with contextlib.ExitStack() as stack:
+        if root_dir is None:
+            root_dir = stack.enter_context(tempfile.TemporaryDirectory())
+
+        runner = BoardRunner(board, root_dir, **kwargs)
+        runner.start()
+        try:
+            wait_for_socket(runner.socket_path)
+            yield runner.socket_path
+        finally:
+            runner.terminate()
+            runner.join()
+            runner.cleanup()
+
+
+def wait_for_socket(path, timeout=10):
+    """Block until something is listening on the UNIX socket at `path`."""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.connect(str(path))
+                # Wait for the greeting so that we don't hang up on the
+                # runner while it is still talking to us.
+                sock.makefile('rb').readline()
+                return
+        except (FileNotFoundError, ConnectionRefusedError):
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.01)
+
+
+class BenchClient:
+    """
+    A minimal blocking robotd client.
+
+    With `seqpacket` set, `socket_path` is a board's ``.seqpacket`` socket,
+    over which each message is one datagram.
+    """
+
+    def __init__(self, socket_path, seqpacket=False):
+        self.seqpacket = seqpacket
+        self.socket = socket.socket(
+            socket.AF_UNIX,
+            socket.SOCK_SEQPACKET if seqpacket else socket.SOCK_STREAM,
+        )
+        self.socket.connect(str(socket_path))
+        self.file = self.socket.makefile('rb')
+
+        # The runner greets every new connection with the board's status.
+        self.initial_status = self._read_message()
+
+    def close(self):
+        self.file.close()
+        self.socket.close()
+
+    def _read_message(self):
+        if self.seqpacket:
+            line = self.socket.recv(65536)
+        else:
+            line = self.file.readline()
+        if not line:
+            raise ConnectionError('robotd closed the connection')
+        return json.loads(line.decode('utf-8'))
+
+    def request(self, command):
+        """
+        Send `command` and wait for the status which follows it.
+
+        Returns a ``(status, response)`` tuple, where `response` is ``None``
+        if the board did not respond to the command.
+        """
+        self.socket.sendall(json.dumps(command).encode('utf-8') + b'\n')
+
+        response = None
+        while True:
+            message = self._read_message()
+            if message.get('broadcast'):
+                continue
+            if 'response' in message:
+                response = message['response']
+                continue
+            return message, response
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already-sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(0, math.ceil(fraction * len(sorted_values)) - 1)
+    return sorted_values[rank]
+
+
+def summarise(latencies, duration):
+    """Summarise a list of per-command latencies (in seconds)."""
+    latencies = sorted(latencies)
+
+    def ms(value):
+        return None if value is None else round(value * 1000, 4)
+
+    return {
+        'commands': len(latencies),
+        'seconds': round(duration, 4),
+        'commands_per_second': (
+            round(len(latencies) / duration, 2) if duration else None
+        ),
+        'latency_ms': {
+            'p50': ms(percentile(latencies, 0.50)),
+            'p95': ms(percentile(latencies, 0.95)),
+            'p99': ms(percentile(latencies, 0.99)),
+            'max': ms(latencies[-1] if latencies else None),
+            'mean': ms(sum(latencies) / len(latencies) if latencies else None),
+        },
+    }
+
+
+def emit(results, output=None):
+    """Write `results` as JSON to the `output` path, or stdout."""
+    text = json.dumps(results, indent=2, sort_keys=True) + '\n'
+    if output is None:
+        sys.stdout.write(text)
+    else:
+        with open(str(output), 'w') as f:
+            f.write(text)
@@ -0,0 +1,184 @@
+"""
+Memory and latency of hosted runners, against a process per runner.
+
+Starts a number of lightweight boards (standing in for the game state, brain
+temperature sensor and the like), first each in a runner process of its own
+and then all on threads of one `RunnerHost`, using the forkserver as robotd
+does. For each, reports the memory of all the processes started, and the
+latency of commands sent to the boards in turn, alone and with every board
+being sent commands at once.
+
+Usage::
+
+    python -m benchmarks.hosting --boards 1,4,8 --commands 500
+"""
+
+import argparse
+import json
+import multiprocessing
+import subprocess
+import sys
+import threading
+import time
+
+from robotd.devices_base import Board
+
+from .harness import BenchClient, emit
+
+MODES = ('processes', 'hosted')
+
+
+class LightBoard(Board):
+    """A board which does next to nothing."""
+
+    board_type_id = 'light'
+    enabled = False
+
+    @classmethod
+    def name(cls, node):
+        return node['ID_SERIAL_SHORT']
+
+    def command(self, cmd):
+        return cmd.get('echo')
+
+    def status(self):
+        return {'ok': True}
+
+
+def _time_commands(socket_paths, commands):
+    latencies = []
+    clients = [BenchClient(path) for path in socket_paths]
+    for index in range(commands):
+        client = clients[index % len(clients)]
+        start = time.perf_counter()
+        client.request({'echo': index})
+        latencies.append(time.perf_counter() - start)
+    for client in clients:
+        client.close()
+    return latencies
+
+
+def _time_concurrent_commands(socket_paths, commands):
+    latencies = []
+
+    def run(socket_path):
+        latencies.extend(_time_commands([socket_path], commands))
+
+    threads = [
+        threading.Thread(target=run, args=(socket_path,))
+        for socket_path in socket_paths
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, time.perf_counter() - start
+
+
+def run_configuration(mode, num_boards, commands):
+    """Start the boards, and report memory and latency as JSON on stdout."""
+    import contextlib
+    import os
+    import tempfile
+
+    from robotd.host import HostedRunner, RunnerHost
+    from robotd.memory import process_memory
+    from robotd.runner import BoardRunner
+
+    from .fakes import fake_node
+    from .harness import summarise, wait_for_socket
+    from .memory import _descendants
+
+    multiprocessing.set_start_method('forkserver')
+    multiprocessing.set_forkserver_preload(['robotd.runner'])
+
+    with contextlib.ExitStack() as stack:
+        root_dir = stack.enter_context(tempfile.TemporaryDirectory())
+
+        host = None
+        if mode == 'hosted':
+            host = RunnerHost()
+            host.start()
+            stack.callback(host.join)
+            stack.callback(host.stop)
+
+        socket_paths = []
+        for index in range(num_boards):
+            runner = BoardRunner(LightBoard(fake_node(index)), root_dir)
+            if host is not None:
+                runner = HostedRunner(host, runner)
+            runner.bind()
+            runner.start()
+            runner.close_server_socket()
+            stack.callback(runner.cleanup)
+            stack.callback(runner.join)
+            stack.callback(runner.terminate)
+            socket_paths.append(runner.socket_path)
+
+        for socket_path in socket_paths:
+            wait_for_socket(socket_path)
+
+        serial = _time_commands(socket_paths, commands)
+        concurrent, duration = _time_concurrent_commands(socket_paths, commands)
+
+        others = [process_memory(pid) for pid in _descendants(os.getpid())]
+
+    def total(field):
+        values = [process[field] for process in others]
+        return None if None in values else sum(values)
+
+    json.dump({
+        'processes': len(others),
+        'rss_bytes': total('rss'),
+        'pss_bytes': total('pss'),
+        'serial': summarise(serial, sum(serial)),
+        'concurrent': summarise(concurrent, duration),
+    }, sys.stdout)
+
+
+def main(args=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument(
+        '--boards',
+        default='1,4,8',
+        help='comma-separated numbers of boards to try',
+    )
+    parser.add_argument(
+        '--commands',
+        type=int,
+        default=500,
+        help='commands to send, in total and then to each board at once '
+             '(default: 500)',
+    )
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args(args)
+
+    results = {}
+    for num_boards in args.boards.split(','):
+        results[num_boards] = {}
+        for mode in MODES:
+            # Run from '-c' so that the runners don't re-import this module
+            # as their __main__; see benchmarks.memory.
+            output = subprocess.check_output([
+                sys.executable,
+                '-c',
+                'from benchmarks.hosting import run_configuration; '
+                'run_configuration({!r}, {!r}, {!r})'.format(
+                    mode,
+                    int(num_boards),
+                    args.commands,
+                ),
+            ], universal_newlines=True)
+            results[num_boards][mode] = json.loads(output)
+
+    emit({
+        'benchmark': 'hosting',
+        'parameters': {'commands': args.commands},
+        'boards': results,
+    }, args.output)
+
+
+if __name__ == '__main__':
+    main()
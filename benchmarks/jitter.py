@@ -0,0 +1,184 @@
+"""
+Scheduling jitter benchmark: a runner's timing with CPU hogs alongside.
+
+Runs a board which ticks at a fixed rate and records when each tick actually
+ran, while a client sends it commands at a steady rate, first on an idle
+machine and then with a busy-looping hog process per CPU (standing in for the
+camera's marker detection) under each way of isolating the runner:
+
+* ``shared``, with no scheduling settings,
+* ``nice``, with the runner and client at nice -10,
+* ``fifo``, with the runner and client under ``SCHED_FIFO``,
+* ``pinned``, with the runner and client on CPU 0 and the hogs on the rest,
+  which is skipped on a machine with only one CPU.
+
+Reports the tick jitter (how far each interval between ticks was from the
+period) and the round-trip time of the commands. Settings which need
+privileges are only applied when running as root; see the log for which
+were skipped.
+
+Usage::
+
+    python -m benchmarks.jitter --seconds 3 --tick-rate 200 --command-rate 100
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import time
+
+from robotd.devices_base import Board
+from robotd.scheduling import Scheduling
+
+from .harness import BenchClient, emit, running_board, summarise
+
+
+class TickingBoard(Board):
+    """A board which records the interval between each of its ticks."""
+
+    board_type_id = 'ticking'
+    enabled = False
+
+    @classmethod
+    def name(cls, node):
+        return 'ticking'
+
+    def start(self):
+        self.last_tick = None
+        self.intervals = []
+
+    def tick(self, now):
+        if self.last_tick is not None:
+            self.intervals.append(now - self.last_tick)
+        self.last_tick = now
+
+    def command(self, cmd):
+        if cmd.get('intervals'):
+            intervals, self.intervals = self.intervals, []
+            return intervals
+
+
+def _hog(cpus):
+    if cpus:
+        os.sched_setaffinity(0, cpus)
+    while True:
+        pass
+
+
+def _client(socket_path, scheduling, seconds, rate, results):
+    scheduling.apply()
+    client = BenchClient(socket_path)
+    # Forget the ticks from before the measurement started
+    client.request({'intervals': True})
+
+    latencies = []
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        client.request({'speed': 0.5})
+        latencies.append(time.perf_counter() - start)
+        time.sleep(1 / rate)
+
+    _, intervals = client.request({'intervals': True})
+    client.close()
+    results.put((latencies, intervals))
+
+
+def bench_configuration(scheduling, hog_cpus, args):
+    """Measure one configuration; `hog_cpus` is `None` for no hogs."""
+    hogs = []
+    if hog_cpus is not None:
+        for _ in range(max(len(hog_cpus), os.cpu_count())):
+            hog = multiprocessing.Process(target=_hog, args=(hog_cpus,))
+            hog.start()
+            hogs.append(hog)
+
+    board = TickingBoard({})
+    try:
+        with running_board(
+            board,
+            tick_rates={TickingBoard.board_type_id: args.tick_rate},
+            scheduling={TickingBoard.board_type_id: scheduling},
+        ) as socket_path:
+            results = multiprocessing.Queue()
+            client = multiprocessing.Process(
+                target=_client,
+                args=(
+                    socket_path,
+                    scheduling,
+                    args.seconds,
+                    args.command_rate,
+                    results,
+                ),
+            )
+            client.start()
+            latencies, intervals = results.get()
+            client.join()
+    finally:
+        for hog in hogs:
+            hog.terminate()
+            hog.join()
+
+    period = 1 / args.tick_rate
+    jitter = [abs(interval - period) for interval in intervals]
+    return {
+        'tick_jitter': summarise(jitter, args.seconds),
+        'commands': summarise(latencies, args.seconds),
+    }
+
+
+def _configurations():
+    cpus = sorted(os.sched_getaffinity(0))
+    configurations = [
+        ('idle', Scheduling(), None),
+        ('shared', Scheduling(), ()),
+        ('nice', Scheduling(nice=-10), ()),
+        ('fifo', Scheduling(realtime_priority=50), ()),
+    ]
+    if len(cpus) > 1:
+        configurations.append(
+            ('pinned', Scheduling(cpus={cpus[0]}), set(cpus[1:])),
+        )
+    return configurations
+
+
+def main(args=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--seconds', type=float, default=3)
+    parser.add_argument(
+        '--tick-rate',
+        type=float,
+        default=200,
+        help='ticks per second of the board (default: 200)',
+    )
+    parser.add_argument(
+        '--command-rate',
+        type=float,
+        default=100,
+        help='commands per second from the client (default: 100)',
+    )
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args(args)
+
+    logging.basicConfig(level=logging.WARNING)
+
+    results = {}
+    for name, scheduling, hog_cpus in _configurations():
+        results[name] = bench_configuration(scheduling, hog_cpus, args)
+
+    emit({
+        'benchmark': 'jitter',
+        'parameters': {
+            'seconds': args.seconds,
+            'tick_rate': args.tick_rate,
+            'command_rate': args.command_rate,
+            'cpus': os.cpu_count(),
+        },
+        'configurations': results,
+    }, args.output)
+
+
+if __name__ == '__main__':
+    main()
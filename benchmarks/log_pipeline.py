@@ -0,0 +1,139 @@
+"""
+Logging benchmark: command latency with debug logging to a slow journal.
+
+Runs a servo assembly, which logs every line it exchanges with the board,
+with debug logging on, writing to a pipe which is only
+drained at a fixed rate (standing in for a journal which can't keep up),
+and times commands sent to it, for three ways of logging:
+
+* ``direct``, with the runner writing its records to the pipe itself,
+* ``queue``, with the runner handing its records to a `QueueListener` in
+  this process, as the master does,
+* ``limited``, as ``queue`` but with the default per-logger rate limits on
+  debug records.
+
+Runners are forked, so that the ``direct`` one inherits this process's
+logging setup.
+
+Usage::
+
+    python -m benchmarks.log_pipeline --commands 2000 --drain-rate 100000
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import threading
+import time
+
+from robotd.logs import DEFAULT_FORMAT, DEFAULT_LIMITS, start_listener
+
+from .fakes import FAKE_BOARDS, make_fake_board
+from .harness import BenchClient, emit, running_board, summarise
+
+
+class SlowPipe:
+    """A pipe whose reading end is drained at only `rate` bytes a second."""
+
+    CHUNK = 4096
+
+    def __init__(self, rate):
+        read_fd, write_fd = os.pipe()
+        self.file = os.fdopen(write_fd, 'w', buffering=1)
+        self._read_fd = read_fd
+        self._interval = self.CHUNK / rate
+        self._thread = threading.Thread(target=self._drain, daemon=True)
+        self._thread.start()
+
+    def _drain(self):
+        while True:
+            data = os.read(self._read_fd, self.CHUNK)
+            if not data:
+                break
+            time.sleep(self._interval)
+
+    def close(self):
+        self.file.close()
+        self._thread.join()
+        os.close(self._read_fd)
+
+
+def _time_commands(socket_path, commands):
+    _, _, command = FAKE_BOARDS['servo_assembly']
+    client = BenchClient(socket_path)
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(commands):
+        command_start = time.perf_counter()
+        client.request(command)
+        latencies.append(time.perf_counter() - command_start)
+    duration = time.perf_counter() - start
+    client.close()
+    return summarise(latencies, duration)
+
+
+def bench_logging(name, commands, drain_rate):
+    """Time commands to a runner logging the given way."""
+    root = logging.getLogger()
+    pipe = SlowPipe(drain_rate)
+    listener = None
+    runner_options = {}
+
+    if name == 'direct':
+        handler = logging.StreamHandler(pipe.file)
+        handler.setFormatter(logging.Formatter(DEFAULT_FORMAT))
+        root.addHandler(handler)
+        root.setLevel(logging.DEBUG)
+    else:
+        limits = DEFAULT_LIMITS if name == 'limited' else {}
+        log_config, listener = start_listener(logging.DEBUG, limits, pipe.file)
+        log_config.apply()
+        runner_options['log_config'] = log_config
+
+    try:
+        board = make_fake_board('servo_assembly', {})
+        with running_board(board, **runner_options) as socket_path:
+            results = _time_commands(socket_path, commands)
+    finally:
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        if listener is not None:
+            listener.stop()
+        pipe.close()
+
+    return results
+
+
+def main(args=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--commands', type=int, default=2000)
+    parser.add_argument(
+        '--drain-rate',
+        type=int,
+        default=100000,
+        help='bytes per second read from the log pipe (default: 100000)',
+    )
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args(args)
+
+    multiprocessing.set_start_method('fork')
+
+    results = {
+        name: bench_logging(name, args.commands, args.drain_rate)
+        for name in ('direct', 'queue', 'limited')
+    }
+
+    emit({
+        'benchmark': 'log_pipeline',
+        'parameters': {
+            'commands': args.commands,
+            'drain_rate': args.drain_rate,
+        },
+        'logging': results,
+    }, args.output)
+
+
+if __name__ == '__main__':
+    main()
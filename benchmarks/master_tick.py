@@ -0,0 +1,151 @@
+"""
+Cost of the master's udev polling, against a synthetic device tree.
+
+Runs `MasterProcess.tick` against a `FakeUdevContext` holding thousands of
+devices which aren't boards plus a few which are, with runners tracked but
+not actually started. Reports the cost of a tick when nothing has changed
+and of the ticks which notice a board being plugged in and unplugged, for
+three masters:
+
+* ``events``, which only lists the devices when udev reports an event, and
+  remembers which nodes each board type includes,
+* ``scan``, which lists the devices on every tick, but still remembers which
+  nodes each board type includes, as when udev events are unavailable,
+* ``uncached``, which lists the devices and asks every board type about
+  every node on every tick, as the master used to.
+
+Usage::
+
+    python -m benchmarks.master_tick --devices 1000,5000,20000 --ticks 50
+"""
+
+import argparse
+import tempfile
+import time
+from unittest import mock
+
+from robotd.devices import BOARDS
+from robotd.master import MasterProcess
+
+from .fakes import FakeUdevMonitor, add_udev_board, make_udev_context
+from .harness import emit, summarise
+
+
+class BenchMaster(MasterProcess):
+    """A master which keeps track of runners without starting them."""
+
+    def _open_udev_events(self):
+        return FakeUdevMonitor(self.context)
+
+    def _start_board_instance(self, board_type, new_device, node=None):
+        with self.runners_lock:
+            self.runners[board_type][new_device] = node
+
+    def _stop_runner(self, board_type, dead_device):
+        with self.runners_lock:
+            del self.runners[board_type][dead_device]
+            self.pending_operations.discard((board_type, dead_device))
+
+
+class ScanningBenchMaster(BenchMaster):
+    """A master which lists the devices on every tick."""
+
+    def _open_udev_events(self):
+        return None
+
+
+class UncachedBenchMaster(ScanningBenchMaster):
+    """A master which checks every node on every tick, as it used to."""
+
+    def _included_nodes(self, board_type, nodes):
+        return [
+            node
+            for node in nodes
+            if node.is_initialized and board_type.included(node)
+        ]
+
+
+def _time_tick(master):
+    start = time.perf_counter()
+    master.tick()
+    return time.perf_counter() - start
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 4)
+
+
+def bench_master(master_class, num_devices, ticks):
+    """Time a master's ticks against a fresh tree of `num_devices` devices."""
+    context = make_udev_context(num_devices)
+    for board_type_id in ('motor', 'motor', 'servo_assembly', 'power'):
+        add_udev_board(context, board_type_id, len(context.devices))
+
+    with tempfile.TemporaryDirectory() as root_dir:
+        master = master_class(root_dir, context=context)
+        try:
+            first_tick = _time_tick(master)
+            durations = [_time_tick(master) for _ in range(ticks)]
+            steady = summarise(durations, sum(durations))
+
+            device_path = add_udev_board(context, 'motor', len(context.devices))
+            plug_tick = _time_tick(master)
+            context.remove(device_path)
+            unplug_tick = _time_tick(master)
+
+            runners = sum(len(runners) for runners in master.runners.values())
+        finally:
+            master._executor.shutdown()
+
+    return {
+        'runners': runners,
+        'first_tick_ms': _ms(first_tick),
+        'steady_tick_ms': steady['latency_ms'],
+        'plug_tick_ms': _ms(plug_tick),
+        'unplug_tick_ms': _ms(unplug_tick),
+    }
+
+
+def main(args=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument(
+        '--devices',
+        default='1000,5000,20000',
+        help='comma-separated sizes of device tree to try',
+    )
+    parser.add_argument(
+        '--ticks',
+        type=int,
+        default=50,
+        help='ticks to time with nothing changing (default: 50)',
+    )
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args(args)
+
+    results = {}
+    # Only the board types which are really enabled, without any vision
+    with mock.patch('robotd.master.BOARDS', [
+        board_type
+        for board_type in BOARDS
+        if board_type.board_type_id != 'camera'
+    ]):
+        for num_devices in args.devices.split(','):
+            results[num_devices] = {
+                name: bench_master(master_class, int(num_devices), args.ticks)
+                for name, master_class in (
+                    ('events', BenchMaster),
+                    ('scan', ScanningBenchMaster),
+                    ('uncached', UncachedBenchMaster),
+                )
+            }
+
+    emit({
+        'benchmark': 'master_tick',
+        'parameters': {'ticks': args.ticks},
+        'devices': results,
+    }, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""
+Memory used by a typical robot for each way of starting runners.
+
+For each multiprocessing start method, starts a fresh master-like process
+which launches runners for a game state, motor board, servo assembly, power
+board and camera, and then totals the memory of it and all its descendants
+(including the forkserver, where there is one).
+
+Usage::
+
+    python -m benchmarks.memory --methods fork,spawn,forkserver
+
+The master can be given some ``--master-ballast-mb`` of long-lived Python
+objects, to simulate the state which it accumulates over time and which
+forked runners inherit.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+
+# Board types making up a typical robot
+TYPICAL_ROBOT = ('game', 'motor', 'servo_assembly', 'power', 'camera')
+
+
+def _child_pids():
+    parents = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open('/proc/{}/stat'.format(entry)) as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # The command name may contain spaces, so split after it
+        ppid = int(stat.rsplit(')', 1)[1].split()[1])
+        parents.setdefault(ppid, []).append(int(entry))
+    return parents
+
+
+def _descendants(pid):
+    children = _child_pids()
+    pending = [pid]
+    found = []
+    while pending:
+        child = pending.pop()
+        found.append(child)
+        pending.extend(children.get(child, []))
+    return found[1:]
+
+
+def run_configuration(start_method, ballast_mb):
+    """Start a typical robot and report its memory usage, as JSON on stdout."""
+    # Import what the master would have loaded before starting any runners
+    import contextlib
+    import tempfile
+
+    import robotd.master  # noqa: F401
+    from robotd.memory import process_memory
+
+    from .fakes import make_fake_board
+    from .harness import BenchClient, running_board
+
+    multiprocessing.set_start_method(start_method)
+    if start_method == 'forkserver':
+        multiprocessing.set_forkserver_preload(['robotd.runner'])
+
+    # Roughly 1 KiB per entry
+    ballast = [
+        {'index': index, 'payload': 'x' * 900}
+        for index in range(ballast_mb * 1024)
+    ]
+
+    with contextlib.ExitStack() as stack:
+        root_dir = stack.enter_context(tempfile.TemporaryDirectory())
+
+        for index, board_type_id in enumerate(TYPICAL_ROBOT):
+            board = make_fake_board(board_type_id, {}, index)
+            socket_path = stack.enter_context(running_board(board, root_dir))
+
+            # Make the runner do some real work before we measure it
+            client = BenchClient(socket_path)
+            client.request({})
+            client.close()
+
+        master = process_memory()
+        others = [
+            process_memory(pid)
+            for pid in _descendants(os.getpid())
+        ]
+
+    def total(field, processes):
+        values = [process[field] for process in processes]
+        return None if None in values else sum(values)
+
+    json.dump({
+        'processes': len(others) + 1,
+        'master_rss_bytes': master['rss'],
+        'master_pss_bytes': master['pss'],
+        'others_rss_bytes': total('rss', others),
+        'others_pss_bytes': total('pss', others),
+        'total_rss_bytes': total('rss', [master] + others),
+        'total_pss_bytes': total('pss', [master] + others),
+        'ballast_entries': len(ballast),
+    }, sys.stdout)
+
+
+def main(args=None):
+    """Command line entry point."""
+    from .harness import emit
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument(
+        '--methods',
+        default=','.join(multiprocessing.get_all_start_methods()),
+        help='comma-separated start methods to compare (default: all)',
+    )
+    parser.add_argument('--master-ballast-mb', type=int, default=20)
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args(args)
+
+    results = {
+        'benchmark': 'memory',
+        'parameters': {
+            'boards': list(TYPICAL_ROBOT),
+            'master_ballast_mb': args.master_ballast_mb,
+        },
+        'methods': {},
+    }
+
+    for method in args.methods.split(','):
+        # Run from '-c' so that spawned runners don't re-import this module
+        # as their __main__, just as they don't when robotd is run with
+        # 'python -m robotd'.
+        output = subprocess.check_output([
+            sys.executable,
+            '-c',
+            'from benchmarks.memory import run_configuration; '
+            'run_configuration({!r}, {!r})'.format(
+                method,
+                args.master_ballast_mb,
+            ),
+        ], universal_newlines=True)
+        results['methods'][method] = json.loads(output)
+
+    emit(results, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Start-up benchmark: how soon robotd is ready, and how soon clients get in.
+
+Starts the whole daemon as systemd would, with ``$NOTIFY_SOCKET`` pointing
+at a socket of our own, and reports how long it takes to send ``READY=1``,
+how long until the game state board's socket can be connected to, and how
+long until the first status comes back over it. The master binds each
+board's socket before starting its runner, so connecting should succeed
+well before the status arrives.
+
+Usage::
+
+    python -m benchmarks.ready --runs 5
+"""
+
+import argparse
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from .harness import emit, summarise
+
+# How long to wait for each step before giving up
+TIMEOUT = 30
+
+
+def _connect(path, deadline):
+    while True:
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            client.connect(str(path))
+            return client
+        except (FileNotFoundError, ConnectionRefusedError):
+            client.close()
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.001)
+
+
+def bench_start(start_method):
+    """Start robotd once, and time each step of its start-up."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        root_dir = Path(temp_dir) / 'robotd'
+        notify_path = os.path.join(temp_dir, 'notify')
+
+        notifications = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        notifications.bind(notify_path)
+        notifications.settimeout(TIMEOUT)
+
+        env = dict(os.environ, NOTIFY_SOCKET=notify_path)
+        start = time.monotonic()
+        process = subprocess.Popen(
+            [
+                sys.executable, '-m', 'robotd',
+                '--root-dir', str(root_dir),
+                '--start-method', start_method,
+            ],
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            client = _connect(root_dir / 'game' / 'state', start + TIMEOUT)
+            connected = time.monotonic() - start
+
+            client.settimeout(TIMEOUT)
+            client.makefile('rb').readline()
+            greeted = time.monotonic() - start
+            client.close()
+
+            message = notifications.recv(4096).decode('utf-8')
+            ready = time.monotonic() - start
+        finally:
+            process.send_signal(signal.SIGINT)
+            process.wait(TIMEOUT)
+            notifications.close()
+
+    return {
+        'connected': connected,
+        'greeted': greeted,
+        # Received after the others, so only an upper bound
+        'ready': ready,
+        'message': message,
+    }
+
+
+def main(args=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument(
+        '--start-methods',
+        default='forkserver,fork',
+        help='comma-separated runner start methods to try',
+    )
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args(args)
+
+    results = {}
+    for start_method in args.start_methods.split(','):
+        runs = [bench_start(start_method) for _ in range(args.runs)]
+        results[start_method] = {
+            step: summarise([run[step] for run in runs], 0)['latency_ms']
+            for step in ('connected', 'greeted', 'ready')
+        }
+        results[start_method]['message'] = runs[-1]['message']
+
+    emit({
+        'benchmark': 'ready',
+        'parameters': {'runs': args.runs},
+        'start_methods': results,
+    }, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+"""
+Replay a recording of a board's traffic and compare its latencies.
+
+Feeds the commands from a recording (made with ``robotd --record``) back
+through a board, from one client per recorded connection, at the recorded
+pace or sped up, and compares the latency of each command with what was
+recorded. The board is a fake one run in a `BoardRunner`, or a real one
+given by ``--socket``.
+
+Usage::
+
+    python -m benchmarks.replay /var/robotd/motor/<id>.rec --board-type motor
+    python -m benchmarks.replay motor.rec --socket /var/robotd/motor/<id> --speed 0
+
+Admin commands are not replayed.
+"""
+
+import argparse
+import collections
+import contextlib
+import threading
+import time
+
+from robotd.recorder import RecordKind, read_records
+
+from .fakes import FAKE_BOARDS, make_fake_board
+from .harness import BenchClient, emit, running_board, summarise
+
+Session = collections.namedtuple('Session', ('connected', 'commands'))
+
+
+def load_sessions(path):
+    """
+    Read the recorded connections from `path`.
+
+    Returns a list of `Session`s, each holding the time it connected and a
+    list of ``(timestamp, command, recorded latency)`` tuples.
+    """
+    connected = collections.OrderedDict()
+    commands = collections.defaultdict(list)
+    statuses = collections.defaultdict(list)
+
+    for record in read_records(path):
+        if record.kind == RecordKind.CONNECT:
+            connected[record.connection] = record.timestamp
+            commands[record.connection] = []
+            statuses[record.connection] = []
+        elif record.kind == RecordKind.COMMAND:
+            commands[record.connection].append(record)
+        elif record.kind == RecordKind.STATUS:
+            statuses[record.connection].append(record.timestamp)
+
+    sessions = []
+    for connection, connected_at in connected.items():
+        # The first status is the greeting; after that, every command gets
+        # exactly one status in reply.
+        replies = statuses[connection][1:]
+        session_commands = []
+        for index, record in enumerate(commands[connection]):
+            if 'admin' in record.message:
+                continue
+            latency = (
+                replies[index] - record.timestamp
+                if index < len(replies) else None
+            )
+            session_commands.append((record.timestamp, record.message, latency))
+        sessions.append(Session(connected_at, session_commands))
+
+    return sessions
+
+
+def _replay_session(socket_path, session, start, origin, speed, latencies):
+    def wait_until(timestamp):
+        if speed:
+            delay = start + (timestamp - origin) / speed - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+    wait_until(session.connected)
+    client = BenchClient(socket_path)
+    try:
+        for timestamp, command, _ in session.commands:
+            wait_until(timestamp)
+            sent = time.perf_counter()
+            client.request(command)
+            latencies.append(time.perf_counter() - sent)
+    finally:
+        client.close()
+
+
+def replay(socket_path, sessions, speed):
+    """Replay `sessions` against the board at `socket_path`."""
+    origin = min(session.connected for session in sessions)
+    latencies = []
+    start = time.perf_counter()
+
+    threads = [
+        threading.Thread(
+            target=_replay_session,
+            args=(socket_path, session, start, origin, speed, latencies),
+        )
+        for session in sessions
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return summarise(latencies, time.perf_counter() - start)
+
+
+def main(args=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('recording', help='path to a .rec file')
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument(
+        '--board-type',
+        choices=list(FAKE_BOARDS.keys()),
+        help='replay through a fake board of this type',
+    )
+    target.add_argument('--socket', help='replay through this board socket')
+    parser.add_argument(
+        '--speed',
+        type=float,
+        default=1.0,
+        help='how much faster than recorded to replay, or 0 for as fast as '
+             'possible (default: 1)',
+    )
+    parser.add_argument('--serial-delay', type=float, default=0.0)
+    parser.add_argument('--usb-delay', type=float, default=0.0)
+    parser.add_argument('--vision-delay', type=float, default=0.0)
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args(args)
+
+    sessions = load_sessions(args.recording)
+    if not sessions:
+        parser.error('{} has no recorded connections'.format(args.recording))
+
+    recorded = [
+        latency
+        for session in sessions
+        for _, _, latency in session.commands
+        if latency is not None
+    ]
+    origin = min(session.connected for session in sessions)
+    recorded_duration = max(
+        (
+            timestamp + (latency or 0)
+            for session in sessions
+            for timestamp, _, latency in session.commands
+        ),
+        default=origin,
+    ) - origin
+
+    with contextlib.ExitStack() as stack:
+        if args.socket is not None:
+            socket_path = args.socket
+        else:
+            delays = {
+                'serial': args.serial_delay,
+                'usb': args.usb_delay,
+                'vision': args.vision_delay,
+            }
+            socket_path = stack.enter_context(running_board(
+                make_fake_board(args.board_type, delays),
+            ))
+
+        replayed = replay(socket_path, sessions, args.speed)
+
+    emit({
+        'benchmark': 'replay',
+        'parameters': {
+            'recording': args.recording,
+            'target': args.socket or 'fake {}'.format(args.board_type),
+            'speed': args.speed,
+        },
+        'recorded': summarise(recorded, recorded_duration),
+        'replayed': replayed,
+    }, args.output)
+
+
+if __name__ == '__main__':
+    main()
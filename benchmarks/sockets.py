@@ -0,0 +1,138 @@
+"""
+End-to-end latency and throughput benchmark for board sockets.
+
+Runs each fake board in a real `BoardRunner` and drives it over its UNIX
+socket from a number of concurrent clients, measuring the full round trip
+of client -> socket -> runner -> ``Board.command`` -> status reply.
+
+Usage::
+
+    python -m benchmarks.sockets --clients 4 --commands 500 --serial-delay 0.001
+
+Results are printed (or written to ``--output``) as JSON so that runs from
+different commits can be compared.
+"""
+
+import argparse
+import threading
+import time
+
+from .fakes import FAKE_BOARDS, make_fake_board
+from .harness import BenchClient, emit, running_board, summarise
+
+
+def _client_worker(
+    socket_path,
+    command,
+    num_commands,
+    barrier,
+    latencies,
+    seqpacket,
+):
+    barrier.wait()
+    client = BenchClient(socket_path, seqpacket=seqpacket)
+    try:
+        for _ in range(num_commands):
+            start = time.perf_counter()
+            client.request(command)
+            latencies.append(time.perf_counter() - start)
+    finally:
+        client.close()
+
+
+def bench_socket(socket_path, command, clients, commands, seqpacket=False):
+    """
+    Send `command` from several concurrent clients to one board's socket.
+
+    Returns a summary dict.
+    """
+    latencies = []
+    barrier = threading.Barrier(clients + 1)
+    threads = [
+        threading.Thread(
+            target=_client_worker,
+            args=(
+                socket_path,
+                command,
+                commands,
+                barrier,
+                latencies,
+                seqpacket,
+            ),
+        )
+        for _ in range(clients)
+    ]
+
+    for thread in threads:
+        thread.start()
+
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    duration = time.perf_counter() - start
+
+    result = summarise(latencies, duration)
+    result['clients'] = clients
+    return result
+
+
+def bench_board(board_type_id, clients, commands, delays):
+    """Benchmark one board type, returning a summary dict."""
+    board = make_fake_board(board_type_id, delays)
+    _, _, command = FAKE_BOARDS[board_type_id]
+
+    with running_board(board) as socket_path:
+        return bench_socket(socket_path, command, clients, commands)
+
+
+def main(args=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument(
+        '--boards',
+        default=','.join(FAKE_BOARDS.keys()),
+        help='comma-separated board types to run (default: all)',
+    )
+    parser.add_argument('--clients', type=int, default=4)
+    parser.add_argument(
+        '--commands',
+        type=int,
+        default=200,
+        help='commands sent by each client',
+    )
+    parser.add_argument('--serial-delay', type=float, default=0.0)
+    parser.add_argument('--usb-delay', type=float, default=0.0)
+    parser.add_argument('--vision-delay', type=float, default=0.0)
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args(args)
+
+    delays = {
+        'serial': args.serial_delay,
+        'usb': args.usb_delay,
+        'vision': args.vision_delay,
+    }
+
+    results = {
+        'benchmark': 'sockets',
+        'parameters': {
+            'clients': args.clients,
+            'commands_per_client': args.commands,
+            'delays': delays,
+        },
+        'boards': {
+            board_type_id: bench_board(
+                board_type_id,
+                args.clients,
+                args.commands,
+                delays,
+            )
+            for board_type_id in args.boards.split(',')
+        },
+    }
+
+    emit(results, args.output)
+
+
+if __name__ == '__main__':
+    main()
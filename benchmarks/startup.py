@@ -0,0 +1,118 @@
+"""
+Startup cost of the robotd master.
+
+Runs ``python -X importtime -c 'import robotd.master'`` repeatedly in fresh
+interpreters and reports the median import time, the slowest modules, and
+whether any of the heavy hardware backends (which should only ever be loaded
+by the runners that need them) were imported.
+
+Usage::
+
+    python -m benchmarks.startup --runs 10
+"""
+
+import argparse
+import collections
+import statistics
+import subprocess
+import sys
+import time
+
+from .harness import emit
+
+# Modules which the master should never need to import
+HEAVY_MODULES = (
+    'serial',
+    'robotd.usb',
+    'robotd.native._usb',
+    'sb_vision',
+    'numpy',
+    'cv2',
+)
+
+
+def parse_importtime(text):
+    """
+    Parse ``-X importtime`` output.
+
+    Returns an ordered mapping of module name to ``(self, cumulative)``
+    import times in microseconds.
+    """
+    modules = collections.OrderedDict()
+
+    for line in text.splitlines():
+        if not line.startswith('import time:'):
+            continue
+
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3:
+            continue
+
+        self_us, cumulative_us, name = fields
+        try:
+            times = (int(self_us), int(cumulative_us))
+        except ValueError:
+            # The header line
+            continue
+
+        modules[name.strip()] = times
+
+    return modules
+
+
+def measure(module):
+    """Import `module` in a fresh interpreter, returning its parsed timings."""
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+        stderr=subprocess.PIPE,
+        check=True,
+        universal_newlines=True,
+    )
+    wall_time = time.perf_counter() - start
+
+    return wall_time, parse_importtime(result.stderr)
+
+
+def main(args=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--module', default='robotd.master')
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args(args)
+
+    wall_times = []
+    import_times = []
+    for _ in range(args.runs):
+        wall_time, modules = measure(args.module)
+        wall_times.append(wall_time)
+        import_times.append(modules[args.module][1])
+
+    slowest = sorted(
+        modules.items(),
+        key=lambda item: item[1][0],
+        reverse=True,
+    )[:args.top]
+
+    results = {
+        'benchmark': 'startup',
+        'parameters': {'runs': args.runs, 'module': args.module},
+        'median_wall_ms': round(statistics.median(wall_times) * 1000, 3),
+        'median_import_ms': round(statistics.median(import_times) / 1000, 3),
+        'modules_imported': len(modules),
+        'heavy_modules_imported': [
+            name for name in HEAVY_MODULES if name in modules
+        ],
+        'slowest_modules': [
+            {'module': name, 'self_ms': round(self_us / 1000, 3)}
+            for name, (self_us, _) in slowest
+        ],
+    }
+
+    emit(results, args.output)
+
+
+if __name__ == '__main__':
+    main()
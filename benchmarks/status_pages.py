@@ -0,0 +1,61 @@
+"""
+Compare reading a board's status over its socket with its status page.
+
+Usage::
+
+    python -m benchmarks.status_pages --reads 10000
+"""
+
+import argparse
+import time
+
+from robotd.status_page import StatusPageReader
+
+from .fakes import make_fake_board
+from .harness import BenchClient, emit, running_board, summarise
+
+
+def _time_reads(reads, read):
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(reads):
+        read_start = time.perf_counter()
+        read()
+        latencies.append(time.perf_counter() - read_start)
+    return summarise(latencies, time.perf_counter() - start)
+
+
+def bench(board_type_id, reads):
+    """Time status reads both ways, returning a summary dict."""
+    with running_board(make_fake_board(board_type_id, {})) as socket_path:
+        client = BenchClient(socket_path)
+        page = StatusPageReader(
+            socket_path.with_name(socket_path.name + '.status'),
+        )
+        try:
+            return {
+                'socket': _time_reads(reads, lambda: client.request({})),
+                'status_page': _time_reads(reads, page.read),
+            }
+        finally:
+            page.close()
+            client.close()
+
+
+def main(args=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--board', default='motor')
+    parser.add_argument('--reads', type=int, default=10000)
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args(args)
+
+    emit({
+        'benchmark': 'status_pages',
+        'parameters': {'board': args.board, 'reads': args.reads},
+        'results': bench(args.board, args.reads),
+    }, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""
+Change notification benchmark: polling loops against subscriptions.
+
+Runs a board whose status has one field which changes at a fixed rate
+alongside a larger, static one (as a camera's markers or a servo assembly's
+pin values might be), and watches the changing field for a while, first by
+polling the status in a loop and then by subscribing to the field. Reports
+how many messages and bytes each took, and how long after each change it
+was seen.
+
+Usage::
+
+    python -m benchmarks.subscriptions --change-rate 20 --poll-rate 200 --seconds 2
+"""
+
+import argparse
+import json
+import time
+
+from robotd.devices_base import Board
+
+from .harness import BenchClient, emit, running_board, summarise
+
+
+class ChangingBoard(Board):
+    """A board with a field which is set to the time on every tick."""
+
+    board_type_id = 'changing'
+    enabled = False
+    tracks_status_changes = True
+
+    @classmethod
+    def name(cls, node):
+        return 'changing'
+
+    def start(self):
+        self.changed_at = time.monotonic()
+        self.payload = [{'id': index, 'distance': 1.5} for index in range(50)]
+
+    def tick(self, now):
+        self.changed_at = now
+        self.status_changed()
+
+    def status(self):
+        return {'changed-at': self.changed_at, 'payload': self.payload}
+
+
+class CountingClient(BenchClient):
+    """A `BenchClient` which counts the messages and bytes it receives."""
+
+    def __init__(self, socket_path):
+        self.messages = 0
+        self.bytes = 0
+        super().__init__(socket_path)
+
+    def _read_message(self):
+        line = self.file.readline()
+        if not line:
+            raise ConnectionError('robotd closed the connection')
+        self.messages += 1
+        self.bytes += len(line)
+        return json.loads(line.decode('utf-8'))
+
+
+def _watch(client, seconds, next_change):
+    """Collect the latency of each change seen, until time is up."""
+    latencies = []
+    seen = None
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        changed_at = next_change()
+        if changed_at is not None and changed_at != seen:
+            latencies.append(time.monotonic() - changed_at)
+            seen = changed_at
+    return latencies
+
+
+def bench_polling(socket_path, seconds, poll_rate):
+    """Watch the field by polling for the status."""
+    client = CountingClient(socket_path)
+    interval = 1 / poll_rate
+
+    def next_change():
+        time.sleep(interval)
+        status, _ = client.request({})
+        return status['changed-at']
+
+    cpu_start = time.process_time()
+    latencies = _watch(client, seconds, next_change)
+    cpu_seconds = time.process_time() - cpu_start
+    client.close()
+    return _results(client, latencies, seconds, cpu_seconds)
+
+
+def bench_subscription(socket_path, seconds, max_rate):
+    """Watch the field by subscribing to it."""
+    client = CountingClient(socket_path)
+    client.request({'subscribe': ['changed-at'], 'max-rate': max_rate})
+    client.messages = client.bytes = 0
+
+    def next_change():
+        return client._read_message()['subscription']['changed-at']
+
+    cpu_start = time.process_time()
+    latencies = _watch(client, seconds, next_change)
+    cpu_seconds = time.process_time() - cpu_start
+    client.close()
+    return _results(client, latencies, seconds, cpu_seconds)
+
+
+def _results(client, latencies, seconds, cpu_seconds):
+    return {
+        'messages_received': client.messages,
+        'bytes_received': client.bytes,
+        'client_cpu_seconds': round(cpu_seconds, 4),
+        'changes_seen': summarise(latencies, seconds),
+    }
+
+
+def main(args=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument(
+        '--change-rate',
+        type=float,
+        default=20,
+        help='changes to the field per second (default: 20)',
+    )
+    parser.add_argument(
+        '--poll-rate',
+        type=float,
+        default=200,
+        help='polls per second, and the subscription max-rate (default: 200)',
+    )
+    parser.add_argument('--seconds', type=float, default=2)
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args(args)
+
+    board = ChangingBoard({})
+    tick_rates = {ChangingBoard.board_type_id: args.change_rate}
+    with running_board(board, tick_rates=tick_rates) as socket_path:
+        results = {
+            'polling': bench_polling(socket_path, args.seconds, args.poll_rate),
+            'subscription': bench_subscription(
+                socket_path,
+                args.seconds,
+                args.poll_rate,
+            ),
+        }
+
+    emit({
+        'benchmark': 'subscriptions',
+        'parameters': {
+            'change_rate': args.change_rate,
+            'poll_rate': args.poll_rate,
+            'seconds': args.seconds,
+        },
+        'watchers': results,
+    }, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Overhead of the always-on hot-path tracing.
+
+Measures the cost of recording one span, with tracing enabled and disabled,
+and checks it against `robotd.tracing.OVERHEAD_BUDGET`. Exits non-zero if
+the enabled cost is over budget.
+
+Usage::
+
+    python -m benchmarks.tracing --iterations 200000
+"""
+
+import argparse
+import sys
+import time
+
+from robotd.tracing import OVERHEAD_BUDGET, Tracer
+
+from .harness import emit
+
+
+def _time_loop(tracer, iterations):
+    span = tracer.span
+    start = time.perf_counter()
+    for _ in range(iterations):
+        with span('command'):
+            pass
+    return time.perf_counter() - start
+
+
+def _baseline(iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        pass
+    return time.perf_counter() - start
+
+
+def main(args=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--iterations', type=int, default=200000)
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args(args)
+
+    baseline = _baseline(args.iterations)
+
+    enabled = Tracer()
+    disabled = Tracer()
+    disabled.enabled = False
+
+    def per_span(tracer):
+        elapsed = _time_loop(tracer, args.iterations) - baseline
+        return max(0, elapsed) / args.iterations
+
+    enabled_cost = per_span(enabled)
+    disabled_cost = per_span(disabled)
+
+    results = {
+        'benchmark': 'tracing',
+        'parameters': {'iterations': args.iterations},
+        'budget_us': OVERHEAD_BUDGET * 1e6,
+        'enabled_us_per_span': round(enabled_cost * 1e6, 4),
+        'disabled_us_per_span': round(disabled_cost * 1e6, 4),
+        'within_budget': enabled_cost <= OVERHEAD_BUDGET,
+    }
+
+    emit(results, args.output)
+
+    if not results['within_budget']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
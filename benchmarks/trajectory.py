@@ -0,0 +1,138 @@
+"""
+Acceleration ramp benchmark: client-driven setpoints against a trajectory.
+
+Runs a fake motor board in a real `BoardRunner` and ramps a motor from rest
+to full speed twice: first by sending a speed command at each step, as a
+client without trajectories must, and then with one trajectory command
+which the board plays out on its own tick. Reports what each costs the
+client, and how late the setpoints were relative to their schedule.
+
+Usage::
+
+    python -m benchmarks.trajectory --duration 1 --rate 50
+"""
+
+import argparse
+import socket
+import time
+
+from .fakes import make_fake_board
+from .harness import BenchClient, emit, running_board, summarise
+
+
+def _read_metric(metrics_path, name):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(str(metrics_path))
+        text = b''.join(iter(lambda: sock.recv(65536), b'')).decode('utf-8')
+
+    for line in text.splitlines():
+        if line.startswith(name + '{') or line.startswith(name + ' '):
+            return float(line.rsplit(' ', 1)[1])
+    return 0
+
+
+def bench_client_ramp(socket_path, duration, rate):
+    """Ramp by sending a speed command for every setpoint."""
+    client = BenchClient(socket_path)
+    steps = int(duration * rate)
+    latencies = []
+    lateness = []
+
+    cpu_start = time.process_time()
+    start = time.monotonic()
+    for step in range(steps + 1):
+        deadline = start + step / rate
+        time.sleep(max(0, deadline - time.monotonic()))
+
+        sent = time.monotonic()
+        lateness.append(sent - deadline)
+        client.request({'m0': step / steps})
+        latencies.append(time.monotonic() - sent)
+
+    cpu_seconds = time.process_time() - cpu_start
+    client.close()
+
+    return {
+        'messages': steps + 1,
+        'client_cpu_seconds': round(cpu_seconds, 4),
+        'requests': summarise(latencies, time.monotonic() - start),
+        # Each setpoint then takes the request's latency to reach the board
+        'mean_send_lateness_ms': round(1000 * sum(lateness) / len(lateness), 4),
+    }
+
+
+def bench_trajectory(socket_path, duration, rate):
+    """Ramp with a single trajectory command."""
+    metrics_path = socket_path.with_name(socket_path.name + '.metrics')
+    lateness_sum = 'robotd_tick_lateness_seconds_sum'
+    lateness_count = 'robotd_tick_lateness_seconds_count'
+    initial_sum = _read_metric(metrics_path, lateness_sum)
+    initial_count = _read_metric(metrics_path, lateness_count)
+
+    client = BenchClient(socket_path)
+    cpu_start = time.process_time()
+    client.request({'trajectory': {'m0': {'from': 0, 'to': 1, 'duration': duration}}})
+    cpu_seconds = time.process_time() - cpu_start
+
+    # Allow for the tick which sends the last setpoint
+    time.sleep(duration + 2 / rate)
+    status, _ = client.request({})
+    client.close()
+
+    ticks = _read_metric(metrics_path, lateness_count) - initial_count
+    lateness = _read_metric(metrics_path, lateness_sum) - initial_sum
+
+    return {
+        'messages': 1,
+        'client_cpu_seconds': round(cpu_seconds, 4),
+        'final_speed': status['m0'],
+        'ticks': int(ticks),
+        'mean_setpoint_lateness_ms': (
+            round(1000 * lateness / ticks, 4) if ticks else None
+        ),
+    }
+
+
+def main(args=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument(
+        '--duration',
+        type=float,
+        default=1,
+        help='seconds over which to ramp up (default: 1)',
+    )
+    parser.add_argument(
+        '--rate',
+        type=int,
+        default=50,
+        help='setpoints per second (default: 50)',
+    )
+    parser.add_argument('--serial-delay', type=float, default=0)
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args(args)
+
+    board = make_fake_board('motor', {'serial': args.serial_delay})
+    with running_board(board, tick_rates={'motor': args.rate}) as socket_path:
+        results = {
+            'client': bench_client_ramp(socket_path, args.duration, args.rate),
+            'trajectory': bench_trajectory(
+                socket_path,
+                args.duration,
+                args.rate,
+            ),
+        }
+
+    emit({
+        'benchmark': 'trajectory',
+        'parameters': {
+            'duration': args.duration,
+            'rate': args.rate,
+            'serial_delay': args.serial_delay,
+        },
+        'ramps': results,
+    }, args.output)
+
+
+if __name__ == '__main__':
+    main()
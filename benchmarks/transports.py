@@ -0,0 +1,70 @@
+"""
+Compare the stream and seqpacket transports for board sockets.
+
+Runs each fake board in a `BoardRunner` listening on both its stream socket
+and its ``.seqpacket`` socket, and drives each in turn with the same load.
+
+Usage::
+
+    python -m benchmarks.transports --clients 4 --commands 1000
+"""
+
+import argparse
+
+from .fakes import FAKE_BOARDS, make_fake_board
+from .harness import emit, running_board
+from .sockets import bench_socket
+
+
+def bench_board(board_type_id, clients, commands):
+    """Benchmark one board type over both transports."""
+    board = make_fake_board(board_type_id, {})
+    _, _, command = FAKE_BOARDS[board_type_id]
+
+    with running_board(board, seqpacket=True) as socket_path:
+        seqpacket_path = socket_path.with_name(socket_path.name + '.seqpacket')
+        return {
+            'stream': bench_socket(socket_path, command, clients, commands),
+            'seqpacket': bench_socket(
+                seqpacket_path,
+                command,
+                clients,
+                commands,
+                seqpacket=True,
+            ),
+        }
+
+
+def main(args=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument(
+        '--boards',
+        default='motor',
+        help='comma-separated board types to run (default: motor)',
+    )
+    parser.add_argument('--clients', type=int, default=4)
+    parser.add_argument(
+        '--commands',
+        type=int,
+        default=1000,
+        help='commands sent by each client',
+    )
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args(args)
+
+    emit({
+        'benchmark': 'transports',
+        'parameters': {
+            'clients': args.clients,
+            'commands_per_client': args.commands,
+        },
+        'boards': {
+            board_type_id: bench_board(board_type_id, args.clients, args.commands)
+            for board_type_id in args.boards.split(',')
+        },
+    }, args.output)
+
+
+if __name__ == '__main__':
+    main()
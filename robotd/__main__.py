@@ -0,0 +1,11 @@
+"""
+Run robotd with ``python -m robotd``.
+
+This is preferred over running ``robotd.master`` directly: runners started
+with the spawn or forkserver methods re-import the main module unless it is
+a ``__main__`` module, so keeping this one trivial keeps them lean.
+"""
+
+if __name__ == '__main__':
+    from robotd.master import main_cmdline
+    main_cmdline()
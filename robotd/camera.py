@@ -1,12 +1,22 @@
 """A camera device."""
 
 import time
+import warnings
 from pathlib import Path
 
-from sb_vision import Camera as VisionCamera
-from sb_vision import Token, Vision
+from . import tracing
+from .devices_base import Board, LazyModule, Priority, module_available
 
-from .devices_base import Board
+# See if we have vision support, without paying to import it
+ENABLE_VISION = module_available('sb_vision')
+
+if not ENABLE_VISION:
+    warnings.warn(
+        "sb_vision not installed, disabling vision support",
+        category=ImportWarning,
+    )
+
+sb_vision = LazyModule('sb_vision')
 
 
 class Camera(Board):
@@ -16,6 +26,9 @@ class Camera(Board):
         'subsystem': 'video4linux',
     }
 
+    enabled = ENABLE_VISION
+    tracks_status_changes = True
+
     DISTANCE_MODEL = 'c270'
     IMAGE_SIZE = (1280, 720)
 
@@ -30,12 +43,12 @@ class Camera(Board):
 
     def start(self):
         if not self.camera:
-            self.camera = VisionCamera(
+            self.camera = sb_vision.Camera(
                 int(self.node['MINOR']),
                 self.IMAGE_SIZE,
                 self.DISTANCE_MODEL,
             )
-        self.vision = Vision(self.camera)
+        self.vision = sb_vision.Vision(self.camera)
 
         self._status = {
             'snapshot_timestamp': None,
@@ -47,9 +60,10 @@ class Camera(Board):
             'snapshot_timestamp': time.time(),
             'markers': markers,
         }
+        self.status_changed()
 
     @staticmethod
-    def _serialise_marker(marker: Token):
+    def _serialise_marker(marker: 'sb_vision.Token'):
         d = marker.__dict__
         d['homography_matrix'] = marker.homography_matrix.tolist()
         d['cartesian'] = marker.cartesian.tolist()
@@ -58,12 +72,17 @@ class Camera(Board):
     def status(self):
         return self._status
 
+    def command_priority(self, cmd):
+        return Priority.BULK if cmd.get('see', False) else Priority.NORMAL
+
     def command(self, cmd):
         """Run user-provided command."""
         if cmd.get('see', False):
+            with tracing.span('vision-snapshot'):
+                tokens = self.vision.snapshot()
             self._update_status(markers=[
                 self._serialise_marker(x)
-                for x in self.vision.snapshot()
+                for x in tokens
             ])
             # rely on the status being sent back to the requesting connection
             # by the ``BoardRunner``.
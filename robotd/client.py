@@ -0,0 +1,375 @@
+"""
+Client library for talking to robotd.
+
+`Client` finds the boards under robotd's root directory and keeps a small
+pool of persistent connections to each one. Requests are pipelined: any
+number can be in flight on a connection at once, and each gets its own
+reply, since a board replies to each connection's messages in order::
+
+    client = Client()
+    reply = await client.request('motor/<id>', {'m0': 0.5})
+    print(reply.status, reply.response)
+
+    async for message in await client.broadcasts('camera/<id>'):
+        ...
+
+`SyncClient` offers the same operations as blocking calls, running the
+connections on an event loop in a background thread.
+"""
+
+import asyncio
+import collections
+import json
+import os
+import stat
+import threading
+from pathlib import Path
+
+DEFAULT_ROOT_DIR = Path('/var/robotd')
+
+# Longest message which will be read, such as a camera status full of markers
+MAX_MESSAGE_SIZE = 16 * 1024 * 1024
+
+Reply = collections.namedtuple('Reply', ('status', 'response'))
+
+
+def discover(root_dir=DEFAULT_ROOT_DIR):
+    """
+    Find the boards being served under `root_dir`.
+
+    Returns a dict of socket paths, keyed by ``<type>/<id>``.
+    """
+    boards = {}
+    for path in sorted(Path(root_dir).glob('*/*')):
+        # Side files, such as the `.metrics` sockets, have a suffix
+        if '.' in path.name:
+            continue
+        try:
+            if not stat.S_ISSOCK(os.stat(str(path)).st_mode):
+                continue
+        except FileNotFoundError:
+            continue
+        boards['{}/{}'.format(path.parent.name, path.name)] = path
+    return boards
+
+
+class BroadcastStream:
+    """An asynchronous iterator over the broadcasts from a board."""
+
+    def __init__(self, queue):
+        self._queue = queue
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        message = await self._queue.get()
+        if message is None:
+            raise StopAsyncIteration
+        return message
+
+    async def get(self):
+        """Wait for the next broadcast, or ``None`` once disconnected."""
+        return await self._queue.get()
+
+
+class BoardConnection:
+    """
+    A persistent connection to one board.
+
+    `status` is the board's latest status, as received with any reply, and
+    `version` its version.
+    """
+
+    def __init__(self, reader, writer, loop, forward_broadcasts=True):
+        self._reader = reader
+        self._writer = writer
+        self._loop = loop
+        self._pending = collections.deque()
+        self._response = None
+        self.forward_broadcasts = forward_broadcasts
+        self.broadcast_queue = asyncio.Queue()
+        self.status = None
+        self.version = None
+        self.closed = False
+        self._read_task = None
+
+    @classmethod
+    async def open(cls, path, loop=None, forward_broadcasts=True):
+        """Connect to the board at `path`, and wait for its greeting."""
+        loop = loop or asyncio.get_event_loop()
+        reader, writer = await asyncio.open_unix_connection(
+            str(path),
+            limit=MAX_MESSAGE_SIZE,
+        )
+        connection = cls(reader, writer, loop, forward_broadcasts)
+
+        # The runner greets every new connection with the board's status
+        greeting = await connection._read_message()
+        if greeting is None:
+            writer.close()
+            raise ConnectionError('Board closed the connection')
+        connection._update_status(greeting)
+
+        connection._read_task = asyncio.ensure_future(
+            connection._read_loop(),
+            loop=loop,
+        )
+        return connection
+
+    async def _read_message(self):
+        line = await self._reader.readline()
+        if not line:
+            return None
+        return json.loads(line.decode('utf-8'))
+
+    def _update_status(self, status):
+        if not status.get('not-modified'):
+            self.status = status
+            self.version = status.get('version')
+
+    async def _read_loop(self):
+        try:
+            while True:
+                message = await self._read_message()
+                if message is None:
+                    break
+
+                if message.get('broadcast'):
+                    # Subscription pushes are only sent to the connection
+                    # which subscribed
+                    if self.forward_broadcasts or 'subscription' in message:
+                        self.broadcast_queue.put_nowait(message)
+                elif message.keys() == {'response'}:
+                    self._response = message['response']
+                else:
+                    self._update_status(message)
+                    reply = Reply(message, self._response)
+                    self._response = None
+                    if self._pending:
+                        future = self._pending.popleft()
+                        if not future.done():
+                            future.set_result(reply)
+        except (OSError, ValueError) as e:
+            self._fail(e)
+        else:
+            self._fail(ConnectionError('Board closed the connection'))
+
+    def _fail(self, error):
+        self.closed = True
+        while self._pending:
+            future = self._pending.popleft()
+            if not future.done():
+                future.set_exception(error)
+        self.broadcast_queue.put_nowait(None)
+
+    async def request(self, command):
+        """Send `command`, and wait for the `Reply` to it."""
+        if self.closed:
+            raise ConnectionError('Connection to the board is closed')
+
+        future = self._loop.create_future()
+        self._pending.append(future)
+        self._writer.write(json.dumps(command).encode('utf-8') + b'\n')
+        await self._writer.drain()
+        return await future
+
+    async def poll(self):
+        """
+        Fetch the board's latest status.
+
+        Only the status's version is sent back if it hasn't changed since
+        the last one received, in which case the cached `status` is used.
+        """
+        command = {} if self.version is None else {'if-newer-than': self.version}
+        await self.request(command)
+        return self.status
+
+    async def subscribe(self, fields, max_rate=None):
+        """
+        Have the board push changes to the given status `fields`.
+
+        The pushes arrive in the `broadcasts` stream, as broadcasts with a
+        ``subscription`` key. An empty list of fields unsubscribes.
+        """
+        command = {'subscribe': list(fields)}
+        if max_rate is not None:
+            command['max-rate'] = max_rate
+        reply = await self.request(command)
+        return reply.response
+
+    def broadcasts(self):
+        """A `BroadcastStream` of this connection's broadcasts."""
+        return BroadcastStream(self.broadcast_queue)
+
+    async def close(self):
+        self._writer.close()
+        if self._read_task is not None:
+            await self._read_task
+
+
+class Client:
+    """
+    An asynchronous client for all the boards under `root_dir`.
+
+    Up to `pool_size` connections are opened to each board, as they are
+    needed, and requests are spread across them.
+    """
+
+    def __init__(self, root_dir=DEFAULT_ROOT_DIR, pool_size=1, loop=None):
+        self.root_dir = Path(root_dir)
+        self.pool_size = pool_size
+        self.loop = loop or asyncio.get_event_loop()
+        self._pools = collections.defaultdict(list)
+        self._next_index = collections.Counter()
+        # Created lazily, from coroutines, so they belong to the running loop
+        self._locks = collections.defaultdict(asyncio.Lock)
+
+    def boards(self):
+        """The ``<type>/<id>`` names of all the boards being served."""
+        return list(discover(self.root_dir).keys())
+
+    async def connection(self, board):
+        """A pooled `BoardConnection` to `board`, given as ``<type>/<id>``."""
+        pool = self._pools[board]
+        pool[:] = [connection for connection in pool if not connection.closed]
+
+        if len(pool) < self.pool_size:
+            async with self._locks[board]:
+                if len(pool) < self.pool_size:
+                    type_id, _, name = board.partition('/')
+                    connection = await BoardConnection.open(
+                        self.root_dir / type_id / name,
+                        loop=self.loop,
+                        # Every connection gets every broadcast, so only
+                        # pass on one copy of each
+                        forward_broadcasts=not any(
+                            existing.forward_broadcasts for existing in pool
+                        ),
+                    )
+                    pool.append(connection)
+                    return connection
+
+        index = self._next_index[board] % len(pool)
+        self._next_index[board] += 1
+        return pool[index]
+
+    async def request(self, board, command):
+        """Send `command` to `board`, and wait for the `Reply`."""
+        connection = await self.connection(board)
+        return await connection.request(command)
+
+    async def request_many(self, commands):
+        """
+        Send commands to several boards at once.
+
+        `commands` maps board names to commands; returns a dict of `Reply`s
+        with the same keys.
+        """
+        boards = list(commands.keys())
+        replies = await asyncio.gather(*[
+            self.request(board, commands[board])
+            for board in boards
+        ])
+        return dict(zip(boards, replies))
+
+    async def poll(self, board):
+        """Fetch the latest status of `board`; see `BoardConnection.poll`."""
+        connection = await self.connection(board)
+        return await connection.poll()
+
+    async def _broadcasting_connection(self, board):
+        # Make sure that the connection which forwards broadcasts is open
+        await self.connection(board)
+        for connection in self._pools[board]:
+            if connection.forward_broadcasts:
+                return connection
+
+    async def broadcasts(self, board):
+        """A `BroadcastStream` of the broadcasts from `board`."""
+        connection = await self._broadcasting_connection(board)
+        return connection.broadcasts()
+
+    async def subscribe(self, board, fields, max_rate=None):
+        """
+        Have `board` push changes to the given status `fields`.
+
+        The pushes arrive with the board's other `broadcasts`; see
+        `BoardConnection.subscribe`.
+        """
+        connection = await self._broadcasting_connection(board)
+        return await connection.subscribe(fields, max_rate)
+
+    async def close(self):
+        for pool in self._pools.values():
+            for connection in pool:
+                await connection.close()
+        self._pools.clear()
+
+
+class SyncClient:
+    """
+    A blocking client for all the boards under `root_dir`.
+
+    The connections are run by an event loop on a background thread, so
+    that broadcasts keep being received between calls.
+    """
+
+    def __init__(self, root_dir=DEFAULT_ROOT_DIR, pool_size=1, timeout=None):
+        self.timeout = timeout
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever,
+            daemon=True,
+        )
+        self._thread.start()
+        self._client = Client(root_dir, pool_size, loop=self._loop)
+        self._streams = {}
+
+    def _run(self, coroutine, timeout=None):
+        if timeout is None:
+            timeout = self.timeout
+        if timeout is not None:
+            # Time out on the loop, so that the coroutine is cancelled rather
+            # than left running, to take a reply or broadcast meant for a
+            # later call
+            coroutine = asyncio.wait_for(coroutine, timeout)
+        future = asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+        return future.result()
+
+    def boards(self):
+        """The ``<type>/<id>`` names of all the boards being served."""
+        return self._client.boards()
+
+    def request(self, board, command):
+        """Send `command` to `board`, and wait for the `Reply`."""
+        return self._run(self._client.request(board, command))
+
+    def request_many(self, commands):
+        """Send commands to several boards at once; see `Client`."""
+        return self._run(self._client.request_many(commands))
+
+    def poll(self, board):
+        """Fetch the latest status of `board`."""
+        return self._run(self._client.poll(board))
+
+    def subscribe(self, board, fields, max_rate=None):
+        """Have `board` push changes to the given status `fields`."""
+        return self._run(self._client.subscribe(board, fields, max_rate))
+
+    def next_broadcast(self, board, timeout=None):
+        """
+        Wait for the next broadcast from `board`.
+
+        Broadcasts which arrived since the last call are returned first.
+        Returns ``None`` if the board disconnects.
+        """
+        if board not in self._streams:
+            self._streams[board] = self._run(self._client.broadcasts(board))
+        return self._run(self._streams[board].get(), timeout)
+
+    def close(self):
+        self._run(self._client.close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
@@ -8,29 +8,25 @@ import os.path
 import random
 import re
 import struct
-import subprocess
-import warnings
+import time
 from typing import Any, List, Tuple
 
-import serial
-
-from . import usb
-from .devices_base import Board, BoardMeta
-
-try:
-    # See if we have vision support
-    import sb_vision  # noqa: F401
-    ENABLE_VISION = True
-except ImportError:
-    warnings.warn(
-        "sb_vision not installed, disabling vision support",
-        category=ImportWarning,
-    )
-    ENABLE_VISION = False
-
-if ENABLE_VISION:
-    # Register the camera 'board' by importing it
-    from .camera import Camera  # noqa: F401
+from . import tracing
+# Register the camera 'board' by importing it
+from .camera import Camera  # noqa: F401
+from .devices_base import (
+    Board,
+    BoardMeta,
+    LazyModule,
+    Priority,
+    merge_setpoints,
+)
+from .rtt import RttEstimator
+from .trajectory import InvalidTrajectory, Trajectory
+
+# Hardware backends, only imported by the runners which use them
+serial = LazyModule('serial')
+usb = LazyModule('robotd.usb')
 
 LOGGER = logging.getLogger(__name__)
 
@@ -43,6 +39,16 @@ class MotorBoard(Board):
         'subsystem': 'tty',
     }
 
+    SPEED_KEYS = frozenset(('m0', 'm1'))
+
+    # Opcode which sets the speed of each motor
+    SPEED_OPCODES = {'m0': 2, 'm1': 3}
+
+    # Rate at which trajectories are played out, while there are any
+    tick_rate = 50
+
+    tracks_status_changes = True
+
     @classmethod
     def included(cls, node):
         # Also check the human-readable string as well as the numeric ID,
@@ -58,9 +64,14 @@ class MotorBoard(Board):
     def start(self):
         """Open connection to peripheral."""
         device = self.node['DEVNAME']
-        self.connection = serial.Serial(device, baudrate=1000000)
+        self.connection = self._open_connection(device)
+        # Motor -> (start time, `Trajectory`)
+        self._trajectories = {}
         self.make_safe()
 
+    def _open_connection(self, device):
+        return serial.Serial(device, baudrate=1000000)
+
     def make_safe(self):
         """
         Set peripheral to a safe state.
@@ -68,8 +79,11 @@ class MotorBoard(Board):
         This is called after control connections have died.
         """
         # set both motors to brake
-        self.connection.write(b'\x00\x02\x02\x03\x02')
+        self._trajectories.clear()
+        with tracing.span('serial-write'):
+            self.connection.write(b'\x00\x02\x02\x03\x02')
         self._status = {'m0': 'brake', 'm1': 'brake'}
+        self.status_changed()
 
     def status(self):
         """Brief status description of the peripheral."""
@@ -92,17 +106,115 @@ class MotorBoard(Board):
         else:
             raise ValueError('Unknown speed value: {}'.format(value))
 
+    def command_priority(self, cmd):
+        if 'brake' in (cmd.get('m0'), cmd.get('m1')):
+            return Priority.SAFETY
+        if cmd.keys() <= self.SPEED_KEYS:
+            return Priority.SETPOINT
+        return Priority.NORMAL
+
+    def coalesce_commands(self, older, newer):
+        if older.keys() <= self.SPEED_KEYS and newer.keys() <= self.SPEED_KEYS:
+            return merge_setpoints(older, newer)
+        return None
+
     def command(self, cmd):
         """Run user-provided command."""
+        if 'trajectory' in cmd:
+            cmd = dict(cmd)
+            try:
+                self._start_trajectories(cmd.pop('trajectory'), cmd.keys())
+            except InvalidTrajectory as e:
+                return {
+                    'status': 'error',
+                    'type': type(e).__name__,
+                    'description': str(e),
+                }
+            if not cmd:
+                return
+
+        # Setting a speed directly takes over from any trajectory
+        for motor in self.SPEED_KEYS & cmd.keys():
+            self._trajectories.pop(motor, None)
+
         self._status.update(cmd)
-        self.connection.write(bytes([
-            2, 2,
-            3, 2,
-            2, 1,
-            3, 1,
-            2, self.byte_for_speed(self._status['m0']),
-            3, self.byte_for_speed(self._status['m1']),
-        ]))
+        self.status_changed()
+        with tracing.span('serial-write'):
+            self.connection.write(bytes([
+                2, 2,
+                3, 2,
+                2, 1,
+                3, 1,
+                2, self.byte_for_speed(self._status['m0']),
+                3, self.byte_for_speed(self._status['m1']),
+            ]))
+
+    def _start_trajectories(self, spec, overridden):
+        """
+        Start playing out the trajectories in `spec`.
+
+        `spec` maps motors to trajectories, or to ``None`` to cancel the
+        motor's trajectory and leave it at its current speed; ``None`` on its
+        own cancels all of them. Motors in `overridden` are being given a
+        speed by the same command, so their trajectories are left alone.
+        """
+        if spec is None:
+            self._trajectories.clear()
+            return
+
+        if not isinstance(spec, dict) or not spec.keys() <= self.SPEED_KEYS:
+            raise InvalidTrajectory(
+                'Trajectories must be given for m0 and/or m1, not {!r}'.format(spec),
+            )
+
+        now = time.monotonic()
+        trajectories = {}
+        for motor, motor_spec in spec.items():
+            if motor_spec is not None:
+                current = self._status[motor]
+                trajectories[motor] = (now, Trajectory.from_spec(
+                    motor_spec,
+                    initial_speed=0 if isinstance(current, str) else current,
+                ))
+
+        # Only change anything once the whole command has been understood
+        for motor in spec.keys() - overridden:
+            self._trajectories.pop(motor, None)
+            if motor in trajectories:
+                self._trajectories[motor] = trajectories[motor]
+
+        self.tick(now)
+
+    def wants_tick(self):
+        return bool(self._trajectories)
+
+    def tick(self, now):
+        """Send the current setpoints of any trajectories being played out."""
+        if not self._trajectories:
+            return
+
+        data = []
+        for motor, (start, trajectory) in list(self._trajectories.items()):
+            elapsed = now - start
+            speed = trajectory.speed_at(elapsed)
+            if elapsed >= trajectory.duration:
+                del self._trajectories[motor]
+
+            previous = self._status[motor]
+            if speed == previous:
+                continue
+
+            self._status[motor] = speed
+            self.status_changed()
+
+            # Only setpoints which the board would notice are written
+            byte = self.byte_for_speed(speed)
+            if isinstance(previous, str) or byte != self.byte_for_speed(previous):
+                data += [self.SPEED_OPCODES[motor], byte]
+
+        if data:
+            with tracing.span('serial-write'):
+                self.connection.write(bytes(data))
 
 
 class BrainTemperatureSensor(Board):
@@ -213,10 +325,23 @@ class PowerBoard(Board):
         'ID_VENDOR_ID': '1bda',
     }
 
+    # The start button is polled in the background, so that status requests
+    # don't each wait on a USB transfer.
+    tick_rate = 20
+    tracks_status_changes = True
+
     @classmethod
     def included(cls, node):
         return node['ID_MODEL_ID'] == '0010'
 
+    def __init__(self, node):
+        super().__init__(node)
+        self._start_button = False
+        self._control_transfer_seconds = self.metrics.histogram(
+            'robotd_usb_control_transfer_seconds',
+            'Time spent in USB control transfers to the power board',
+        )
+
     @classmethod
     def name(cls, node):
         """Board name."""
@@ -239,17 +364,20 @@ class PowerBoard(Board):
 
         self.device.open()
         self.make_safe()
+        self.tick(None)
 
-        # This power board is now ready; signal to systemd that robotd is
-        # therefore ready
-        subprocess.check_call([
-            'systemd-notify',
-            '--ready',
-            '--pid={}'.format(os.getppid()),
-        ])
+    def _control_write(self, request, value, index, data=None):
+        with tracing.span('usb-control-write'):
+            with self._control_transfer_seconds.time():
+                self.device.control_write(request, value, index, data)
+
+    def _control_read(self, request, value, index, length):
+        with tracing.span('usb-control-read'):
+            with self._control_transfer_seconds.time():
+                return self.device.control_read(request, value, index, length)
 
     def _set_power_output(self, output: PowerOutput, level: bool) -> None:
-        self.device.control_write(
+        self._control_write(
             64,
             int(level),
             output.value,
@@ -260,22 +388,37 @@ class PowerBoard(Board):
             self._set_power_output(output, level)
 
     def _set_start_led(self, value):
-        self.device.control_write(64, value, 6)
+        self._control_write(64, value, 6)
 
     def _buzz_piezo(self, args):
         data = struct.pack("HH", args['frequency'], args['duration'])
-        self.device.control_write(64, 0, 8, data)
+        self._control_write(64, 0, 8, data)
 
     @property
     def start_button_status(self):
-        result = self.device.control_read(64, 0, 8, 4)
+        result = self._control_read(64, 0, 8, 4)
         return any(result)
 
     def make_safe(self):
         self._set_power_outputs(0)
 
+    def tick(self, now):
+        start_button = self.start_button_status
+        if start_button != self._start_button:
+            self._start_button = start_button
+            self.status_changed()
+
     def status(self):
-        return {'start-button': self.start_button_status}
+        return {'start-button': self._start_button}
+
+    def command_priority(self, cmd):
+        if 'power-level' in cmd:
+            turning_off = not cmd['power-level']
+        elif 'power' in cmd:
+            turning_off = not cmd['power']
+        else:
+            turning_off = False
+        return Priority.SAFETY if turning_off else Priority.NORMAL
 
     def command(self, cmd):
         if 'power-output' in cmd and 'power-level' in cmd:
@@ -304,6 +447,18 @@ class CommandError(RuntimeError):
         return "\n".join([self.error, ''] + self.comments)
 
 
+class CommandTimeout(CommandError):
+    """The servo assembly did not reply to a command, however often asked."""
+
+    def __init__(self, command: Tuple[Any, ...], attempts: int) -> None:
+        super().__init__(
+            command,
+            'No reply after {} attempts'.format(attempts),
+            [],
+        )
+        self.attempts = attempts
+
+
 class InvalidResponse(ValueError):
     """The servo assembly emitted a response which could not be processed."""
 
@@ -331,6 +486,18 @@ class ServoAssembly(Board):
 
     INPUT = 'Z'
 
+    # How long to wait for a reply is chosen from the measured round-trip
+    # time of each kind of command, within these bounds (in seconds).
+    # Commands other than these share one estimate, since generic commands
+    # can be anything a client sends.
+    TIMED_COMMANDS = frozenset(('V', 'S', 'W', 'R', 'A', 'U'))
+    INITIAL_TIMEOUT = 0.2
+    MIN_TIMEOUT = 0.02
+    MAX_TIMEOUT = 2.0
+
+    # How many times to send a command before giving up on it
+    MAX_ATTEMPTS = 5
+
     @classmethod
     def included(cls, node):
         if 'ID_MODEL_ID' not in node or 'ID_VENDOR_ID' not in node:
@@ -347,10 +514,36 @@ class ServoAssembly(Board):
         return node.get('ID_SERIAL_SHORT',
                         'SB_{}'.format(node['MINOR']))
 
+    def __init__(self, node):
+        super().__init__(node)
+        self._command_seconds = self.metrics.histogram(
+            'robotd_servo_command_seconds',
+            'Time taken for the servo assembly to complete a command, '
+            'including retries',
+        )
+        self._command_retries = self.metrics.counter(
+            'robotd_servo_command_retries_total',
+            'Number of times a command was reissued to the servo assembly',
+        )
+        self._read_timeouts = self.metrics.counter(
+            'robotd_servo_read_timeouts_total',
+            'Number of times the servo assembly did not reply in time',
+        )
+        self._command_failures = self.metrics.counter(
+            'robotd_servo_command_failures_total',
+            'Number of commands abandoned after running out of attempts',
+        )
+        self._round_trip_seconds = self.metrics.histogram(
+            'robotd_servo_round_trip_seconds',
+            'Time from sending a command to the first line of its reply',
+        )
+        # Command letter, or `None` for any other command -> `RttEstimator`
+        self._round_trip_times = {}
+
     def start(self):
         device = self.node['DEVNAME']
 
-        self.connection = serial.Serial(device, baudrate=115200, timeout=0.2)
+        self.connection = self._open_connection(device)
 
         if hasattr(self.connection, 'reset_input_buffer'):
             self._reset_input_buffer = self.connection.reset_input_buffer
@@ -368,19 +561,57 @@ class ServoAssembly(Board):
         self.make_safe()
         LOGGER.debug('Finished initialising servo assembly on %r', device)
 
+    def _open_connection(self, device):
+        return serial.Serial(
+            device,
+            baudrate=115200,
+            timeout=self.INITIAL_TIMEOUT,
+        )
+
+    def _round_trip_time(self, command):
+        if not isinstance(command, str) or command not in self.TIMED_COMMANDS:
+            command = None
+        try:
+            return self._round_trip_times[command]
+        except KeyError:
+            estimator = self._round_trip_times[command] = RttEstimator(
+                self.INITIAL_TIMEOUT,
+                self.MIN_TIMEOUT,
+                self.MAX_TIMEOUT,
+            )
+            return estimator
+
+    def _set_read_timeout(self, timeout):
+        # Changing the timeout reconfigures the port, so only do so when it
+        # has changed by a millisecond or more
+        timeout = round(timeout, 3)
+        if timeout != self.connection.timeout:
+            self.connection.timeout = timeout
+
     def _command(self, *args, generic_command=False) -> List[str]:
+        with self._command_seconds.time():
+            return self._command_with_retries(args, generic_command)
+
+    def _command_with_retries(self, args, generic_command) -> List[str]:
         command_id = random.randint(1, 65535)
+        round_trip_time = self._round_trip_time(args[0])
+
+        for attempt in range(self.MAX_ATTEMPTS):
+            if attempt:
+                self._command_retries.inc()
 
-        while True:
             self._reset_input_buffer()
+            self._set_read_timeout(round_trip_time.timeout)
 
             command_id_part = '@{id} '.format(id=command_id).encode('utf-8')
             command_args_part = ' '.join(str(x) for x in args).encode('utf-8')
 
             line = command_id_part + command_args_part + b'\n'
-            self.connection.write(b'\0')
-            self.connection.write(line)
-            self.connection.flush()
+            with tracing.span('serial-write'):
+                self.connection.write(b'\0')
+                self.connection.write(line)
+                self.connection.flush()
+            sent_at = time.perf_counter()
 
             LOGGER.debug('Sending to servo assembly: %r', line)
 
@@ -388,12 +619,16 @@ class ServoAssembly(Board):
             results = []  # type: List[str]
 
             while True:
-                line = self.connection.readline()
+                with tracing.span('serial-readline'):
+                    line = self.connection.readline()
 
                 LOGGER.debug('Got back from servo: %r', line)
 
                 if not line:
-                    # Leave the loop and reissue the command
+                    # Leave the loop and reissue the command, waiting
+                    # longer next time
+                    self._read_timeouts.inc()
+                    round_trip_time.backoff()
                     break
 
                 if line.startswith(b'@'):
@@ -406,6 +641,15 @@ class ServoAssembly(Board):
                         LOGGER.debug('Got response for different command, ignoring...')
                         continue
 
+                if sent_at is not None:
+                    rtt = time.perf_counter() - sent_at
+                    self._round_trip_seconds.observe(rtt)
+                    # A reply to a reissued command could be to any of its
+                    # attempts, so only first attempts are timed
+                    if not attempt:
+                        round_trip_time.sample(rtt)
+                    sent_at = None
+
                 try:
                     if line.startswith(b'+ '):
                         return results
@@ -438,11 +682,27 @@ class ServoAssembly(Board):
                 except ValueError:
                     break
 
+        self._command_failures.inc()
+        raise CommandTimeout(args, self.MAX_ATTEMPTS)
+
     def make_safe(self):
-        for servo in range(self.NUM_SERVOS):
-            self._set_servo(servo, None)
-        for pin in self.GPIO_IDS:
-            self._write_pin(pin, self.INPUT)
+        # Make as much safe as the board will let us, but once it has stopped
+        # answering altogether don't wait on it for every servo and pin
+        steps = [
+            (self._set_servo, servo, None)
+            for servo in range(self.NUM_SERVOS)
+        ] + [
+            (self._write_pin, pin, self.INPUT)
+            for pin in self.GPIO_IDS
+        ]
+        for step, output, value in steps:
+            try:
+                step(output, value)
+            except CommandTimeout as e:
+                LOGGER.warning('Servo assembly not answering while making safe: %s', e)
+                return
+            except (CommandError, InvalidResponse) as e:
+                LOGGER.warning('Could not make %r safe: %s', output, e)
 
     def _set_servo(self, servo, status):
         if status is None:
@@ -481,6 +741,13 @@ class ServoAssembly(Board):
 
         self._ultrasound_value = list(sorted(found_values))[1] / 1000.0
 
+    def _error_response(self, error):
+        return {
+            'status': 'error',
+            'type': type(error).__name__,
+            'description': str(error),
+        }
+
     def _generic_command(self, command):
         try:
             return {
@@ -488,11 +755,7 @@ class ServoAssembly(Board):
                 'data': self._command(*command, generic_command=True),
             }
         except (CommandError, InvalidResponse) as e:
-            return {
-                'status': 'error',
-                'type': type(e).__name__,
-                'description': str(e),
-            }
+            return self._error_response(e)
 
     def status(self):
         return {
@@ -504,7 +767,29 @@ class ServoAssembly(Board):
             'ultrasound': self._ultrasound_value,
         }
 
+    def command_priority(self, cmd):
+        if cmd.keys() & {'read-analogue', 'read-ultrasound', 'command'}:
+            return Priority.BULK
+        if cmd.keys() == {'servos'}:
+            return Priority.SETPOINT
+        return Priority.NORMAL
+
+    def coalesce_commands(self, older, newer):
+        # Every command clears the last set of readings, so only pure servo
+        # movements can be merged.
+        if older.keys() == newer.keys() == {'servos'}:
+            return merge_setpoints(older, newer)
+        return None
+
     def command(self, cmd):
+        try:
+            return self._run_command(cmd)
+        except (CommandError, InvalidResponse) as e:
+            # Left to escape, this would stop the runner
+            LOGGER.warning('Servo assembly command failed: %s', e)
+            return self._error_response(e)
+
+    def _run_command(self, cmd):
         # handle servos
         servos = cmd.get('servos', {})
         for servo_id, status in servos.items():
@@ -1,13 +1,123 @@
 """Base classes for boards and peripherals."""
 
+import collections.abc
+import enum
+import importlib
+import importlib.util
 import re
 
+from .metrics import Registry
+
+
+class LazyModule:
+    """
+    Stand-in for a module which is only imported once it is first used.
+
+    Board classes need to be defined (so that the master can match them
+    against udev nodes with their `lookup_keys` and `included`) long before
+    they need their hardware backends. Referring to the backends through
+    one of these means that neither the master nor the runners for other
+    types of board pay for importing them.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+    def __repr__(self):
+        return '<lazy module {!r}>'.format(self._name)
+
+
+def module_available(name):
+    """Whether the named top-level module could be imported, without importing it."""
+    return importlib.util.find_spec(name) is not None
+
+
+class NodeSnapshot(collections.abc.Mapping):
+    """
+    A picklable copy of a udev device.
+
+    Runners may be started in fresh interpreters rather than forked from the
+    master, so boards are sent to them with one of these in place of the
+    live `pyudev.Device`. It provides the parts of that interface which the
+    boards use: the udev properties by key, `sys_name`, `sys_path` and
+    `device_path`.
+    """
+
+    def __init__(self, properties, sys_name, sys_path, device_path):
+        self._properties = dict(properties)
+        self.sys_name = sys_name
+        self.sys_path = sys_path
+        self.device_path = device_path
+
+    @classmethod
+    def from_device(cls, device):
+        """Take a snapshot of a `pyudev.Device`."""
+        # Older versions of pyudev expose the properties on the device itself
+        properties = getattr(device, 'properties', device)
+        return cls(
+            {key: properties[key] for key in properties},
+            device.sys_name,
+            device.sys_path,
+            device.device_path,
+        )
+
+    def __getitem__(self, key):
+        return self._properties[key]
+
+    def __iter__(self):
+        return iter(self._properties)
+
+    def __len__(self):
+        return len(self._properties)
+
+    def __repr__(self):
+        return '<NodeSnapshot {}>'.format(self.device_path)
+
+
+class Priority(enum.IntEnum):
+    """How urgently a command should be run; lower values run first."""
+
+    # Commands which make the hardware safe, such as braking or power-off
+    SAFETY = 0
+    # Idempotent setpoints, such as motor speeds or servo positions
+    SETPOINT = 1
+    NORMAL = 2
+    # Commands which take a long time, such as sensor reads
+    BULK = 3
+
+
+def merge_setpoints(older, newer):
+    """
+    Merge two setpoint commands such that the newer values win.
+
+    Nested dicts (such as servo positions by servo number) are merged one
+    level down, so that setting one servo does not forget another.
+    """
+    merged = dict(older)
+    for key, value in newer.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = dict(merged[key], **value)
+        else:
+            merged[key] = value
+    return merged
+
 
 class BoardMeta(type):
     """
     Metaclass for `Board` subclasses.
 
     This is here to automatically add the instances to a registry.
+
+    Only the board classes themselves are registered, and these must be cheap
+    to import: anything heavy (serial, USB or vision libraries) should be
+    referred to through a `LazyModule` so that it is only loaded in the runner
+    process for a device which actually needs it.
     """
 
     BOARDS = []
@@ -57,6 +167,14 @@ class Board(metaclass=BoardMeta):
     enabled = True
     create_on_startup = False
 
+    # How many times a second to call `tick`, or None not to
+    tick_rate = None
+
+    # Whether the board calls `status_changed` whenever its status changes.
+    # If not, the runner fetches and compares the status on every poll to
+    # find out.
+    tracks_status_changes = False
+
     @classmethod
     def name(cls, node):
         """Simple node name."""
@@ -70,6 +188,9 @@ class Board(metaclass=BoardMeta):
     def __init__(self, node):
         """Standard constructor, run in the master process."""
         self.node = node
+        # Served by the `BoardRunner` alongside its own metrics
+        self.metrics = Registry()
+        self.status_version = 0
 
     def start(self):
         """Open connection to peripheral."""
@@ -91,6 +212,42 @@ class Board(metaclass=BoardMeta):
         """Brief status description of the peripheral."""
         return {}
 
+    def status_changed(self):
+        """Note that `status` now returns something different."""
+        self.status_version += 1
+
+    def tick(self, now):
+        """
+        Do periodic work, such as polling the peripheral.
+
+        Called `tick_rate` times a second, between commands, with the time
+        from `time.monotonic`, whenever `wants_tick`.
+        """
+        pass
+
+    def wants_tick(self):
+        """
+        Whether `tick` has anything to do at the moment.
+
+        Checked after each command and tick; while it returns false, the
+        runner stops waking up to tick the board.
+        """
+        return True
+
     def command(self, cmd):
         """Run user-provided command."""
         pass
+
+    def command_priority(self, cmd):
+        """The `Priority` with which to schedule a user-provided command."""
+        return Priority.NORMAL
+
+    def coalesce_commands(self, older, newer):
+        """
+        Combine two queued user-provided commands into one, if possible.
+
+        Called when `newer` arrives while `older`, from the same client, is
+        still waiting to be run. Return a single command with the effect of
+        running both in turn, or ``None`` if they must be run separately.
+        """
+        return None
@@ -0,0 +1,25 @@
+"""
+Emulators of the boards' serial firmware, for testing without hardware.
+
+Each emulator creates a pseudo-terminal pair and speaks its board's protocol
+on the master end, while `device` is the path to the slave end, for use as
+the board's ``DEVNAME``. The real board classes can then be run against it
+unchanged::
+
+    with MotorBoardEmulator() as emulator:
+        board = MotorBoard({'DEVNAME': emulator.device})
+        board.start()
+
+Replies can be delayed (`latency`, plus up to `jitter` more) and dropped
+(with probability `drop_rate`) to exercise the boards' timing and retries.
+"""
+
+from .base import PtyEmulator
+from .motor import MotorBoardEmulator
+from .servo import ServoAssemblyEmulator
+
+__all__ = (
+    'MotorBoardEmulator',
+    'PtyEmulator',
+    'ServoAssemblyEmulator',
+)
@@ -0,0 +1,134 @@
+"""Pseudo-terminal plumbing shared by the emulators."""
+
+import abc
+import heapq
+import logging
+import os
+import random
+import select
+import threading
+import time
+import tty
+
+LOGGER = logging.getLogger(__name__)
+
+
+class PtyEmulator(abc.ABC):
+    """
+    Base class for an emulated serial device.
+
+    Subclasses implement `handle_input`, which is called from the emulator's
+    thread with each chunk of bytes written to the device, and call `reply`
+    to send bytes back.
+    """
+
+    def __init__(self, latency=0, jitter=0, drop_rate=0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.drop_rate = drop_rate
+        self.random = random.Random(seed)
+
+        self.replies_sent = 0
+        self.replies_dropped = 0
+
+        self._master_fd = None
+        self._slave_fd = None
+        self._thread = None
+        # Pending replies, as (due time, sequence, data)
+        self._pending = []
+        self._sequence = 0
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.stop()
+
+    @property
+    def device(self):
+        """Path of the device for the board to open."""
+        return os.ttyname(self._slave_fd)
+
+    def start(self):
+        self._master_fd, self._slave_fd = os.openpty()
+        # Pass bytes through untouched, in both directions
+        tty.setraw(self._slave_fd)
+
+        self._stop_read, self._stop_write = os.pipe()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+
+        os.write(self._stop_write, b'x')
+        self._thread.join()
+        self._thread = None
+
+        for fd in (
+            self._master_fd,
+            self._slave_fd,
+            self._stop_read,
+            self._stop_write,
+        ):
+            os.close(fd)
+
+    @abc.abstractmethod
+    def handle_input(self, data):
+        """Process bytes written to the device by the board."""
+
+    def reply(self, data, droppable=True):
+        """
+        Send `data` to the board, after the configured latency.
+
+        Unless `droppable` is false, the reply may be dropped instead.
+        """
+        if droppable and self.drop_rate and self.random.random() < self.drop_rate:
+            self.replies_dropped += 1
+            return
+
+        delay = self.latency
+        if self.jitter:
+            delay += self.random.uniform(0, self.jitter)
+
+        self._sequence += 1
+        heapq.heappush(
+            self._pending,
+            (time.monotonic() + delay, self._sequence, data),
+        )
+
+    def _send_due_replies(self):
+        now = time.monotonic()
+        while self._pending and self._pending[0][0] <= now:
+            _, _, data = heapq.heappop(self._pending)
+            os.write(self._master_fd, data)
+            self.replies_sent += 1
+
+    def _run(self):
+        while True:
+            timeout = None
+            if self._pending:
+                timeout = max(0, self._pending[0][0] - time.monotonic())
+
+            readable, _, _ = select.select(
+                [self._master_fd, self._stop_read],
+                [],
+                [],
+                timeout,
+            )
+
+            if self._stop_read in readable:
+                return
+
+            if self._master_fd in readable:
+                try:
+                    data = os.read(self._master_fd, 4096)
+                except OSError:
+                    # The slave end has no readers left
+                    data = b''
+                if data:
+                    self.handle_input(data)
+
+            self._send_due_replies()
@@ -0,0 +1,60 @@
+"""Emulator of the motor board's firmware."""
+
+from .base import PtyEmulator
+
+RESET = 0
+GET_VERSION = 1
+SET_M0 = 2
+SET_M1 = 3
+
+# Opcodes followed by an argument byte
+_ARGUMENT_OPCODES = (SET_M0, SET_M1)
+
+
+def speed_for_byte(value):
+    """The inverse of `MotorBoard.byte_for_speed`."""
+    if value == 1:
+        return 'coast'
+    if value == 2:
+        return 'brake'
+    return (value - 128) / 100
+
+
+class MotorBoardEmulator(PtyEmulator):
+    """
+    Speaks the motor board's byte protocol.
+
+    Each command is an opcode byte: 0 resets the board, 1 asks for its
+    firmware version, and 2 and 3 set the speed of motors 0 and 1 from the
+    byte which follows. `speeds` holds the current speed of each motor, as
+    `MotorBoard` would describe it, and `commands` every command received.
+    """
+
+    VERSION = b'MCV4B:3\n'
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.speeds = {'m0': 'coast', 'm1': 'coast'}
+        self.commands = []
+        self.resets = 0
+        self._opcode = None
+
+    def handle_input(self, data):
+        for byte in data:
+            if self._opcode is not None:
+                motor = 'm0' if self._opcode == SET_M0 else 'm1'
+                self.speeds[motor] = speed_for_byte(byte)
+                self.commands.append((self._opcode, byte))
+                self._opcode = None
+
+            elif byte in _ARGUMENT_OPCODES:
+                self._opcode = byte
+
+            elif byte == RESET:
+                self.speeds = {'m0': 'coast', 'm1': 'coast'}
+                self.resets += 1
+                self.commands.append((RESET,))
+
+            elif byte == GET_VERSION:
+                self.commands.append((GET_VERSION,))
+                self.reply(self.VERSION)
@@ -0,0 +1,91 @@
+"""Emulator of the servo assembly's Arduino firmware."""
+
+from .base import PtyEmulator
+
+
+class ServoAssemblyEmulator(PtyEmulator):
+    """
+    Speaks the servo assembly's line protocol.
+
+    Each command is a line of the form ``@<id> <command> <args...>``,
+    optionally preceded by NUL bytes. Every line of the reply is prefixed
+    with the same ``@<id>``; results are sent as ``> <value>`` lines,
+    comments as ``# <text>``, and the reply ends with ``+ ok`` or
+    ``- <error>``.
+
+    `servos`, `pins` and `pin_values` hold the emulated board's state, and
+    `analogue_values` and `ultrasound_mm` what its sensors read.
+    """
+
+    VERSION = 'SBDuino GPIO v2017.11.18'
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.servos = {}
+        self.pins = {}
+        self.pin_values = {}
+        self.analogue_values = {'a0': 0, 'a1': 0, 'a2': 0, 'a3': 0}
+        self.ultrasound_mm = 1000
+        self.commands = []
+        self._buffer = b''
+
+    def handle_input(self, data):
+        self._buffer += data.replace(b'\0', b'')
+        *lines, self._buffer = self._buffer.split(b'\n')
+        for line in lines:
+            if line.strip():
+                self._handle_line(line.decode('utf-8').strip())
+
+    def _handle_line(self, line):
+        prefix = ''
+        if line.startswith('@'):
+            command_id, _, line = line.partition(' ')
+            prefix = command_id + ' '
+
+        command, *args = line.split()
+        self.commands.append((command,) + tuple(args))
+
+        try:
+            results = self.run_command(command, args)
+        except (KeyError, ValueError, IndexError):
+            reply = ['- unknown command']
+        else:
+            reply = ['> {}'.format(result) for result in results] + ['+ ok']
+
+        # A whole reply is delayed or dropped together, as a noisy cable or
+        # a reset Arduino would lose it
+        self.reply(''.join(
+            '{}{}\n'.format(prefix, reply_line)
+            for reply_line in reply
+        ).encode('utf-8'))
+
+    def run_command(self, command, args):
+        """Run one command, returning a list of result lines."""
+        if command == 'V':
+            return [self.VERSION]
+
+        if command == 'S':
+            servo, level = args
+            self.servos[int(servo)] = int(level)
+            return []
+
+        if command == 'W':
+            pin, setting = args
+            self.pins[int(pin)] = setting
+            return []
+
+        if command == 'R':
+            (pin,) = args
+            return [self.pin_values.get(int(pin), 'L')]
+
+        if command == 'A':
+            return [
+                '{} {}'.format(name, value)
+                for name, value in sorted(self.analogue_values.items())
+            ]
+
+        if command == 'U':
+            trigger_pin, echo_pin = args
+            return [str(self.ultrasound_mm)]
+
+        raise KeyError(command)
@@ -0,0 +1,305 @@
+"""
+A single socket through which a client can talk to every board.
+
+Rather than opening one socket per board, a client can connect to the
+gateway (``/var/robotd/gateway``) and address each message to a board::
+
+    {"board": "motor/<id>", "m0": 0.5}
+
+The reply is the board's response (if it gave one) and status, together::
+
+    {"board": "motor/<id>", "response": ..., "status": {...}}
+
+Sending a JSON list of such messages runs them as a batch: each is sent to
+its board before any replies are waited for, so the boards run their
+commands in parallel, and the replies come back as one list in the same
+order. Failures are reported per message, as
+``{"board": ..., "error": {"type": ..., "description": ...}}``, including
+boards which don't reply within the gateway's `reply_timeout`.
+
+Each gateway client gets its own persistent connections to the boards it
+addresses, so its commands are ordered and scheduled by each board just as
+if it had connected directly. Broadcasts are not passed on.
+"""
+
+import json
+import logging
+import select
+import socket
+import threading
+import time
+
+from .runner import encode_message
+
+LOGGER = logging.getLogger(__name__)
+
+
+class GatewayError(Exception):
+    """A message could not be delivered to its board."""
+
+    def __init__(self, error_type, description):
+        super().__init__(description)
+        self.error_type = error_type
+        self.description = description
+
+
+class _Upstream:
+    """A gateway client's connection to one board."""
+
+    def __init__(self, path, deadline):
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.file = None
+        try:
+            # The master binds each board's socket before its runner starts,
+            # so a connection can wait a while to be greeted
+            self._set_deadline(deadline)
+            self.socket.connect(str(path))
+            self.file = self.socket.makefile('rb')
+            # Discard the greeting status
+            self._read_message(deadline)
+        except (OSError, ValueError):
+            self.close()
+            raise
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+        self.socket.close()
+
+    def send(self, command):
+        self.socket.sendall(encode_message(command))
+
+    def _set_deadline(self, deadline):
+        # However late, take a reply which has already arrived
+        self.socket.settimeout(max(deadline - time.monotonic(), 0.001))
+
+    def _read_message(self, deadline=None):
+        if deadline is not None:
+            self._set_deadline(deadline)
+        try:
+            line = self.file.readline()
+        finally:
+            # Sending is never timed out
+            self.socket.settimeout(None)
+        if not line:
+            raise ConnectionError('Board closed the connection')
+        return json.loads(line.decode('utf-8'))
+
+    def read_reply(self, deadline=None):
+        """
+        Read the response (if any) and status for one command.
+
+        Raises `socket.timeout` if it hasn't all arrived by `deadline`, after
+        which the connection can't be used again.
+        """
+        reply = {}
+        while True:
+            message = self._read_message(deadline)
+            if message.get('broadcast'):
+                continue
+            if message.keys() == {'response'}:
+                reply['response'] = message['response']
+                continue
+            reply['status'] = message
+            return reply
+
+
+class _GatewayClient:
+    """One connection to the gateway, and its connections to the boards."""
+
+    def __init__(self, gateway, sock):
+        self.gateway = gateway
+        self.socket = sock
+        self.upstreams = {}
+
+    def close(self):
+        for upstream in self.upstreams.values():
+            upstream.close()
+        self.upstreams.clear()
+        self.socket.close()
+
+    def serve(self):
+        with self.socket.makefile('rb') as lines:
+            for line in lines:
+                try:
+                    message = json.loads(line.decode('utf-8'))
+                except ValueError:
+                    reply = _error(None, 'invalid-json', 'Could not decode message')
+                else:
+                    if isinstance(message, list):
+                        reply = self.run_batch(message)
+                    else:
+                        reply = self.run_batch([message])[0]
+
+                self.socket.sendall(encode_message(reply))
+
+    def _upstream(self, board, deadline):
+        try:
+            return self.upstreams[board]
+        except KeyError:
+            pass
+
+        path = self.gateway.board_path(board)
+        try:
+            upstream = _Upstream(path, deadline)
+        except socket.timeout:
+            raise GatewayError('timeout', 'No greeting from {} within {}s'.format(
+                board,
+                self.gateway.reply_timeout,
+            ))
+        except (OSError, ValueError) as e:
+            raise GatewayError('unavailable', 'Cannot connect to {}: {}'.format(
+                board,
+                e,
+            ))
+
+        self.upstreams[board] = upstream
+        return upstream
+
+    def _drop_upstream(self, board):
+        upstream = self.upstreams.pop(board, None)
+        if upstream is not None:
+            upstream.close()
+
+    def run_batch(self, messages):
+        """Send each message to its board, then gather all the replies."""
+        replies = [None] * len(messages)
+        sent = []
+        # The boards run their commands in parallel, so wait for them all
+        # together
+        deadline = time.monotonic() + self.gateway.reply_timeout
+
+        for index, message in enumerate(messages):
+            board = message.get('board') if isinstance(message, dict) else None
+            try:
+                if not isinstance(board, str):
+                    raise GatewayError(
+                        'invalid-address',
+                        'Messages must be objects with a "board" key',
+                    )
+
+                command = dict(message)
+                del command['board']
+
+                upstream = self._upstream(board, deadline)
+                try:
+                    upstream.send(command)
+                except OSError as e:
+                    self._drop_upstream(board)
+                    raise GatewayError('unavailable', str(e))
+            except GatewayError as e:
+                replies[index] = _error(board, e.error_type, e.description)
+            else:
+                sent.append((index, board, upstream))
+
+        for index, board, upstream in sent:
+            if upstream is not self.upstreams.get(board):
+                # The connection failed while reading an earlier reply
+                replies[index] = _error(board, 'unavailable', 'Connection lost')
+                continue
+
+            try:
+                reply = upstream.read_reply(deadline)
+            except socket.timeout:
+                # Its reply would be taken for the next command's
+                self._drop_upstream(board)
+                replies[index] = _error(
+                    board,
+                    'timeout',
+                    'No reply within {}s'.format(self.gateway.reply_timeout),
+                )
+            except (OSError, ValueError) as e:
+                self._drop_upstream(board)
+                replies[index] = _error(board, 'unavailable', str(e))
+            else:
+                reply['board'] = board
+                replies[index] = reply
+
+        return replies
+
+
+def _error(board, error_type, description):
+    return {
+        'board': board,
+        'error': {'type': error_type, 'description': description},
+    }
+
+
+class Gateway:
+    """
+    Serves the gateway socket at `path`, for the boards in `root_dir`.
+
+    The replies to each batch are given up to `reply_timeout` seconds in
+    all, so that one hung board doesn't hold up the others' replies for good.
+    """
+
+    def __init__(self, root_dir, path, reply_timeout=5):
+        self.root_dir = root_dir
+        self.path = path
+        self.reply_timeout = reply_timeout
+        self.stop_flag = False
+        self.clients = set()
+        self.clients_lock = threading.Lock()
+
+    def board_path(self, board):
+        """Path of the socket for the board addressed as ``<type>/<id>``."""
+        parts = board.split('/')
+        if (
+            len(parts) != 2 or
+            not all(parts) or
+            any(part.startswith('.') for part in parts)
+        ):
+            raise GatewayError(
+                'invalid-address',
+                'Boards are addressed as "<type>/<id>", not {!r}'.format(board),
+            )
+        return self.root_dir.joinpath(*parts)
+
+    def start(self):
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.socket.bind(str(self.path))
+        self.socket.listen(5)
+        self.path.chmod(0o777)
+
+        self.thread = threading.Thread(target=self._accept_thread)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_flag = True
+        self.thread.join()
+        self.socket.close()
+
+        with self.clients_lock:
+            for client in self.clients:
+                # Wakes the client's thread, which then cleans up after itself
+                try:
+                    client.socket.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+    def _accept_thread(self):
+        while not self.stop_flag:
+            readable, _, _ = select.select([self.socket], [], [], 0.5)
+            if not readable:
+                continue
+
+            sock, _ = self.socket.accept()
+            client = _GatewayClient(self, sock)
+            with self.clients_lock:
+                self.clients.add(client)
+
+            threading.Thread(
+                target=self._client_thread,
+                args=(client,),
+                daemon=True,
+            ).start()
+
+    def _client_thread(self, client):
+        try:
+            client.serve()
+        except OSError:
+            LOGGER.info('Gateway client disconnected')
+        finally:
+            with self.clients_lock:
+                self.clients.discard(client)
+            client.close()
@@ -0,0 +1,267 @@
+"""
+A single process which runs many boards' runners, each on its own thread.
+
+Every `BoardRunner` is normally a process of its own, which costs a whole
+Python interpreter even for boards such as the game state which do next to
+nothing. Board types which the master is told to host are instead run on
+threads of one shared `RunnerHost` process, with the same sockets under the
+root directory, so clients can't tell the difference.
+
+The master drives the host through a pipe, and keeps a `HostedRunner` for
+each of its boards, which stands in for the runner process so that starting,
+stopping and watching over hosted boards works just as for the others.
+
+Hosted boards share the host's interpreter, so a board which hogs the CPU or
+holds the GIL slows all the others, and one which crashes the process takes
+them all down; the master then restarts them all on a new host. The
+``SIGUSR1`` and ``SIGUSR2`` signals aren't handled, since they'd reach every
+board at once, but the ``profile`` and ``trace-memory`` admin commands work
+as usual.
+"""
+
+import logging
+import multiprocessing
+import signal
+import socket
+import threading
+import time
+
+import setproctitle
+
+from . import tracing
+from .processes import stop_process
+from .runner import BoardRunner
+
+LOGGER = logging.getLogger(__name__)
+
+# Attributes of every `multiprocessing.Process`, which can only be pickled
+# while starting one
+_PROCESS_ATTRIBUTES = frozenset(multiprocessing.Process().__dict__.keys())
+
+
+def _runner_state(runner):
+    """The state of a `BoardRunner` which isn't about its own process."""
+    return {
+        name: value
+        for name, value in runner.__dict__.items()
+        if name not in _PROCESS_ATTRIBUTES
+    }
+
+
+def _restore_runner(state):
+    """Make a runner from `_runner_state`, which can serve but not start."""
+    runner = BoardRunner.__new__(BoardRunner)
+    runner.__dict__.update(state)
+    return runner
+
+
+class RunnerHost(multiprocessing.Process):
+    """
+    Process which runs any number of runners on threads, on request.
+
+    `log_config`, if given, is applied once for all the runners; see
+    `robotd.logs`.
+    """
+
+    # How long to wait for the host to reply to a request
+    REQUEST_TIMEOUT = 5
+
+    # How long to wait for a host which stopped replying to exit after
+    # asking it to, and then after killing it
+    TERMINATE_TIMEOUT = 2
+    KILL_TIMEOUT = 2
+
+    def __init__(self, log_config=None, **kwargs):
+        super().__init__(**kwargs)
+        self.log_config = log_config
+        self._requests, self._host_requests = multiprocessing.Pipe()
+        self._requests_lock = threading.Lock()
+        # Socket path -> (thread, writing end of its stop socket); only used
+        # in the host itself
+        self._runners = {}
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        # Only the master makes requests
+        state['_requests'] = None
+        state['_requests_lock'] = None
+        return state
+
+    def start(self):
+        """Start the host process."""
+        super().start()
+        self._host_requests.close()
+
+    @property
+    def closed(self):
+        """Whether the master has given up on the host."""
+        return self._requests is None or self._requests.closed
+
+    def request(self, action, argument):
+        """
+        Ask the host to do something, and return its reply.
+
+        Called from the master, by any thread. Raises `EOFError` or
+        `OSError` if the host has died or stopped answering.
+        """
+        with self._requests_lock:
+            self._requests.send((action, argument))
+            if not self._requests.poll(self.REQUEST_TIMEOUT):
+                # A late reply mustn't be taken for the next request's, so
+                # give up on the host altogether, and the runners on it
+                self._requests.close()
+                LOGGER.warning('Runner host did not reply to %s; stopping it', action)
+                stop_process(self, self.TERMINATE_TIMEOUT, self.KILL_TIMEOUT)
+                raise TimeoutError('runner host did not reply to {}'.format(action))
+            return self._requests.recv()
+
+    def stop(self):
+        """Stop the host, after stopping any runners still on it."""
+        try:
+            self.request('exit', None)
+        except (EOFError, OSError):
+            pass
+
+    def run(self):
+        """Serve the master's requests, until it goes away."""
+        if self._requests is not None:
+            # Forked from the master, rather than unpickled
+            self._requests.close()
+        if self.log_config is not None:
+            self.log_config.apply()
+        setproctitle.setproctitle('robotd host')
+        tracing.TRACER.clear()
+        # Interrupting the whole process group stops the master, which then
+        # stops each hosted runner in turn and then us
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+        handlers = {
+            'start': self._start_runner,
+            'stop': self._stop_runner,
+            'alive': self._is_runner_alive,
+            'exit': lambda argument: None,
+        }
+
+        try:
+            while True:
+                try:
+                    action, argument = self._host_requests.recv()
+                except EOFError:
+                    break
+                self._host_requests.send(handlers[action](argument))
+                if action == 'exit':
+                    break
+        finally:
+            for key in list(self._runners.keys()):
+                self._stop_runner(key)
+            for thread, _ in self._runners.values():
+                thread.join()
+
+    def _start_runner(self, runner_state):
+        runner = _restore_runner(runner_state)
+        stop_socket, stop_request = socket.socketpair()
+        thread = threading.Thread(
+            target=self._serve,
+            args=(runner, stop_socket),
+            name=runner._process_title(),
+            daemon=True,
+        )
+        self._runners[str(runner.socket_path)] = (thread, stop_request)
+        thread.start()
+
+    def _serve(self, runner, stop_socket):
+        try:
+            # Settings which are per thread on Linux
+            runner.scheduling.apply()
+            runner.serve(stop_socket)
+        except Exception:
+            LOGGER.exception('Hosted runner failed: %s', runner.socket_path)
+        finally:
+            stop_socket.close()
+
+    def _stop_runner(self, key):
+        try:
+            _, stop_request = self._runners[key]
+        except KeyError:
+            return
+        try:
+            stop_request.send(b'\0')
+        except OSError:
+            # The runner has already finished
+            pass
+
+    def _is_runner_alive(self, key):
+        try:
+            thread, stop_request = self._runners[key]
+        except KeyError:
+            return False
+
+        if thread.is_alive():
+            return True
+        # Told once, the master forgets about it
+        stop_request.close()
+        del self._runners[key]
+        return False
+
+
+class HostedRunner:
+    """
+    Stands in for a `BoardRunner` process, for a runner on a `RunnerHost`.
+
+    Only the parts of the `multiprocessing.Process` API which the master
+    uses are provided.
+    """
+
+    # How often `join` checks whether the runner has finished
+    JOIN_POLL_INTERVAL = 0.02
+
+    def __init__(self, host, runner):
+        self.host = host
+        self.runner = runner
+        self.socket_path = runner.socket_path
+        self.metrics_path = runner.metrics_path
+        self._key = str(runner.socket_path)
+
+    @property
+    def pid(self):
+        # Killing this kills every hosted runner, but if one won't stop when
+        # asked that's the only way to be rid of it
+        return self.host.pid
+
+    def bind(self):
+        """Create the board's socket, as `BoardRunner.bind`."""
+        self.runner.bind()
+
+    def close_server_socket(self):
+        """Close the master's copy of the board's socket."""
+        self.runner.close_server_socket()
+
+    def start(self):
+        """Start running the board on the host."""
+        self.host.request('start', _runner_state(self.runner))
+
+    def is_alive(self):
+        """Whether the runner is still running on the host."""
+        try:
+            return self.host.request('alive', self._key)
+        except (EOFError, OSError):
+            return False
+
+    def terminate(self):
+        """Ask the runner to stop, as soon as it next wakes up."""
+        try:
+            self.host.request('stop', self._key)
+        except (EOFError, OSError):
+            pass
+
+    def join(self, timeout=None):
+        """Wait for the runner to stop, for up to `timeout` seconds."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.is_alive():
+            if deadline is not None and time.monotonic() > deadline:
+                return
+            time.sleep(self.JOIN_POLL_INTERVAL)
+
+    def cleanup(self):
+        """Clean up the board's socket, as `BoardRunner.cleanup`."""
+        self.runner.cleanup()
@@ -0,0 +1,249 @@
+"""
+Logging for the master and its runners, without blocking on the journal.
+
+Every process, the master included, hands its log records to a shared
+`LogQueue` instead of writing them out itself, and a `QueueListener` thread
+in the master writes them all to stderr, from where systemd passes them on
+to the journal. Putting a record on the queue is a single non-blocking send,
+so a runner never waits for a slow journal; if the master falls so far
+behind that the queue fills, records are dropped rather than waited for.
+
+Debug records from hot paths, such as each command's response or each line
+from the servo assembly, can also be thinned out per logger before they're
+even formatted; see `Limit`. Records at `INFO` and above are never sampled
+or rate limited.
+"""
+
+import collections
+import logging
+import logging.handlers
+import pickle
+import queue
+import random
+import socket
+import time
+
+DEFAULT_FORMAT = '%(processName)s[%(process)d] %(name)s %(levelname)s: %(message)s'
+
+
+class Limit(collections.namedtuple('Limit', ('sample', 'rate'))):
+    """
+    How many of a logger's debug records to keep.
+
+    A random `sample` fraction of the records are kept, and of those at most
+    `rate` a second, in bursts of up to a second's worth.
+    """
+
+    __slots__ = ()
+
+    def __new__(cls, sample=1, rate=None):
+        return super().__new__(cls, sample, rate)
+
+
+# Logger name -> `Limit` of it and its children, unless overridden
+DEFAULT_LIMITS = {
+    'robotd': Limit(rate=50),
+}
+
+
+class _Bucket:
+    """Token bucket for one logger's `Limit`."""
+
+    def __init__(self, limit, now):
+        self.limit = limit
+        self.capacity = max(limit.rate or 0, 1)
+        self.tokens = self.capacity
+        self.updated = now
+
+    def allow(self, now):
+        if self.limit.sample < 1 and random.random() >= self.limit.sample:
+            return False
+        if self.limit.rate is None:
+            return True
+
+        self.tokens = min(
+            self.capacity,
+            self.tokens + (now - self.updated) * self.limit.rate,
+        )
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Applies each logger's `Limit` to its records below `level`.
+
+    `limits` maps logger names to the `Limit` for that logger and its
+    children, with the most specific name winning. `on_drop`, if given, is
+    called for each record dropped.
+    """
+
+    def __init__(self, limits, level=logging.INFO, on_drop=None):
+        super().__init__()
+        self.limits = limits
+        self.level = level
+        self.on_drop = on_drop
+        # Logger name -> `_Bucket`, or `None` if it isn't limited
+        self._buckets = {}
+
+    def _limit_for(self, name):
+        while name not in self.limits:
+            if '.' not in name:
+                return None
+            name = name.rsplit('.', 1)[0]
+        return self.limits[name]
+
+    def filter(self, record):
+        if record.levelno >= self.level:
+            return True
+
+        now = time.monotonic()
+        try:
+            bucket = self._buckets[record.name]
+        except KeyError:
+            limit = self._limit_for(record.name)
+            bucket = None if limit is None else _Bucket(limit, now)
+            self._buckets[record.name] = bucket
+
+        if bucket is None or bucket.allow(now):
+            return True
+        if self.on_drop is not None:
+            self.on_drop()
+        return False
+
+
+class LogQueue:
+    """
+    A queue of log records from any number of processes, over a socket pair.
+
+    Each record is pickled and sent as one datagram. Unlike with a
+    `multiprocessing.Queue`, there's no lock shared between the processes,
+    which a runner terminated in the middle of logging would leave held,
+    stopping every other process's logs along with it.
+    """
+
+    # Bytes of records which may be waiting for the master at once, if the
+    # kernel allows that much
+    BUFFER_SIZE = 4 * 1024 * 1024
+
+    # Larger records are dropped
+    MAX_RECORD_SIZE = 64 * 1024
+
+    def __init__(self):
+        self._reader, self._writer = socket.socketpair(
+            socket.AF_UNIX,
+            socket.SOCK_DGRAM,
+        )
+        self._writer.setsockopt(
+            socket.SOL_SOCKET,
+            socket.SO_SNDBUF,
+            self.BUFFER_SIZE,
+        )
+
+    def __getstate__(self):
+        # Only the master reads from the queue
+        return {'_reader': None, '_writer': self._writer}
+
+    def put_nowait(self, record):
+        """
+        Send a record prepared by `QueueHandler`, or `None` to stop.
+
+        Raises `queue.Full` if there's no room for a record, but waits for
+        room for `None`, which `QueueListener` sends to itself when stopping.
+        """
+        if record is None:
+            self._writer.send(pickle.dumps(None))
+            return
+
+        data = pickle.dumps(record.__dict__)
+        if len(data) > self.MAX_RECORD_SIZE:
+            raise queue.Full
+        try:
+            self._writer.send(data, socket.MSG_DONTWAIT)
+        except BlockingIOError:
+            raise queue.Full
+
+    def get(self, block=True):
+        """Receive the next record, as `QueueListener` expects."""
+        state = pickle.loads(self._reader.recv(self.MAX_RECORD_SIZE))
+        return None if state is None else logging.makeLogRecord(state)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """A `QueueHandler` which drops records when the queue is full."""
+
+    def __init__(self, log_queue, on_drop=None):
+        super().__init__(log_queue)
+        self.on_drop = on_drop
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            if self.on_drop is not None:
+                self.on_drop()
+
+
+class LogConfig(collections.namedtuple(
+    'LogConfig',
+    ('queue', 'level', 'limits'),
+)):
+    """
+    Where and how a process should log.
+
+    Created by `start_listener`, and handed to each runner when it starts.
+    """
+
+    __slots__ = ()
+
+    def apply(self, on_drop=None):
+        """
+        Send this process's log records to the queue, instead of anywhere else.
+
+        `on_drop` is called for each record dropped, whether by a `Limit` or
+        because the queue is full.
+        """
+        handler = DroppingQueueHandler(self.queue, on_drop)
+        handler.addFilter(SamplingFilter(self.limits, on_drop=on_drop))
+
+        root = logging.getLogger()
+        for existing in list(root.handlers):
+            root.removeHandler(existing)
+        root.addHandler(handler)
+        root.setLevel(self.level)
+
+
+def limits_by_logger(rates=(), samples=(), defaults=DEFAULT_LIMITS):
+    """
+    Combine lists of ``(logger name, value)`` for each part of a `Limit`.
+
+    Returns `defaults` updated with the given rates and sample fractions, as
+    taken by `LogConfig`.
+    """
+    limits = dict(defaults)
+    for name, rate in rates:
+        limits[name] = limits.get(name, Limit())._replace(rate=rate)
+    for name, sample in samples:
+        limits[name] = limits.get(name, Limit())._replace(sample=sample)
+    return limits
+
+
+def start_listener(level=logging.INFO, limits=DEFAULT_LIMITS, stream=None):
+    """
+    Start writing the records logged by every process to `stream`.
+
+    `stream` defaults to stderr. Returns the `LogConfig` for each process to
+    `apply`, and the running `QueueListener`, which should be stopped at
+    exit so that the last records are written out.
+    """
+    log_queue = LogQueue()
+
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(logging.Formatter(DEFAULT_FORMAT))
+    listener = logging.handlers.QueueListener(log_queue, handler)
+    listener.start()
+
+    return LogConfig(log_queue, level, limits), listener
@@ -1,11 +1,11 @@
 """Master process which detects hardware and launches controllers."""
 
+import argparse
 import collections
-import json
+import concurrent.futures
 import logging
 import multiprocessing
 import select
-import shutil
 import socket
 import threading
 import time
@@ -15,283 +15,388 @@ import pyudev
 import setproctitle
 
 from .devices import BOARDS
+from .devices_base import NodeSnapshot
+from .gateway import Gateway
+from .host import HostedRunner, RunnerHost
+from .logs import DEFAULT_LIMITS, limits_by_logger, start_listener
+from .memory import process_memory
+from .metrics import Registry, merge_expositions
+from .processes import stop_process
+from .recorder import DEFAULT_MAX_BYTES, is_recording
+from .runner import BoardRunner, Connection
+from .scheduling import parse_cpus, scheduling_by_board_type
+from .systemd import notify, process_age
 
 LOGGER = logging.getLogger(__name__)
 
 
-class Connection:
-    """
-    A connection to a device.
-
-    This wraps a ``socket.socket`` providing encoding and decoding so that
-    consumers of this class can send and receive JSON-compatible typed data
-    rather than needing to worry about lower-level details.
-    """
-
-    def __init__(self, socket):
-        """Wrap the given socket."""
-        self.socket = socket
-        self.data = b''
-
-    def close(self):
-        """Close the connection."""
-        self.socket.close()
-
-    def send(self, message):
-        """Send the given JSON-compatible message over the connection."""
-        line = json.dumps(message).encode('utf-8') + b'\n'
-        self.socket.sendall(line)
+class MasterProcess(object):
+    """The mighty God object which manages the controllers."""
 
-    def receive(self):
-        """Receive a single message from the connection."""
-        while b'\n' not in self.data:
-            message = self.socket.recv(4096)
-            if message == b'':
-                return None
+    # How long to wait for each runner when gathering metrics
+    METRICS_TIMEOUT = 0.5
 
-            self.data += message
-        line = self.data.split(b'\n', 1)[0]
-        self.data = self.data[len(line) + 1:]
+    # How long to wait for a runner to exit after asking it to, and then
+    # after killing it
+    TERMINATE_TIMEOUT = 2
+    KILL_TIMEOUT = 2
 
-        return json.loads(line.decode('utf-8'))
+    # How many runners can be started or stopped at once
+    MAX_CONCURRENT_OPERATIONS = 8
 
+    # How often to list all the devices even if udev hasn't reported any
+    # events, in case any were missed
+    FULL_SCAN_INTERVAL = 30
 
-class BoardRunner(multiprocessing.Process):
-    """Control process for one board."""
+    def __init__(
+        self,
+        root_dir,
+        runner_options=None,
+        context=None,
+        hosted_board_types=(),
+    ):
+        self.runners = collections.defaultdict(dict)
+        # Extra keyword arguments for each `BoardRunner`
+        self.runner_options = runner_options or {}
+        # IDs of the board types whose runners share a `RunnerHost`, which is
+        # started when the first of them is
+        self.hosted_board_types = set(hosted_board_types)
+        self._host = None
+        self._host_lock = threading.Lock()
+        self.context = context or pyudev.Context()
+        self.root_dir = Path(root_dir)
+        self.metrics_path = self.root_dir / 'metrics'
+        self.gateway = Gateway(self.root_dir, self.root_dir / 'gateway')
 
-    def __init__(self, board, root_dir, **kwargs):
-        super().__init__(**kwargs)
+        self.root_dir.mkdir(mode=0o755, parents=True, exist_ok=True)
+        self.clear_socket_files()
 
-        self.board = board
-        self.socket_path = (
-            Path(root_dir) / type(board).board_type_id / board.name(board.node)
+        self.runners_lock = threading.Lock()
+        # (board type, device path) of runners being started or stopped
+        self.pending_operations = set()
+        # Board type -> {device path: whether the board type includes it}
+        self._included = {}
+        self.udev_events = self._open_udev_events()
+        # Set when the devices must be listed on the next tick, whether or
+        # not udev reports anything
+        self._scan_needed = True
+        self._next_full_scan = 0
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.MAX_CONCURRENT_OPERATIONS,
         )
 
-        self._prepare_socket_path()
-
-        self.connections = {}
-
-    def _prepare_socket_path(self):
-        try:
-            self.socket_path.parent.mkdir(parents=True)
-        except FileExistsError:
-            if self.socket_path.exists():
-                LOGGER.warning('removing old %r', self.socket_path)
-                self._delete_socket_path()
-
-    def _delete_socket_path(self):
-        try:
-            self.socket_path.unlink()
-        except FileNotFoundError:
-            pass
-
-    def _create_server_socket(self):
-        server_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-
-        server_socket.bind(str(self.socket_path))
-        server_socket.listen(5)
-
-        self.socket_path.chmod(0o777)
-
-        LOGGER.info('Listening on: %s', self.socket_path)
-
-        setproctitle.setproctitle('robotd {}: {}'.format(
-            type(self.board).board_type_id,
-            type(self.board).name(self.board.node),
-        ))
-
-        return server_socket
-
-    def broadcast(self, message):
-        """Broadcast a message over all connections."""
-        message = dict(message)
-        message['broadcast'] = True
+        self.metrics = Registry()
+        self._runners_gauge = self.metrics.gauge(
+            'robotd_runners',
+            'Number of running board controllers',
+        )
+        self._dead_runners = self.metrics.counter(
+            'robotd_dead_runners_total',
+            'Number of board controllers which died unexpectedly',
+        )
+        self._killed_runners = self.metrics.counter(
+            'robotd_killed_runners_total',
+            'Number of board controllers killed for not exiting when asked',
+        )
+        self._stop_seconds = self.metrics.histogram(
+            'robotd_runner_stop_seconds',
+            'Time taken to stop a board controller',
+        )
+        self._poll_seconds = self.metrics.histogram(
+            'robotd_udev_poll_seconds',
+            'Time spent polling udev and reconciling runners with it',
+        )
+        self._rss_gauge = self.metrics.gauge(
+            'robotd_process_rss_bytes',
+            'Resident set size of the master process',
+        )
+        self._pss_gauge = self.metrics.gauge(
+            'robotd_process_pss_bytes',
+            'Proportional set size of the master process',
+        )
+        self._ready_gauge = self.metrics.gauge(
+            'robotd_ready_seconds',
+            'Time from the master process starting to it being ready',
+        )
 
-        for connection in self.connections.values():
-            try:
-                connection.send(message)
-            except ConnectionRefusedError:
-                self.connections.remove(connection)
+        # Init the startup boards
+        for board_type in BOARDS:
+            if board_type.create_on_startup:
+                self._start_board_instance(board_type, 'startup')
 
-    def _send_board_status(self, connection):
-        board_status = self.board.status()
-        LOGGER.debug('Sending board status: %s', board_status)
-        connection.send(board_status)
+    def clear_socket_files(self, directory=None):
+        if directory is None:
+            directory = self.root_dir
 
-    def _send_command_response(self, connection, response):
-        message = {'response': response}
-        LOGGER.debug('Sending command response: %s', message)
-        connection.send(message)
+        for path in directory.iterdir():
+            if path.is_dir():
+                self.clear_socket_files(path)
+                if not any(path.iterdir()):
+                    path.rmdir()
+            elif not is_recording(path):
+                # Recordings are most wanted after a crash, so they're kept
+                path.unlink()
 
-    def run(self):
+    def _open_udev_events(self):
         """
-        Control this board.
-
-        This is the entry point from the control subprocess and its job is to:
+        Start listening for udev events in the subsystems which boards use.
 
-        * Create and manage the UNIX socket in `/var/robotd`,
-        * Pass on commands to the `board`,
-        * Call `make_safe` whenever the last user disconnects,
-        * Deal with error handling and shutdown.
+        Returns ``None`` if udev can't be listened to (as in some containers),
+        in which case every tick lists all the devices.
         """
-
-        server_socket = self._create_server_socket()
-
-        self.board.broadcast = self.broadcast
-        self.board.start()
+        subsystems = {
+            board_type.lookup_keys.get('subsystem')
+            for board_type in BOARDS
+            if hasattr(board_type, 'lookup_keys')
+        }
 
         try:
-            while True:
-                self._process_connections(server_socket)
-        finally:
-            self.board.make_safe()
-
-    def _process_connections(self, server_socket):
-        connection_sockets = list(self.connections.keys())
-
-        # Wait until one of the sockets is ready to read.
-        readable, _, errorable = select.select(
-            # connections that want to read
-            [server_socket] + connection_sockets,
-            # connections that want to write
-            [],
-            # connections that want to error
-            connection_sockets,
-        )
-
-        # New connections
-        if server_socket in readable:
-            new_socket, _ = server_socket.accept()
-            new_connection = Connection(new_socket)
-            readable.append(new_socket)
-            self.connections[new_socket] = new_connection
-            LOGGER.info('New connection at: %s', self.socket_path)
-            self._send_board_status(new_connection)
-
-        dead_sockets = []
-
-        for sock in readable:
-            try:
-                connection = self.connections[sock]
-            except KeyError:
-                continue
-
-            command = connection.receive()
-
-            if command is None:
-                dead_sockets.append(sock)
-                continue
-
-            if command != {}:
-                response = self.board.command(command)
-                if response is not None:
-                    self._send_command_response(connection, response)
-
-            self._send_board_status(connection)
-
-        dead_sockets.extend(errorable)
-
-        self._close_dead_sockets(dead_sockets)
-
-        if dead_sockets and not self.connections:
-            LOGGER.info('Last connection closed')
-            self.board.make_safe()
+            monitor = pyudev.Monitor.from_netlink(self.context)
+            if None not in subsystems:
+                for subsystem in sorted(subsystems):
+                    monitor.filter_by(subsystem)
+            monitor.start()
+        except OSError:
+            LOGGER.warning('Cannot listen for udev events', exc_info=True)
+            return None
+        return monitor
+
+    def _devices_may_have_changed(self):
+        """Whether anything has happened which calls for listing the devices."""
+        if self.udev_events is None:
+            return True
+
+        changed = self._scan_needed
+        self._scan_needed = False
+        try:
+            while self.udev_events.poll(timeout=0) is not None:
+                changed = True
+        except OSError:
+            LOGGER.exception('Failed to read udev events')
+            changed = True
+
+        now = time.monotonic()
+        if changed or now >= self._next_full_scan:
+            self._next_full_scan = now + self.FULL_SCAN_INTERVAL
+            return True
+        return False
 
-    def _close_dead_sockets(self, dead_sockets):
-        for sock in dead_sockets:
-            try:
-                del self.connections[sock]
-            except KeyError:
-                pass
-            sock.close()
+    def tick(self):
+        """Poll udev for any new or missing boards."""
+        with self._poll_seconds.time():
+            # Listing devices costs in proportion to how many there are, so
+            # it's only done when udev says that something has changed
+            if not self._devices_may_have_changed():
+                return
 
-    def cleanup(self):
+            device_lists = {}
+            for board_type in BOARDS:
+                if hasattr(board_type, 'lookup_keys'):
+                    nodes = self.context.list_devices(**board_type.lookup_keys)
+                    device_lists[board_type] = self._included_nodes(
+                        board_type,
+                        nodes,
+                    )
+            self._reconcile(device_lists)
+
+    def _included_nodes(self, board_type, nodes):
         """
-        Clean up the UNIX socket if it's been left around.
+        Filter `nodes` down to those which `board_type` should be run for.
 
-        Called from the parent process.
+        Whether a node is included depends only on udev properties which
+        don't change while it's plugged in, so the answer is remembered for
+        as long as its device path keeps being listed. Each tick then only
+        looks at the properties of nodes which are new since the last one,
+        rather than at every node in the board type's subsystem.
         """
+        previous = self._included.get(board_type, {})
+        current = {}
+        included = []
 
-        self._delete_socket_path()
-        self.board.stop()
-
-
-class MasterProcess(object):
-    """The mighty God object which manages the controllers."""
-
-    def __init__(self, root_dir):
-        self.runners = collections.defaultdict(dict)
-        self.context = pyudev.Context()
-        self.root_dir = Path(root_dir)
-
-        self.root_dir.mkdir(mode=0o755, parents=True, exist_ok=True)
-        self.clear_socket_files()
-
-        self.runners_lock = threading.Lock()
-
-        # Init the startup boards
-        for board_type in BOARDS:
-            if board_type.create_on_startup:
-                self._start_board_instance(board_type, 'startup')
+        for node in nodes:
+            device_path = node.device_path
+            try:
+                is_included = previous[device_path]
+            except KeyError:
+                if not node.is_initialized:
+                    # Its properties aren't all there yet, so ask again later
+                    continue
+                is_included = board_type.included(node)
 
-    def clear_socket_files(self):
-        for path in self.root_dir.iterdir():
-            shutil.rmtree(str(path))
+            current[device_path] = is_included
+            if is_included:
+                included.append(node)
 
-    def tick(self):
-        """Poll udev for any new or missing boards."""
-        for board_type in BOARDS:
-            if hasattr(board_type, 'lookup_keys'):
-                nodes = self.context.list_devices(**board_type.lookup_keys)
-                initialized_nodes = [n for n in nodes if n.is_initialized]
-                self._process_device_list(board_type, initialized_nodes)
+        self._included[board_type] = current
+        return included
 
     def cleanup(self):
         """Shut down all the controllers."""
-        for board_type in BOARDS:
-            self._process_device_list(board_type, [])
+        self._reconcile({board_type: [] for board_type in BOARDS})
+        self._executor.shutdown()
+        if self._host is not None:
+            self._host.stop()
+            self._host.join(self.TERMINATE_TIMEOUT)
+            if self._host.is_alive():
+                stop_process(self._host, self.TERMINATE_TIMEOUT, self.KILL_TIMEOUT)
         self.stop_monitor()
+        self.stop_metrics_server()
+        self.gateway.stop()
 
-    def _process_device_list(self, board_type, nodes):
-        with self.runners_lock:
-            nodes_by_path = {
-                x.device_path: x
-                for x in nodes
-                if board_type.included(x)
-            }
+    def _reconcile(self, device_lists):
+        """
+        Start and stop runners to match the boards in `device_lists`.
 
-            actual_paths = set(nodes_by_path.keys())
-            expected_paths = set(self.runners[board_type].keys())
+        `device_lists` maps board types to lists of the udev nodes which
+        they include. What needs doing is worked out under the lock, but the
+        runners are then started and stopped concurrently without it, so
+        that one slow teardown holds up neither the others nor the monitor.
+        """
+        with self.runners_lock:
+            operations = []
+            for board_type, nodes in device_lists.items():
+                operations.extend(self._plan_operations(board_type, nodes))
+
+        futures = [
+            self._executor.submit(operation, *args)
+            for operation, args in operations
+        ]
+
+        for future in concurrent.futures.as_completed(futures):
+            error = future.exception()
+            if error is not None:
+                LOGGER.error('Failed to start or stop a runner', exc_info=error)
+                # Try again on the next tick
+                self._scan_needed = True
+
+    def _plan_operations(self, board_type, nodes):
+        # Called with the lock held
+        nodes_by_path = {x.device_path: x for x in nodes}
+
+        actual_paths = set(nodes_by_path.keys())
+        expected_paths = set(self.runners[board_type].keys())
+        # Leave alone anything which is already being started or stopped
+        busy_paths = {
+            device_path
+            for pending_type, device_path in self.pending_operations
+            if pending_type is board_type
+        }
+
+        operations = []
+
+        for new_device in actual_paths - expected_paths - busy_paths:
+            self.pending_operations.add((board_type, new_device))
+            operations.append((
+                self._start_runner,
+                (board_type, new_device, nodes_by_path[new_device]),
+            ))
+
+        for dead_device in expected_paths - actual_paths - busy_paths:
+            self.pending_operations.add((board_type, dead_device))
+            operations.append((self._stop_runner, (board_type, dead_device)))
+
+        return operations
+
+    def _start_runner(self, board_type, new_device, node):
+        try:
+            LOGGER.info(
+                'Detected new %s: %s (%s)',
+                board_type.__name__,
+                new_device,
+                board_type.name(node),
+            )
+            self._start_board_instance(board_type, new_device, node=node)
+        finally:
+            with self.runners_lock:
+                self.pending_operations.discard((board_type, new_device))
 
-            missing_paths = expected_paths - actual_paths
-            new_paths = actual_paths - expected_paths
+    def _stop_runner(self, board_type, dead_device):
+        LOGGER.info('Disconnected %s: %s', board_type.__name__, dead_device)
+        with self.runners_lock:
+            runner = self.runners[board_type][dead_device]
 
-            for new_device in new_paths:
-                LOGGER.info(
-                    'Detected new %s: %s (%s)',
+        try:
+            with self._stop_seconds.time():
+                killed = stop_process(
+                    runner,
+                    self.TERMINATE_TIMEOUT,
+                    self.KILL_TIMEOUT,
+                )
+            if killed:
+                LOGGER.warning(
+                    'Killed %s runner which did not exit: %s',
                     board_type.__name__,
-                    new_device,
-                    board_type.name(nodes_by_path[new_device]),
+                    dead_device,
                 )
-                self._start_board_instance(
-                    board_type,
-                    new_device,
-                    node=nodes_by_path[new_device],
+                self._killed_runners.inc()
+            runner.cleanup()
+        finally:
+            with self.runners_lock:
+                del self.runners[board_type][dead_device]
+                self.pending_operations.discard((board_type, dead_device))
+                self._update_runners_gauge()
+
+    def _start_board_instance(self, board_type, new_device, node=None):
+        if node is None:
+            instance = board_type()
+        else:
+            # Runners don't necessarily share our memory, so they can't have
+            # the live udev device.
+            instance = board_type(node=NodeSnapshot.from_device(node))
+
+        runner = BoardRunner(instance, self.root_dir, **self.runner_options)
+        if board_type.board_type_id in self.hosted_board_types:
+            runner = HostedRunner(self._runner_host(), runner)
+        # Clients can connect from here on, and are answered once the runner
+        # has started the board
+        runner.bind()
+        try:
+            runner.start()
+        finally:
+            runner.close_server_socket()
+        with self.runners_lock:
+            self.runners[board_type][new_device] = runner
+            self._update_runners_gauge()
+
+    def _runner_host(self):
+        """The host for hosted runners, started afresh if it isn't running."""
+        with self._host_lock:
+            if (
+                self._host is None or
+                self._host.closed or
+                not self._host.is_alive()
+            ):
+                if self._host is not None:
+                    LOGGER.warning('Runner host is gone; starting a new one')
+                self._host = RunnerHost(
+                    log_config=self.runner_options.get('log_config'),
                 )
+                self._host.start()
+            return self._host
 
-            for dead_device in missing_paths:
-                LOGGER.info('Disconnected %s: %s', board_type.__name__, dead_device)
-                runner = self.runners[board_type][dead_device]
-                runner.terminate()
-                runner.join()
-                runner.cleanup()
-                del self.runners[board_type][dead_device]
+    def notify_ready(self):
+        """
+        Tell systemd that robotd is ready, after the first tick.
+
+        By then every board present has a socket which clients can connect
+        to, even if its runner is still starting.
+        """
+        ready_seconds = process_age()
+        if ready_seconds is not None:
+            self._ready_gauge.set(ready_seconds)
+            LOGGER.info('Ready %.3fs after starting', ready_seconds)
+
+        with self.runners_lock:
+            num_runners = sum(len(runners) for runners in self.runners.values())
+        notify(
+            'READY=1',
+            'STATUS=Serving {} board(s)'.format(num_runners),
+        )
 
-    def _start_board_instance(self, board_type, new_device, **kwargs):
-        instance = board_type(**kwargs)
-        runner = BoardRunner(instance, self.root_dir)
-        runner.start()
-        self.runners[board_type][new_device] = runner
+    def _update_runners_gauge(self):
+        self._runners_gauge.set(sum(
+            len(runners) for runners in self.runners.values()
+        ))
 
     def launch_monitor(self):
         self.monitor_stop_flag = False
@@ -308,34 +413,172 @@ class MasterProcess(object):
                 return
 
             time.sleep(0.5)
+            self._reap_dead_runners()
 
-            with self.runners_lock:
-                for board_type, runners in list(self.runners.items()):
-                    for device_id, runner_process in list(runners.items()):
-                        if not runner_process.is_alive():
-                            LOGGER.info('Dead worker: %s(%s)', board_type, device_id)
-                            # This worker has died and needs to be reaped
-                            del self.runners[board_type][device_id]
+    def _reap_dead_runners(self):
+        with self.runners_lock:
+            runners = [
+                (board_type, device_id, runner_process)
+                for board_type, runners in self.runners.items()
+                for device_id, runner_process in runners.items()
+            ]
+
+        # Asking a hosted runner can take a while, so don't hold up
+        # everything else meanwhile
+        dead = [
+            (board_type, device_id, runner_process)
+            for board_type, device_id, runner_process in runners
+            if not runner_process.is_alive()
+        ]
+        if not dead:
+            return
+
+        with self.runners_lock:
+            for board_type, device_id, runner_process in dead:
+                if (board_type, device_id) in self.pending_operations:
+                    # Being stopped on purpose
+                    continue
+                if self.runners[board_type].get(device_id) is not runner_process:
+                    # Already stopped, or replaced, meanwhile
+                    continue
+                LOGGER.info('Dead worker: %s(%s)', board_type, device_id)
+                # This worker has died and needs to be reaped
+                del self.runners[board_type][device_id]
+                self._dead_runners.inc()
+                self._update_runners_gauge()
+                # Restart it on the next tick
+                self._scan_needed = True
+
+    def launch_metrics_server(self):
+        self.metrics_stop_flag = False
+        self.metrics_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.metrics_socket.bind(str(self.metrics_path))
+        self.metrics_socket.listen(5)
+        self.metrics_path.chmod(0o777)
+
+        self.metrics_thread = threading.Thread(target=self._metrics_thread)
+        self.metrics_thread.start()
+
+    def stop_metrics_server(self):
+        self.metrics_stop_flag = True
+        self.metrics_thread.join()
+        self.metrics_socket.close()
+
+    def _metrics_thread(self):
+        while not self.metrics_stop_flag:
+            readable, _, _ = select.select([self.metrics_socket], [], [], 0.5)
+            if not readable:
+                continue
+
+            connection, _ = self.metrics_socket.accept()
+            try:
+                connection.sendall(self.render_metrics().encode('utf-8'))
+            except OSError:
+                LOGGER.exception('Failed to send metrics')
+            finally:
+                connection.close()
+
+    def _fetch_runner_metrics(self, runner):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(self.METRICS_TIMEOUT)
+            sock.connect(str(runner.metrics_path))
+
+            chunks = []
+            while True:
+                chunk = sock.recv(65536)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+
+        return b''.join(chunks).decode('utf-8')
+
+    def render_metrics(self):
+        """Render the metrics of the master and all the runners together."""
+        with self.runners_lock:
+            runners = [
+                runner
+                for board_runners in self.runners.values()
+                for runner in board_runners.values()
+            ]
+
+        memory = process_memory()
+        self._rss_gauge.set(memory['rss'])
+        if memory['pss'] is not None:
+            self._pss_gauge.set(memory['pss'])
+
+        texts = [self.metrics.render(labels={'board_type': 'master'})]
+        for runner in runners:
+            try:
+                texts.append(self._fetch_runner_metrics(runner))
+            except OSError:
+                # The runner may still be starting, or may have just died
+                LOGGER.debug('Could not fetch metrics from %s', runner.socket_path)
 
+        return merge_expositions(texts)
 
-def main(**kwargs):
+
+def main(
+    start_method='forkserver',
+    log_level=logging.INFO,
+    log_limits=DEFAULT_LIMITS,
+    runner_options=None,
+    **kwargs
+):
     """Main entry point."""
-    master = MasterProcess(**kwargs)
+    # Starting runners afresh, rather than forking them from the master,
+    # means that each one only imports what its own board needs instead of
+    # inheriting everything the master has accumulated.
+    multiprocessing.set_start_method(start_method)
+    if start_method == 'forkserver':
+        multiprocessing.set_forkserver_preload(['robotd.runner'])
+
+    # Every process's logs are written out by a thread in this one
+    log_config, log_listener = start_listener(log_level, log_limits)
+    log_config.apply()
+    runner_options = dict(runner_options or {}, log_config=log_config)
+
+    master = MasterProcess(runner_options=runner_options, **kwargs)
 
     setproctitle.setproctitle('robotd master')
 
     master.launch_monitor()
+    master.launch_metrics_server()
+    master.gateway.start()
     try:
+        master.tick()
+        master.notify_ready()
         while True:
-            master.tick()
             time.sleep(1)
+            master.tick()
     except KeyboardInterrupt:
+        notify('STOPPING=1')
         master.cleanup()
+    finally:
+        log_listener.stop()
+
+
+def _keyed_option(parse, metavar, key='BOARD_TYPE'):
+    """Argument type for ``<key>=<metavar>``, parsing the value with `parse`."""
+    def option(value):
+        name, _, setting = value.partition('=')
+        try:
+            return name, parse(setting)
+        except ValueError:
+            raise argparse.ArgumentTypeError(
+                'expected {}={}, got {!r}'.format(key, metavar, value),
+            )
+    return option
+
+
+def _fraction(value):
+    value = float(value)
+    if not 0 <= value <= 1:
+        raise ValueError('not between 0 and 1')
+    return value
 
 
 def main_cmdline():
     """Command line entry point."""
-    import argparse
     parser = argparse.ArgumentParser()
 
     default_root_dir = Path('/var/robotd')
@@ -347,9 +590,146 @@ def main_cmdline():
         ),
         default=default_root_dir,
     )
+    parser.add_argument(
+        '--start-method',
+        choices=multiprocessing.get_all_start_methods(),
+        default='forkserver',
+        help='how to start the board controller processes (defaults to '
+             'forkserver)',
+    )
+    parser.add_argument(
+        '--slow-consumer-policy',
+        choices=Connection.SLOW_CONSUMER_POLICIES,
+        default=Connection.DROP_OLDEST,
+        help='what to do with clients which stop reading their messages '
+             '(defaults to %(default)s)',
+    )
+    parser.add_argument(
+        '--max-queued-bytes',
+        type=int,
+        default=1024 * 1024,
+        help='how much unread output a client may have before the slow '
+             'consumer policy applies (defaults to %(default)s)',
+    )
+    parser.add_argument(
+        '--tick-rate',
+        type=_keyed_option(float, 'RATE'),
+        action='append',
+        default=[],
+        metavar='BOARD_TYPE=RATE',
+        help='how many times a second to tick boards of the given type, '
+             'overriding their default (may be repeated)',
+    )
+    parser.add_argument(
+        '--cpus',
+        type=_keyed_option(parse_cpus, 'CPUS'),
+        action='append',
+        default=[],
+        metavar='BOARD_TYPE=CPUS',
+        help='run boards of the given type only on these CPUs, as in 0,2-3 '
+             '(may be repeated)',
+    )
+    parser.add_argument(
+        '--nice',
+        type=_keyed_option(int, 'NICE'),
+        action='append',
+        default=[],
+        metavar='BOARD_TYPE=NICE',
+        help='nice level for boards of the given type (may be repeated)',
+    )
+    parser.add_argument(
+        '--realtime-priority',
+        type=_keyed_option(int, 'PRIORITY'),
+        action='append',
+        default=[],
+        metavar='BOARD_TYPE=PRIORITY',
+        help='run boards of the given type under SCHED_FIFO at this priority, '
+             'from 1 to 99 (may be repeated)',
+    )
+    parser.add_argument(
+        '--hosted',
+        action='append',
+        default=[],
+        metavar='BOARD_TYPE',
+        help='run boards of the given type on threads of one shared process, '
+             'rather than each in a process of its own (may be repeated)',
+    )
+    parser.add_argument(
+        '--log-level',
+        choices=('debug', 'info', 'warning', 'error'),
+        default='info',
+        help='least severe level of messages to log (defaults to %(default)s)',
+    )
+    parser.add_argument(
+        '--log-rate',
+        type=_keyed_option(float, 'RATE', key='LOGGER'),
+        action='append',
+        default=[],
+        metavar='LOGGER=RATE',
+        help='log at most this many debug messages a second from the given '
+             'logger and its children (may be repeated; robotd is limited to '
+             '{} by default)'.format(DEFAULT_LIMITS['robotd'].rate),
+    )
+    parser.add_argument(
+        '--log-sample',
+        type=_keyed_option(_fraction, 'FRACTION', key='LOGGER'),
+        action='append',
+        default=[],
+        metavar='LOGGER=FRACTION',
+        help='log only this random fraction of the debug messages from the '
+             'given logger and its children (may be repeated)',
+    )
+    parser.add_argument(
+        '--record',
+        action='store_true',
+        help='record all traffic to and from each board, for replaying with '
+             'benchmarks.replay',
+    )
+    parser.add_argument(
+        '--record-max-bytes',
+        type=int,
+        default=DEFAULT_MAX_BYTES,
+        help='size of each recording before it is rotated (defaults to '
+             '%(default)s)',
+    )
+    parser.add_argument(
+        '--status-page-interval',
+        type=float,
+        default=1,
+        metavar='SECONDS',
+        help='how often to check for changes to the status of boards which '
+             "don't tick, for their status pages, or 0 not to (defaults to "
+             '%(default)s)',
+    )
+    parser.add_argument(
+        '--seqpacket',
+        action='store_true',
+        help='also listen on a SOCK_SEQPACKET socket for each board, at '
+             '<socket>.seqpacket',
+    )
     args = parser.parse_args()
 
-    main(root_dir=args.root_dir)
+    main(
+        root_dir=args.root_dir,
+        start_method=args.start_method,
+        hosted_board_types=args.hosted,
+        log_level=getattr(logging, args.log_level.upper()),
+        log_limits=limits_by_logger(args.log_rate, args.log_sample),
+        runner_options={
+            'slow_consumer_policy': args.slow_consumer_policy,
+            'max_queued_bytes': args.max_queued_bytes,
+            'tick_rates': dict(args.tick_rate),
+            'record': args.record,
+            'record_max_bytes': args.record_max_bytes,
+            'seqpacket': args.seqpacket,
+            'status_page_interval': args.status_page_interval or None,
+            'scheduling': scheduling_by_board_type(
+                cpus=args.cpus,
+                nice=args.nice,
+                realtime_priority=args.realtime_priority,
+            ),
+        },
+    )
 
 
 if __name__ == '__main__':
@@ -0,0 +1,40 @@
+"""Memory usage of robotd's processes."""
+
+# Fields of /proc/<pid>/smaps_rollup which we report, by our name for them
+_SMAPS_FIELDS = {
+    'Rss': 'rss',
+    'Pss': 'pss',
+}
+
+
+def _parse_kib_fields(path, fields):
+    values = {}
+    with open(path) as f:
+        for line in f:
+            key, _, rest = line.partition(':')
+            if key in fields:
+                values[fields[key]] = int(rest.split()[0]) * 1024
+    return values
+
+
+def process_memory(pid='self'):
+    """
+    Resident and proportional set sizes of a process, in bytes.
+
+    Returns a dict with ``rss`` and ``pss`` keys. PSS, which shares the cost
+    of each shared page between the processes mapping it, is the fairer
+    measure for a set of processes forked from one another, but it needs
+    Linux 4.14 or later; on older kernels it is ``None``.
+    """
+    try:
+        return _parse_kib_fields(
+            '/proc/{}/smaps_rollup'.format(pid),
+            _SMAPS_FIELDS,
+        )
+    except FileNotFoundError:
+        values = _parse_kib_fields(
+            '/proc/{}/status'.format(pid),
+            {'VmRSS': 'rss'},
+        )
+        values['pss'] = None
+        return values
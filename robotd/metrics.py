@@ -0,0 +1,238 @@
+"""
+Low-overhead counters and histograms.
+
+Each board owns a `Registry` of metrics which its `BoardRunner` serves, in
+the Prometheus text exposition format, from a UNIX socket alongside the
+board's own. The master serves the combination of all of them.
+"""
+
+import bisect
+import collections
+import math
+import time
+
+# Upper bounds (in seconds) of the histogram buckets, chosen to cover
+# everything from a fast JSON encode through to a slow serial timeout.
+DEFAULT_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0,
+)
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape_label(value):
+    return (
+        str(value)
+        .replace('\\', r'\\')
+        .replace('"', r'\"')
+        .replace('\n', r'\n')
+    )
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(
+        '{}="{}"'.format(key, _escape_label(value))
+        for key, value in labels.items()
+    ) + '}'
+
+
+class Counter:
+    """A monotonically increasing count."""
+
+    type_name = 'counter'
+
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def samples(self):
+        yield self.name, (), self.value
+
+
+class Gauge:
+    """A value which can go up and down."""
+
+    type_name = 'gauge'
+
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def dec(self, amount=1):
+        self.value -= amount
+
+    def samples(self):
+        yield self.name, (), self.value
+
+
+class _Timer:
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class Histogram:
+    """
+    A distribution of observed values, counted into fixed buckets.
+
+    Observing a value is a binary search and two additions, so this is cheap
+    enough to use on every command.
+    """
+
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        # One extra slot for values above the largest bucket
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def time(self):
+        """Context manager which observes the time taken by its block."""
+        return _Timer(self)
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    def samples(self):
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), self.counts):
+            cumulative += count
+            yield (
+                self.name + '_bucket',
+                (('le', _format_value(bound)),),
+                cumulative,
+            )
+        yield self.name + '_sum', (), self.sum
+        yield self.name + '_count', (), cumulative
+
+
+class Registry:
+    """A named collection of metrics."""
+
+    def __init__(self):
+        self._metrics = collections.OrderedDict()
+
+    def _get_or_create(self, metric_type, name, *args):
+        try:
+            metric = self._metrics[name]
+        except KeyError:
+            metric = self._metrics[name] = metric_type(name, *args)
+
+        if not isinstance(metric, metric_type):
+            raise ValueError('{} is already registered as a {}'.format(
+                name,
+                metric.type_name,
+            ))
+
+        return metric
+
+    def counter(self, name, documentation):
+        return self._get_or_create(Counter, name, documentation)
+
+    def gauge(self, name, documentation):
+        return self._get_or_create(Gauge, name, documentation)
+
+    def histogram(self, name, documentation, buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, documentation, buckets)
+
+    def __iter__(self):
+        return iter(self._metrics.values())
+
+    def render(self, labels=None):
+        """
+        Render all metrics in the Prometheus text format.
+
+        `labels` are attached to every sample, which is how the runners
+        distinguish their metrics once the master has combined them.
+        """
+        labels = collections.OrderedDict(labels or ())
+        lines = []
+
+        for metric in self:
+            lines.append('# HELP {} {}'.format(
+                metric.name,
+                metric.documentation,
+            ))
+            lines.append('# TYPE {} {}'.format(metric.name, metric.type_name))
+
+            for name, extra_labels, value in metric.samples():
+                sample_labels = collections.OrderedDict(labels)
+                sample_labels.update(extra_labels)
+                lines.append('{}{} {}'.format(
+                    name,
+                    _format_labels(sample_labels),
+                    _format_value(value),
+                ))
+
+        return ''.join(line + '\n' for line in lines)
+
+
+def merge_expositions(texts):
+    """
+    Combine several Prometheus text expositions into one.
+
+    Metric families which appear in more than one of the inputs (as they do
+    when several boards of the same type are attached) are emitted once,
+    with all of their samples grouped beneath a single set of comments.
+    """
+    families = collections.OrderedDict()
+
+    for text in texts:
+        family = None
+        for line in text.splitlines():
+            if not line:
+                continue
+
+            if line.startswith('# '):
+                _, kind, name, _ = (line.split(' ', 3) + [''])[:4]
+                family = families.setdefault(name, {
+                    'comments': collections.OrderedDict(),
+                    'samples': [],
+                })
+                family['comments'].setdefault(kind, line)
+            elif family is not None:
+                family['samples'].append(line)
+
+    lines = []
+    for family in families.values():
+        lines.extend(family['comments'].values())
+        lines.extend(family['samples'])
+
+    return ''.join(line + '\n' for line in lines)
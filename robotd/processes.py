@@ -0,0 +1,24 @@
+"""Helpers for the processes which the master starts."""
+
+import os
+import signal
+
+
+def stop_process(process, terminate_timeout, kill_timeout):
+    """
+    Stop a `multiprocessing.Process`, killing it if it won't terminate.
+
+    Returns whether it had to be killed.
+    """
+    process.terminate()
+    process.join(terminate_timeout)
+    if not process.is_alive():
+        return False
+
+    # `Process.kill` is new in Python 3.7
+    try:
+        os.kill(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+    process.join(kill_timeout)
+    return True
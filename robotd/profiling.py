@@ -0,0 +1,92 @@
+"""
+Time-limited profiling of a runner process, started on demand.
+
+Each capture covers a window of the process's life and is written to a file
+next to the board's socket when it ends:
+
+* ``profile`` runs `cProfile` on the runner's main loop, and writes
+  ``<socket>.pstats``, which can be read with `pstats` or tools such as
+  snakeviz,
+* ``trace-memory`` runs `tracemalloc`, and writes a snapshot of the memory
+  allocated during the window which is still live at its end to
+  ``<socket>.tracemalloc``, which can be loaded with
+  `tracemalloc.Snapshot.load`.
+"""
+
+import abc
+import cProfile
+import tracemalloc
+
+DEFAULT_SECONDS = 10
+MAX_SECONDS = 600
+
+
+class Capture(abc.ABC):
+    """Base class for a capture of one kind, which can run once at a time."""
+
+    # Suffix of the file written next to the socket
+    suffix = None
+
+    def __init__(self, socket_path):
+        self.path = socket_path.with_name(socket_path.name + self.suffix)
+        self.deadline = None
+
+    @property
+    def running(self):
+        return self.deadline is not None
+
+    def start(self, now, seconds):
+        """Start capturing until `seconds` after `now`."""
+        self.deadline = now + seconds
+        self._start()
+
+    def stop(self):
+        """Stop capturing, and write out the results."""
+        self.deadline = None
+        self._stop()
+
+    @abc.abstractmethod
+    def _start(self):
+        """Start capturing."""
+
+    @abc.abstractmethod
+    def _stop(self):
+        """Stop capturing, and write the results to `path`."""
+
+
+class ProfileCapture(Capture):
+    """Profiles the calling thread's Python functions with `cProfile`."""
+
+    suffix = '.pstats'
+
+    def _start(self):
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+
+    def _stop(self):
+        self._profile.disable()
+        self._profile.dump_stats(str(self.path))
+        self._profile = None
+
+
+class MemoryCapture(Capture):
+    """Traces memory allocations with `tracemalloc`."""
+
+    suffix = '.tracemalloc'
+
+    # Stack frames kept for each allocation
+    FRAMES = 10
+
+    def _start(self):
+        tracemalloc.start(self.FRAMES)
+
+    def _stop(self):
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        snapshot.dump(str(self.path))
+
+
+CAPTURES = {
+    'profile': ProfileCapture,
+    'trace-memory': MemoryCapture,
+}
@@ -0,0 +1,183 @@
+"""
+Recording of everything a `BoardRunner` receives and sends.
+
+When recording is turned on (``--record``), each runner appends a record of
+every connection, command, response and status to ``<socket>.rec``, for
+replaying later with ``python -m benchmarks.replay``.
+
+The log is memory-mapped, so writing a record is a copy into the page cache
+rather than a system call, and what has been written survives the runner
+being killed. The file starts with a header, which includes the offset of
+the end of the last complete record, followed by the records themselves:
+each one is a fixed-size binary header (payload length, `time.monotonic`
+timestamp, connection number and kind) followed by a JSON payload.
+
+Once a log is full, or when a runner starts and finds an old one, it is
+rotated: ``<socket>.rec`` becomes ``<socket>.rec.1``, that becomes
+``<socket>.rec.2`` and so on, keeping at most `backups` old logs. The master
+leaves recordings in place when it clears out old sockets at startup.
+"""
+
+import collections
+import enum
+import json
+import mmap
+import os
+import struct
+import time
+from pathlib import Path
+
+MAGIC = b'ROBOTREC'
+FORMAT_VERSION = 1
+
+# Magic, format version, wall-clock and monotonic creation times, end offset
+_FILE_HEADER = struct.Struct('<8sIddQ')
+_END_OFFSET = struct.Struct('<Q')
+_END_OFFSET_POSITION = _FILE_HEADER.size - _END_OFFSET.size
+
+# Payload length, timestamp, connection number, kind
+_RECORD_HEADER = struct.Struct('<IdHB')
+
+DEFAULT_MAX_BYTES = 16 * 1024 * 1024
+DEFAULT_BACKUPS = 3
+
+
+class RecordKind(enum.IntEnum):
+    """What a record records."""
+
+    CONNECT = 1
+    DISCONNECT = 2
+    COMMAND = 3
+    RESPONSE = 4
+    STATUS = 5
+
+
+Record = collections.namedtuple(
+    'Record',
+    ('timestamp', 'connection', 'kind', 'message'),
+)
+
+
+class Recorder:
+    """Appends records to the memory-mapped log at `path`."""
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES, backups=DEFAULT_BACKUPS):
+        if max_bytes < _FILE_HEADER.size + _RECORD_HEADER.size:
+            raise ValueError('max_bytes is too small to hold any records')
+
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._map = None
+
+        if self.path.exists():
+            self._shift_backups()
+        self._open()
+
+    def _open(self):
+        fd = os.open(str(self.path), os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.ftruncate(fd, self.max_bytes)
+            self._map = mmap.mmap(fd, self.max_bytes)
+        finally:
+            os.close(fd)
+
+        self._offset = _FILE_HEADER.size
+        _FILE_HEADER.pack_into(
+            self._map,
+            0,
+            MAGIC,
+            FORMAT_VERSION,
+            time.time(),
+            time.monotonic(),
+            self._offset,
+        )
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    def _rotate(self):
+        self.close()
+        self._shift_backups()
+        self._open()
+
+    def _shift_backups(self):
+        for index in range(self.backups - 1, 0, -1):
+            older = self._backup_path(index)
+            if older.exists():
+                older.rename(self._backup_path(index + 1))
+
+        if self.backups:
+            self.path.rename(self._backup_path(1))
+
+    def _backup_path(self, index):
+        return self.path.with_name('{}.{}'.format(self.path.name, index))
+
+    def record(self, kind, connection, payload=b''):
+        """
+        Append a record with an already-encoded JSON `payload`.
+
+        `connection` is a number identifying the client connection.
+        """
+        size = _RECORD_HEADER.size + len(payload)
+        if size > self.max_bytes - _FILE_HEADER.size:
+            # Would never fit, even in an empty log
+            return
+
+        if self._offset + size > self.max_bytes:
+            self._rotate()
+
+        offset = self._offset
+        _RECORD_HEADER.pack_into(
+            self._map,
+            offset,
+            len(payload),
+            time.monotonic(),
+            connection & 0xffff,
+            kind,
+        )
+        start = offset + _RECORD_HEADER.size
+        self._map[start:start + len(payload)] = payload
+
+        # Only publish the record once it is complete
+        self._offset = offset + size
+        _END_OFFSET.pack_into(self._map, _END_OFFSET_POSITION, self._offset)
+
+    def record_message(self, kind, connection, message):
+        """Append a record of a JSON-compatible `message`."""
+        self.record(kind, connection, json.dumps(message).encode('utf-8'))
+
+
+def is_recording(path):
+    """Whether `path` is a recording or one of its backups."""
+    name = Path(path).name
+    return name.endswith('.rec') or '.rec.' in name
+
+
+def read_records(path):
+    """Yield every `Record` in the log at `path`, oldest first."""
+    with open(str(path), 'rb') as f:
+        data = f.read()
+
+    magic, version, _, _, end = _FILE_HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError('{} is not a robotd recording'.format(path))
+
+    offset = _FILE_HEADER.size
+    while offset < end:
+        length, timestamp, connection, kind = _RECORD_HEADER.unpack_from(
+            data,
+            offset,
+        )
+        offset += _RECORD_HEADER.size
+        payload = data[offset:offset + length]
+        offset += length
+
+        yield Record(
+            timestamp,
+            connection,
+            RecordKind(kind),
+            json.loads(payload.decode('utf-8')) if payload else None,
+        )
@@ -0,0 +1,46 @@
+"""Round-trip time estimation, for choosing how long to wait for replies."""
+
+
+class RttEstimator:
+    """
+    Estimates a link's round-trip time, and from it a timeout.
+
+    This is TCP's retransmission timer (RFC 6298): the timeout is the
+    smoothed RTT plus four times its smoothed mean deviation, so that it
+    sits just above the slowest normal replies, clamped between
+    `min_timeout` and `max_timeout`. Each timeout doubles it until the next
+    sample, so a link which has become slower is waited for longer rather
+    than retried at the old rate indefinitely.
+
+    Only replies to a first attempt should be sampled: a reply after a
+    retry might be to either attempt, so its RTT is ambiguous.
+    """
+
+    ALPHA = 1 / 8
+    BETA = 1 / 4
+    K = 4
+
+    def __init__(self, initial_timeout, min_timeout, max_timeout):
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.srtt = None
+        self.rttvar = None
+        self.timeout = initial_timeout
+
+    def sample(self, rtt):
+        """Update the estimate with a measured round-trip time."""
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar += self.BETA * (abs(self.srtt - rtt) - self.rttvar)
+            self.srtt += self.ALPHA * (rtt - self.srtt)
+
+        self.timeout = min(
+            max(self.srtt + self.K * self.rttvar, self.min_timeout),
+            self.max_timeout,
+        )
+
+    def backoff(self):
+        """Note that a reply timed out."""
+        self.timeout = min(self.timeout * 2, self.max_timeout)
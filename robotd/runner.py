@@ -0,0 +1,1166 @@
+"""Controller processes which each serve one board over a UNIX socket."""
+
+import collections
+import copy
+import json
+import logging
+import multiprocessing
+import numbers
+import select
+import signal
+import socket
+import time
+from pathlib import Path
+
+import setproctitle
+
+from . import profiling, tracing
+from .memory import process_memory
+from .recorder import DEFAULT_MAX_BYTES, Recorder, RecordKind
+from .scheduler import (
+    CommandScheduler,
+    RejectedMessage,
+    TickScheduler,
+    is_poll,
+)
+from .scheduling import Scheduling
+from .status_page import StatusPage
+
+LOGGER = logging.getLogger(__name__)
+
+
+def encode_message(message):
+    """Encode a JSON-compatible message as a line of bytes."""
+    return json.dumps(message).encode('utf-8') + b'\n'
+
+
+class SlowConsumerError(ConnectionError):
+    """A client has fallen too far behind in reading its messages."""
+
+    pass
+
+
+class Connection:
+    """
+    A connection to a device.
+
+    This wraps a ``socket.socket`` providing encoding and decoding so that
+    consumers of this class can send and receive JSON-compatible typed data
+    rather than needing to worry about lower-level details.
+
+    Sending never blocks: messages are queued and written as and when the
+    socket will take them, with `flush` called again once it is writable. If
+    the client lets more than `max_queued_bytes` build up, the
+    `slow_consumer_policy` decides what happens:
+
+    * ``drop-oldest`` discards the oldest queued broadcasts to make room,
+      and gives up on the client if there are none (replies to the client's
+      own commands are never dropped),
+    * ``disconnect`` gives up on the client straight away.
+
+    Giving up on a client is signalled by raising `SlowConsumerError`.
+    """
+
+    DROP_OLDEST = 'drop-oldest'
+    DISCONNECT = 'disconnect'
+    SLOW_CONSUMER_POLICIES = (DROP_OLDEST, DISCONNECT)
+
+    def __init__(
+        self,
+        socket,
+        max_queued_bytes=1024 * 1024,
+        slow_consumer_policy=DROP_OLDEST,
+    ):
+        """Wrap the given socket."""
+        if slow_consumer_policy not in self.SLOW_CONSUMER_POLICIES:
+            raise ValueError('Unknown slow consumer policy: {!r}'.format(
+                slow_consumer_policy,
+            ))
+
+        self.socket = socket
+        self.data = b''
+
+        self.max_queued_bytes = max_queued_bytes
+        self.slow_consumer_policy = slow_consumer_policy
+
+        # Queue of (line, droppable) pairs, of which the first
+        # `_output_offset` bytes of the first have already been sent.
+        self._output = collections.deque()
+        self._output_offset = 0
+        self.queued_bytes = 0
+        self.dropped_messages = 0
+
+        # Set once the client has hung up, though we may still have its
+        # commands to run.
+        self.closing = False
+
+    def close(self):
+        """Close the connection."""
+        self.socket.close()
+
+    def send(self, message):
+        """Send the given JSON-compatible message over the connection."""
+        self.send_line(encode_message(message))
+
+    def send_line(self, line, droppable=False):
+        """
+        Send an already-encoded message over the connection.
+
+        `droppable` messages may be discarded under the ``drop-oldest``
+        policy if the client is not keeping up.
+        """
+        self._output.append((line, droppable))
+        self.queued_bytes += len(line)
+
+        self.flush()
+
+        if self.queued_bytes > self.max_queued_bytes:
+            self._shed_load()
+
+    @property
+    def wants_write(self):
+        """Whether there is queued output waiting for the socket."""
+        return bool(self._output)
+
+    def flush(self):
+        """Send as much of the queued output as the socket will take."""
+        while self._output:
+            line, _ = self._output[0]
+            try:
+                sent = self.socket.send(
+                    memoryview(line)[self._output_offset:],
+                    socket.MSG_DONTWAIT,
+                )
+            except (BlockingIOError, InterruptedError):
+                return
+
+            self._output_offset += sent
+            if self._output_offset == len(line):
+                self._output.popleft()
+                self.queued_bytes -= len(line)
+                self._output_offset = 0
+
+    def _shed_load(self):
+        if self.slow_consumer_policy == self.DROP_OLDEST:
+            # Never drop the message at the head of the queue if we've
+            # started sending it, as that would corrupt the stream.
+            first = 1 if self._output_offset else 0
+
+            kept = collections.deque()
+            for index, (line, droppable) in enumerate(self._output):
+                over_limit = self.queued_bytes > self.max_queued_bytes
+                if over_limit and droppable and index >= first:
+                    self.queued_bytes -= len(line)
+                    self.dropped_messages += 1
+                else:
+                    kept.append((line, droppable))
+            self._output = kept
+
+            if self.queued_bytes <= self.max_queued_bytes:
+                return
+
+        raise SlowConsumerError(
+            'Client has {} bytes of unread messages'.format(self.queued_bytes),
+        )
+
+    def receive_available(self):
+        """
+        Receive all the messages which have arrived on the connection.
+
+        This makes a single read, so only blocks if nothing has arrived.
+        Returns ``None`` once the other end has hung up.
+        """
+        data = self.socket.recv(65536)
+        if data == b'':
+            return None
+
+        lines = (self.data + data).split(b'\n')
+        self.data = lines.pop()
+
+        return [
+            json.loads(line.decode('utf-8'))
+            for line in lines
+            if line.strip()
+        ]
+
+    def receive(self):
+        """Receive a single message from the connection."""
+        while b'\n' not in self.data:
+            message = self.socket.recv(4096)
+            if message == b'':
+                return None
+
+            self.data += message
+        line = self.data.split(b'\n', 1)[0]
+        self.data = self.data[len(line) + 1:]
+
+        return json.loads(line.decode('utf-8'))
+
+
+class SeqpacketConnection(Connection):
+    """
+    A connection over a ``SOCK_SEQPACKET`` socket.
+
+    Each message is one datagram, so there is no need to look for the ends
+    of lines, and no partial messages to keep track of. Datagrams are read
+    into a preallocated buffer of `MAX_MESSAGE_SIZE` bytes; longer ones are
+    discarded, and answered with an error in their place. Outgoing messages
+    keep the trailing newline of the stream encoding, so that an encoded
+    broadcast can be shared by every connection.
+    """
+
+    MAX_MESSAGE_SIZE = 65536
+
+    def __init__(self, socket, **kwargs):
+        super().__init__(socket, **kwargs)
+        self._buffer = bytearray(self.MAX_MESSAGE_SIZE)
+        self._view = memoryview(self._buffer)
+
+    def _receive_datagram(self, flags=0):
+        """
+        Receive one datagram, and decode the message in it.
+
+        Returns ``None`` if the datagram is blank, and a `RejectedMessage` if
+        it was too long. Raises `EOFError` once the other end has hung up.
+        """
+        size, _, msg_flags, _ = self.socket.recvmsg_into([self._buffer], 0, flags)
+
+        if not size and not msg_flags:
+            raise EOFError
+
+        if msg_flags & socket.MSG_TRUNC:
+            LOGGER.warning(
+                'Discarding message longer than %d bytes',
+                self.MAX_MESSAGE_SIZE,
+            )
+            return RejectedMessage({
+                'status': 'error',
+                'type': 'MessageTooLong',
+                'description': 'Messages are limited to {} bytes'.format(
+                    self.MAX_MESSAGE_SIZE,
+                ),
+            })
+
+        # Decode straight from the buffer, without copying it first
+        text = str(self._view[:size], 'utf-8')
+        if not text.strip():
+            return None
+        return json.loads(text)
+
+    def receive_available(self):
+        """
+        Receive all the messages which have arrived on the connection.
+
+        Only blocks if nothing has arrived. Returns ``None`` once the other
+        end has hung up.
+        """
+        messages = []
+        flags = 0
+        while True:
+            try:
+                message = self._receive_datagram(flags)
+            except (BlockingIOError, InterruptedError):
+                return messages
+            except EOFError:
+                # End of file, unless we've already got something to run
+                return messages or None
+
+            if message is not None:
+                messages.append(message)
+
+            # Only the first read may block
+            flags = socket.MSG_DONTWAIT
+
+    def receive(self):
+        """Receive a single message from the connection."""
+        while True:
+            try:
+                message = self._receive_datagram()
+            except EOFError:
+                return None
+            if message is not None:
+                return message
+
+
+class Subscription:
+    """
+    A connection's subscription to some of its board's status fields.
+
+    The fields are checked at most `max_rate` times a second, and any which
+    have changed since they were last pushed to the client are pushed again.
+    """
+
+    DEFAULT_MAX_RATE = 10
+    MAX_MAX_RATE = 1000
+
+    def __init__(self, fields, max_rate, now):
+        self.fields = fields
+        self.max_rate = max_rate
+        self.interval = 1 / max_rate
+        self.next_check = now
+        self.version = None
+        # Field -> value, as last pushed; empty so that the first check
+        # pushes every field
+        self.values = {}
+
+    def changes(self, version, status):
+        """The subscribed fields of `status` which have changed."""
+        if version == self.version:
+            return {}
+        self.version = version
+
+        changes = {
+            field: status[field]
+            for field in self.fields
+            if field in status and (
+                field not in self.values or status[field] != self.values[field]
+            )
+        }
+        # The board may change the values in place
+        self.values.update(copy.deepcopy(changes))
+        return changes
+
+
+class BoardRunner(multiprocessing.Process):
+    """
+    Control process for one board.
+
+    `tick_rates` maps board type IDs to the rate at which to call
+    `Board.tick`, overriding the board's own `tick_rate`. If `record` is set,
+    all traffic is recorded to ``<socket>.rec``; see `robotd.recorder`. If
+    `seqpacket` is set, clients can also connect to ``<socket>.seqpacket``,
+    which sends and receives one message per datagram.
+
+    `scheduling` maps board type IDs to the `robotd.scheduling.Scheduling`
+    of their runners: which CPUs they run on, and at what priority. If
+    `log_config` is given, the runner's log records are sent to the master
+    to be written out; see `robotd.logs`.
+
+    The board's status is published to ``<socket>.status`` whenever it is
+    fetched for a client or a subscription, and after each tick; see
+    `robotd.status_page`. The status of boards which don't tick is also
+    checked every `status_page_interval` seconds, unless it is ``None``, so
+    that their pages are kept up to date with no clients connected.
+
+    The master calls `bind` before starting the runner, so that clients can
+    connect as soon as the board has been found; their connections wait in
+    the socket's backlog until the runner is ready to greet them.
+
+    The ``profile`` and ``trace-memory`` admin commands capture a profile of
+    the process for a number of seconds; see `robotd.profiling`. Sending the
+    process ``SIGUSR2`` starts or stops a profile.
+
+    A client can also send ``{"subscribe": [<field>, ...], "max-rate": <hz>}``
+    to have the named status fields pushed to it whenever they change, as
+    messages like ``{"broadcast": true, "subscription": {<field>: <value>}}``;
+    see `Subscription`.
+    """
+
+    def __init__(
+        self,
+        board,
+        root_dir,
+        max_queued_bytes=1024 * 1024,
+        slow_consumer_policy=Connection.DROP_OLDEST,
+        tick_rates=None,
+        record=False,
+        record_max_bytes=DEFAULT_MAX_BYTES,
+        seqpacket=False,
+        status_page_interval=1,
+        scheduling=None,
+        log_config=None,
+        **kwargs
+    ):
+        super().__init__(**kwargs)
+
+        self.board = board
+        self.tick_rate = (tick_rates or {}).get(
+            type(board).board_type_id,
+            board.tick_rate,
+        )
+        self.scheduling = (scheduling or {}).get(
+            type(board).board_type_id,
+            Scheduling(),
+        )
+        self.log_config = log_config
+        self.max_queued_bytes = max_queued_bytes
+        self.slow_consumer_policy = slow_consumer_policy
+        self.socket_path = (
+            Path(root_dir) / type(board).board_type_id / board.name(board.node)
+        )
+        self.metrics_path = self.socket_path.with_name(
+            self.socket_path.name + '.metrics',
+        )
+        self.trace_path = self.socket_path.with_name(
+            self.socket_path.name + '.trace.json',
+        )
+        self.record = record
+        self.record_max_bytes = record_max_bytes
+        self.record_path = self.socket_path.with_name(
+            self.socket_path.name + '.rec',
+        )
+        self.recorder = None
+        self.seqpacket = seqpacket
+        self.seqpacket_path = self.socket_path.with_name(
+            self.socket_path.name + '.seqpacket',
+        )
+        self.seqpacket_socket = None
+        # Bound by `bind`, if the socket is created before the runner starts
+        self.server_socket = None
+        self.status_page_path = self.socket_path.with_name(
+            self.socket_path.name + '.status',
+        )
+        self.status_page = None
+        self.status_page_interval = status_page_interval
+        self._next_status_publish = None
+        self.captures = {
+            name: capture_class(self.socket_path)
+            for name, capture_class in profiling.CAPTURES.items()
+        }
+
+        self._prepare_socket_path()
+
+        self.connections = {}
+        # Numbers identifying each connection in recordings
+        self._connection_numbers = {}
+        self._next_connection_number = 0
+        self.scheduler = CommandScheduler(board, board.metrics)
+        # Connection -> `Subscription`
+        self.subscriptions = {}
+        self.ticker = None
+        if self.tick_rate:
+            self.ticker = TickScheduler(self.tick_rate, board.metrics)
+        self.metrics_socket = None
+        # Sockets found to be dead while sending, to be closed at the end of
+        # the current pass through the event loop.
+        self._dead_sockets = set()
+
+        # The encoded status, as last sent, and its version. Versions count
+        # up from the time the runner was created, so that they keep
+        # increasing when a board's runner is restarted.
+        self._status_version = int(time.time() * 1000)
+        self._status_line = None
+        self._status = None
+        self._last_status = None
+        self._seen_board_version = None
+
+        self.metrics = board.metrics
+        self._command_seconds = self.metrics.histogram(
+            'robotd_command_seconds',
+            'Time spent running client commands on the board',
+        )
+        self._status_seconds = self.metrics.histogram(
+            'robotd_status_seconds',
+            'Time spent fetching the board status',
+        )
+        self._not_modified = self.metrics.counter(
+            'robotd_status_not_modified_total',
+            'Number of conditional status polls answered as not modified',
+        )
+        self._tick_seconds = self.metrics.histogram(
+            'robotd_tick_seconds',
+            'Time spent in periodic board ticks',
+        )
+        self._subscription_pushes = self.metrics.counter(
+            'robotd_subscription_pushes_total',
+            'Number of changed status fields pushed to subscribers',
+        )
+        self._encode_seconds = self.metrics.histogram(
+            'robotd_encode_seconds',
+            'Time spent encoding messages to JSON',
+        )
+        self._connections_gauge = self.metrics.gauge(
+            'robotd_connections',
+            'Number of open client connections',
+        )
+        self._dropped_messages = self.metrics.counter(
+            'robotd_dropped_messages_total',
+            'Number of broadcasts dropped because a client was not reading',
+        )
+        self._slow_consumer_disconnects = self.metrics.counter(
+            'robotd_slow_consumer_disconnects_total',
+            'Number of clients disconnected for not reading their messages',
+        )
+        self._dropped_log_records = self.metrics.counter(
+            'robotd_log_records_dropped_total',
+            'Log records dropped by rate limits or for want of queue space',
+        )
+        self._rss_gauge = self.metrics.gauge(
+            'robotd_process_rss_bytes',
+            'Resident set size of the controller process',
+        )
+        self._pss_gauge = self.metrics.gauge(
+            'robotd_process_pss_bytes',
+            'Proportional set size of the controller process',
+        )
+
+    def _prepare_socket_path(self):
+        try:
+            self.socket_path.parent.mkdir(parents=True)
+        except FileExistsError:
+            if self.socket_path.exists():
+                LOGGER.warning('removing old %r', self.socket_path)
+                self._delete_socket_path()
+
+    def _delete_socket_path(self):
+        for path in (
+            self.socket_path,
+            self.metrics_path,
+            self.seqpacket_path,
+            self.status_page_path,
+        ):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def _create_seqpacket_socket(self):
+        seqpacket_socket = socket.socket(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        seqpacket_socket.bind(str(self.seqpacket_path))
+        seqpacket_socket.listen(5)
+        self.seqpacket_path.chmod(0o777)
+        return seqpacket_socket
+
+    def bind(self):
+        """
+        Create the board's socket, ahead of starting the runner.
+
+        The socket is handed to the runner when it starts, so the caller
+        should close its own copy with `close_server_socket` afterwards.
+        """
+        self.server_socket = self._create_server_socket()
+
+    def close_server_socket(self):
+        """Close this process's copy of a socket created by `bind`."""
+        if self.server_socket is not None:
+            self.server_socket.close()
+
+    def _create_server_socket(self):
+        server_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+        server_socket.bind(str(self.socket_path))
+        server_socket.listen(5)
+
+        self.socket_path.chmod(0o777)
+
+        LOGGER.info('Listening on: %s', self.socket_path)
+
+        return server_socket
+
+    def _process_title(self):
+        return 'robotd {}: {}'.format(
+            type(self.board).board_type_id,
+            type(self.board).name(self.board.node),
+        )
+
+    def _create_metrics_socket(self):
+        metrics_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+        metrics_socket.bind(str(self.metrics_path))
+        metrics_socket.listen(5)
+
+        self.metrics_path.chmod(0o777)
+
+        return metrics_socket
+
+    def render_metrics(self):
+        """Render this board's metrics in the Prometheus text format."""
+        memory = process_memory()
+        self._rss_gauge.set(memory['rss'])
+        if memory['pss'] is not None:
+            self._pss_gauge.set(memory['pss'])
+
+        return self.metrics.render(labels=(
+            ('board_type', type(self.board).board_type_id),
+            ('board', type(self.board).name(self.board.node)),
+        ))
+
+    def _serve_metrics(self):
+        metrics_connection, _ = self.metrics_socket.accept()
+        try:
+            metrics_connection.sendall(self.render_metrics().encode('utf-8'))
+        except OSError:
+            LOGGER.exception('Failed to send metrics')
+        finally:
+            metrics_connection.close()
+
+    def _send(self, connection, message):
+        with tracing.span('send'):
+            with self._encode_seconds.time():
+                line = encode_message(message)
+            self._send_line(connection, line)
+
+    def _send_line(self, connection, line, droppable=False):
+        dropped_before = connection.dropped_messages
+        try:
+            connection.send_line(line, droppable)
+        except SlowConsumerError as e:
+            LOGGER.warning('Disconnecting slow client: %s', e)
+            self._slow_consumer_disconnects.inc()
+            self._dead_sockets.add(connection.socket)
+        except OSError:
+            self._connection_failed(connection)
+        self._dropped_messages.inc(
+            connection.dropped_messages - dropped_before,
+        )
+
+    def _connection_failed(self, connection):
+        # A client which has hung up still gets its remaining commands run,
+        # even though it won't see the replies; it is closed afterwards.
+        if not connection.closing:
+            self._dead_sockets.add(connection.socket)
+
+    def dump_trace(self):
+        """Write this process's trace buffer next to the board's socket."""
+        num_events = tracing.TRACER.dump(
+            self.trace_path,
+            process_name=self._process_title(),
+        )
+        LOGGER.info('Dumped %d trace events to %s', num_events, self.trace_path)
+        return num_events
+
+    def _handle_dump_trace_signal(self, signum, frame):
+        self.dump_trace()
+
+    def _start_capture(self, name, seconds):
+        capture = self.captures[name]
+        if capture.running:
+            return {
+                'status': 'error',
+                'type': 'CaptureRunning',
+                'description': 'A {} capture is already running'.format(name),
+            }
+
+        if (
+            not isinstance(seconds, numbers.Real) or
+            not 0 < seconds <= profiling.MAX_SECONDS
+        ):
+            return {
+                'status': 'error',
+                'type': 'InvalidCapture',
+                'description': 'Invalid number of seconds: {!r}'.format(seconds),
+            }
+
+        capture.start(time.monotonic(), seconds)
+        LOGGER.info('Started %s capture for %ss', name, seconds)
+        return {'status': 'ok', 'path': str(capture.path), 'seconds': seconds}
+
+    def _stop_capture(self, name):
+        capture = self.captures[name]
+        if not capture.running:
+            return {
+                'status': 'error',
+                'type': 'CaptureNotRunning',
+                'description': 'No {} capture is running'.format(name),
+            }
+
+        capture.stop()
+        LOGGER.info('Wrote %s capture to %s', name, capture.path)
+        return {'status': 'ok', 'path': str(capture.path)}
+
+    def _finish_captures(self):
+        now = time.monotonic()
+        for name, capture in self.captures.items():
+            if capture.running and now >= capture.deadline:
+                self._stop_capture(name)
+
+    def _handle_profile_signal(self, signum, frame):
+        if self.captures['profile'].running:
+            self._stop_capture('profile')
+        else:
+            self._start_capture('profile', profiling.DEFAULT_SECONDS)
+
+    def _admin_command(self, command):
+        """Run a command aimed at the runner itself rather than the board."""
+        action = command['admin']
+
+        for name in self.captures:
+            if action == name:
+                return self._start_capture(
+                    name,
+                    command.get('seconds', profiling.DEFAULT_SECONDS),
+                )
+            if action == 'stop-' + name:
+                return self._stop_capture(name)
+
+        if action == 'dump-trace':
+            return {
+                'status': 'ok',
+                'path': str(self.trace_path),
+                'events': self.dump_trace(),
+            }
+
+        if action == 'connections':
+            return {
+                'status': 'ok',
+                'connections': [
+                    {
+                        'queued-commands': self.scheduler.depth(connection),
+                        'max-queued-commands': (
+                            self.scheduler.max_depth(connection)
+                        ),
+                        'queued-bytes': connection.queued_bytes,
+                        'dropped-messages': connection.dropped_messages,
+                    }
+                    for connection in self.connections.values()
+                ],
+            }
+
+        return {
+            'status': 'error',
+            'type': 'UnknownAdminCommand',
+            'description': 'Unknown admin command: {!r}'.format(action),
+        }
+
+    def broadcast(self, message):
+        """Broadcast a message over all connections."""
+        message = dict(message)
+        message['broadcast'] = True
+
+        with tracing.span('broadcast'):
+            # Encode once, however many clients there are
+            with self._encode_seconds.time():
+                line = encode_message(message)
+
+            for connection in self.connections.values():
+                self._send_line(connection, line, droppable=True)
+
+    def _current_status(self):
+        """
+        The board's status, encoded with its version, and the version.
+
+        The status is only fetched and encoded again when it may have changed:
+        boards which track their own changes are trusted to say so, and the
+        status of any others is compared with the last one sent.
+        """
+        board = self.board
+
+        if board.tracks_status_changes:
+            if board.status_version == self._seen_board_version:
+                return self._status_version, self._status_line
+            self._seen_board_version = board.status_version
+
+        with tracing.span('status'), self._status_seconds.time():
+            board_status = board.status()
+
+        if not board.tracks_status_changes:
+            if board_status == self._last_status:
+                return self._status_version, self._status_line
+            self._last_status = copy.deepcopy(board_status)
+
+        self._status_version += 1
+        LOGGER.debug('Board status changed: %s', board_status)
+
+        versioned_status = dict(board_status)
+        versioned_status['version'] = self._status_version
+        self._status = versioned_status
+        with self._encode_seconds.time():
+            self._status_line = encode_message(versioned_status)
+
+        if self.status_page is not None:
+            self.status_page.publish(self._status_version, self._status_line[:-1])
+
+        return self._status_version, self._status_line
+
+    @property
+    def _polls_status_page(self):
+        # A ticking board's page is published after every tick anyway
+        return (
+            self.status_page is not None and
+            self.status_page_interval is not None and
+            self.ticker is None
+        )
+
+    def _refresh_status_page(self):
+        if not self._polls_status_page:
+            return
+
+        now = time.monotonic()
+        if now < self._next_status_publish:
+            return
+
+        self._next_status_publish = now + self.status_page_interval
+        # Publishes the status if it has changed
+        self._current_status()
+
+    def _subscribe(self, connection, command):
+        """Replace `connection`'s subscription, or cancel it if empty."""
+        fields = command['subscribe']
+        max_rate = command.get('max-rate', Subscription.DEFAULT_MAX_RATE)
+
+        if (
+            not isinstance(fields, list) or
+            not all(isinstance(field, str) for field in fields)
+        ):
+            description = 'Subscribe to a list of status fields, not {!r}'.format(
+                fields,
+            )
+        elif (
+            not isinstance(max_rate, numbers.Real) or
+            not 0 < max_rate <= Subscription.MAX_MAX_RATE
+        ):
+            description = 'Invalid max-rate: {!r}'.format(max_rate)
+        else:
+            if fields:
+                self.subscriptions[connection] = Subscription(
+                    fields,
+                    max_rate,
+                    time.monotonic(),
+                )
+            else:
+                self.subscriptions.pop(connection, None)
+            return {'status': 'ok', 'fields': fields, 'max-rate': max_rate}
+
+        return {
+            'status': 'error',
+            'type': 'InvalidSubscription',
+            'description': description,
+        }
+
+    def _push_subscriptions(self):
+        if not self.subscriptions:
+            return
+
+        now = time.monotonic()
+        due = [
+            (connection, subscription)
+            for connection, subscription in self.subscriptions.items()
+            if now >= subscription.next_check
+        ]
+        if not due:
+            return
+
+        version, _ = self._current_status()
+        for connection, subscription in due:
+            subscription.next_check = now + subscription.interval
+            changes = subscription.changes(version, self._status)
+            if not changes:
+                continue
+
+            self._subscription_pushes.inc(len(changes))
+            with self._encode_seconds.time():
+                line = encode_message({
+                    'broadcast': True,
+                    'subscription': changes,
+                    'version': version,
+                })
+            # Not droppable, since a dropped change would never be resent
+            self._send_line(connection, line)
+
+    def _send_board_status(self, connection, count=1, if_newer_than=None):
+        version, line = self._current_status()
+
+        if if_newer_than is not None and if_newer_than == version:
+            self._not_modified.inc(count)
+            line = encode_message({'version': version, 'not-modified': True})
+
+        with tracing.span('send'):
+            for _ in range(count):
+                self._record(RecordKind.STATUS, connection, line[:-1])
+                self._send_line(connection, line)
+
+    def _send_command_response(self, connection, response):
+        message = {'response': response}
+        LOGGER.debug('Sending command response: %s', message)
+        self._record_message(RecordKind.RESPONSE, connection, response)
+        self._send(connection, message)
+
+    def _record(self, kind, connection, payload=b''):
+        if self.recorder is not None:
+            number = self._connection_numbers[connection]
+            self.recorder.record(kind, number, payload)
+
+    def _record_message(self, kind, connection, message):
+        if self.recorder is not None:
+            number = self._connection_numbers[connection]
+            self.recorder.record_message(kind, number, message)
+
+    def run(self):
+        """
+        Control this board.
+
+        This is the entry point from the control subprocess and its job is to:
+
+        * Create and manage the UNIX socket in `/var/robotd`,
+        * Pass on commands to the `board`,
+        * Call `make_safe` whenever the last user disconnects,
+        * Deal with error handling and shutdown.
+        """
+
+        if self.log_config is not None:
+            self.log_config.apply(on_drop=self._dropped_log_records.inc)
+        self.scheduling.apply()
+        setproctitle.setproctitle(self._process_title())
+
+        # Start with an empty trace buffer, rather than whatever was inherited
+        # from the master, and dump it on request.
+        tracing.TRACER.clear()
+        signal.signal(signal.SIGUSR1, self._handle_dump_trace_signal)
+        signal.signal(signal.SIGUSR2, self._handle_profile_signal)
+
+        self.serve()
+
+    def serve(self, stop_socket=None):
+        """
+        Run the board until `stop_socket`, if given, becomes readable.
+
+        Called by `run` in the runner's own process, or on a thread of a
+        `robotd.host.RunnerHost`, which sets up the process itself.
+        """
+        server_socket = self.server_socket
+        if server_socket is None:
+            server_socket = self._create_server_socket()
+        self.metrics_socket = self._create_metrics_socket()
+        if self.seqpacket:
+            self.seqpacket_socket = self._create_seqpacket_socket()
+        if self.record:
+            self.recorder = Recorder(self.record_path, self.record_max_bytes)
+        self.status_page = StatusPage(self.status_page_path)
+
+        self.board.broadcast = self.broadcast
+        self.board.start()
+        if self.ticker is not None:
+            self.ticker.start(time.monotonic())
+        self._next_status_publish = time.monotonic()
+        # Publishes the initial status
+        self._current_status()
+
+        try:
+            while not self._process_connections(server_socket, stop_socket):
+                pass
+        finally:
+            self.board.make_safe()
+            # Keep whatever was captured before the runner stopped
+            for name, capture in self.captures.items():
+                if capture.running:
+                    self._stop_capture(name)
+            self._close_sockets(server_socket)
+
+    def _close_sockets(self, server_socket):
+        # Only matters when the process carries on without us
+        self._close_dead_sockets(list(self.connections.keys()))
+        for sock in (server_socket, self.metrics_socket, self.seqpacket_socket):
+            if sock is not None:
+                sock.close()
+        if self.recorder is not None:
+            self.recorder.close()
+        self.status_page.close()
+
+    def _process_connections(self, server_socket, stop_socket=None):
+        """Run one pass of the main loop; returns whether to stop."""
+        connection_sockets = list(self.connections.keys())
+        listening_sockets = [server_socket]
+        if stop_socket is not None:
+            listening_sockets.append(stop_socket)
+        if self.metrics_socket is not None:
+            listening_sockets.append(self.metrics_socket)
+        if self.seqpacket_socket is not None:
+            listening_sockets.append(self.seqpacket_socket)
+
+        # Wait until one of the sockets is ready to read, or one with queued
+        # output is ready to write, unless there are already commands
+        # waiting to be run or the next tick or status refresh comes due
+        # first.
+        if self.scheduler:
+            timeout = 0
+        else:
+            now = time.monotonic()
+            deadlines = []
+            if self.ticker is not None and self.ticker.running:
+                deadlines.append(self.ticker.timeout(now))
+            if self._polls_status_page:
+                deadlines.append(max(0, self._next_status_publish - now))
+            if self.subscriptions:
+                deadlines.append(max(0, min(
+                    subscription.next_check
+                    for subscription in self.subscriptions.values()
+                ) - now))
+            deadlines.extend(
+                max(0, capture.deadline - now)
+                for capture in self.captures.values()
+                if capture.running
+            )
+            timeout = min(deadlines) if deadlines else None
+
+        with tracing.span('select'):
+            readable, writable, errorable = select.select(
+                # connections that want to read
+                listening_sockets + [
+                    sock
+                    for sock, connection in self.connections.items()
+                    if not connection.closing
+                ],
+                # connections that want to write
+                [
+                    sock
+                    for sock, connection in self.connections.items()
+                    if connection.wants_write
+                ],
+                # connections that want to error
+                connection_sockets,
+                timeout,
+            )
+
+        if stop_socket in readable:
+            return True
+
+        for sock in writable:
+            connection = self.connections[sock]
+            try:
+                connection.flush()
+            except OSError:
+                self._connection_failed(connection)
+
+        # New connections
+        if server_socket in readable:
+            self._accept(server_socket, Connection)
+        if self.seqpacket_socket in readable:
+            self._accept(self.seqpacket_socket, SeqpacketConnection)
+
+        if self.metrics_socket in readable:
+            self._serve_metrics()
+
+        for sock in readable:
+            try:
+                connection = self.connections[sock]
+            except KeyError:
+                continue
+
+            if sock in self._dead_sockets:
+                continue
+
+            try:
+                with tracing.span('receive'):
+                    commands = connection.receive_available()
+            except OSError:
+                commands = None
+
+            if commands is None:
+                connection.closing = True
+                continue
+
+            for command in commands:
+                self._record_message(RecordKind.COMMAND, connection, command)
+                self.scheduler.add(connection, command)
+
+        # Run one command per pass, so that we go back to check for anything
+        # more urgent in between.
+        self._run_next_command()
+        self._run_tick()
+        self._refresh_status_page()
+        self._push_subscriptions()
+        self._finish_captures()
+
+        for sock, connection in self.connections.items():
+            if connection.closing and not self.scheduler.depth(connection):
+                self._dead_sockets.add(sock)
+
+        dead_sockets = self._dead_sockets.union(errorable)
+        self._dead_sockets.clear()
+
+        self._close_dead_sockets(dead_sockets)
+
+        if dead_sockets and not self.connections:
+            LOGGER.info('Last connection closed')
+            self.board.make_safe()
+
+        return False
+
+    def _accept(self, listening_socket, connection_class):
+        new_socket, _ = listening_socket.accept()
+        new_connection = connection_class(
+            new_socket,
+            max_queued_bytes=self.max_queued_bytes,
+            slow_consumer_policy=self.slow_consumer_policy,
+        )
+        self.connections[new_socket] = new_connection
+        self._connection_numbers[new_connection] = self._next_connection_number
+        self._next_connection_number += 1
+        self._record(RecordKind.CONNECT, new_connection)
+        self._connections_gauge.set(len(self.connections))
+        LOGGER.info('New connection at: %s', listening_socket.getsockname())
+        self._send_board_status(new_connection)
+
+    def _run_next_command(self):
+        next_command = self.scheduler.pop()
+        if next_command is None:
+            return
+
+        connection, command, replies = next_command
+
+        if isinstance(command, RejectedMessage):
+            self._send_command_response(connection, command.response)
+
+        elif 'admin' in command:
+            response = self._admin_command(command)
+            self._send_command_response(connection, response)
+
+        elif 'subscribe' in command:
+            response = self._subscribe(connection, command)
+            self._send_command_response(connection, response)
+
+        elif 'if-newer-than' in command and not is_poll(command):
+            # Rather than silently dropping the rest of the command
+            self._send_command_response(connection, {
+                'status': 'error',
+                'type': 'InvalidCommand',
+                'description': 'if-newer-than must be sent on its own',
+            })
+
+        elif not is_poll(command):
+            with tracing.span('command'), self._command_seconds.time():
+                response = self.board.command(command)
+            if response is not None:
+                self._send_command_response(connection, response)
+
+        self._send_board_status(
+            connection,
+            count=replies,
+            if_newer_than=command.get('if-newer-than'),
+        )
+
+    def _run_tick(self):
+        if self.ticker is None:
+            return
+
+        now = time.monotonic()
+        if not self.board.wants_tick():
+            self.ticker.stop()
+            return
+        if not self.ticker.running:
+            # Start afresh, rather than counting the ticks skipped while the
+            # board was idle as missed
+            self.ticker.start(now)
+        if not self.ticker.due(now):
+            return
+
+        self.ticker.advance(now)
+        with tracing.span('tick'), self._tick_seconds.time():
+            self.board.tick(now)
+        # Ticks are when a board's status changes with no client asking, so
+        # publish it if it has
+        self._current_status()
+
+    def _close_dead_sockets(self, dead_sockets):
+        for sock in dead_sockets:
+            try:
+                connection = self.connections.pop(sock)
+            except KeyError:
+                pass
+            else:
+                self.scheduler.remove(connection)
+                self.subscriptions.pop(connection, None)
+                self._record(RecordKind.DISCONNECT, connection)
+                del self._connection_numbers[connection]
+            sock.close()
+        self._connections_gauge.set(len(self.connections))
+
+    def cleanup(self):
+        """
+        Clean up the UNIX socket if it's been left around.
+
+        Called from the parent process.
+        """
+
+        self._delete_socket_path()
+        self.board.stop()
@@ -0,0 +1,213 @@
+"""Scheduling of the work done by a `BoardRunner`."""
+
+import collections
+
+from .devices_base import Priority
+
+
+class _Entry:
+    __slots__ = ('command', 'priority', 'sequence', 'replies')
+
+    def __init__(self, command, priority, sequence):
+        self.command = command
+        self.priority = priority
+        self.sequence = sequence
+        # Each message a client sends gets a reply, including those which
+        # were coalesced into this one.
+        self.replies = 1
+
+
+class RejectedMessage(dict):
+    """
+    Stands in for a message which couldn't be read, in a client's queue.
+
+    The runner answers it in turn with the error `response`, so that a
+    client which matches up replies with its messages by their order still
+    gets the right ones.
+    """
+
+    def __init__(self, response):
+        super().__init__()
+        self.response = response
+
+
+def _is_runner_command(command):
+    """Whether `command` is for the runner itself rather than the board."""
+    return (
+        isinstance(command, RejectedMessage) or
+        'admin' in command or
+        'subscribe' in command
+    )
+
+
+def is_poll(command):
+    """Whether `command` just asks for the status, conditionally or not."""
+    return command == {} or command.keys() == {'if-newer-than'}
+
+
+class CommandScheduler:
+    """
+    Chooses which queued client command to run next.
+
+    Each connection has its own queue, which is run strictly in order so that
+    the client gets its replies in the order it sent its commands. Between
+    connections, the command at the head of each queue is ranked by the
+    board's `Board.command_priority` (and then by arrival), so that a safety
+    command from one client doesn't wait behind another client's slow read.
+
+    When a client sends a command which `Board.coalesce_commands` says
+    supersedes the last one it still has queued (for instance, a newer motor
+    speed), the two are merged rather than both being run.
+    """
+
+    def __init__(self, board, metrics):
+        self.board = board
+        self._queues = collections.OrderedDict()
+        self._max_depths = {}
+        self._sequence = 0
+
+        self._queue_depth = metrics.histogram(
+            'robotd_command_queue_depth',
+            "Depth of a client's command queue after each command arrives",
+            buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+        )
+        self._coalesced = metrics.counter(
+            'robotd_coalesced_commands_total',
+            'Number of commands merged into an earlier queued command',
+        )
+
+    def __bool__(self):
+        return any(self._queues.values())
+
+    def add(self, connection, command):
+        """
+        Queue a command from `connection`.
+
+        Returns the depth of the connection's queue after adding it.
+        """
+        queue = self._queues.setdefault(connection, collections.deque())
+
+        if queue:
+            tail = queue[-1]
+            merged = self._coalesce(tail.command, command)
+            if merged is not None:
+                tail.command = merged
+                tail.priority = self._priority(merged)
+                tail.replies += 1
+                self._coalesced.inc()
+                self._queue_depth.observe(len(queue))
+                return len(queue)
+
+        self._sequence += 1
+        queue.append(_Entry(command, self._priority(command), self._sequence))
+
+        depth = len(queue)
+        if depth > self._max_depths.get(connection, 0):
+            self._max_depths[connection] = depth
+        self._queue_depth.observe(depth)
+        return depth
+
+    def _priority(self, command):
+        if _is_runner_command(command) or is_poll(command):
+            return Priority.NORMAL
+        return self.board.command_priority(command)
+
+    def _coalesce(self, older, newer):
+        if _is_runner_command(older) or _is_runner_command(newer):
+            return None
+        if is_poll(older) or is_poll(newer):
+            # Identical polls get identical replies, but a poll for a
+            # different version, or one which isn't a poll, might not.
+            return newer if older == newer else None
+        return self.board.coalesce_commands(older, newer)
+
+    def pop(self):
+        """
+        Take the next command to run.
+
+        Returns a ``(connection, command, replies)`` tuple, where `replies` is
+        the number of client messages it stands for, or ``None`` if nothing
+        is queued.
+        """
+        best = None
+        for connection, queue in self._queues.items():
+            if not queue:
+                continue
+            head = queue[0]
+            if best is None or (head.priority, head.sequence) < best[1]:
+                best = (connection, (head.priority, head.sequence))
+
+        if best is None:
+            return None
+
+        connection = best[0]
+        entry = self._queues[connection].popleft()
+        return connection, entry.command, entry.replies
+
+    def remove(self, connection):
+        """Forget a connection, along with anything it still has queued."""
+        self._queues.pop(connection, None)
+        self._max_depths.pop(connection, None)
+
+    def depth(self, connection):
+        """Number of commands `connection` has queued."""
+        return len(self._queues.get(connection, ()))
+
+    def max_depth(self, connection):
+        """Deepest `connection`'s queue has been."""
+        return self._max_depths.get(connection, 0)
+
+
+class TickScheduler:
+    """
+    Keeps time for a board's periodic `Board.tick`.
+
+    Deadlines are kept on the monotonic clock, each exactly one period after
+    the last, so that the rate doesn't drift however late each tick runs. If
+    the runner falls a whole period or more behind, the missed ticks are
+    counted and skipped rather than run in a burst. While stopped, there are
+    no deadlines at all.
+    """
+
+    def __init__(self, rate, metrics):
+        self.period = 1 / rate
+        self.next_deadline = None
+
+        self._lateness = metrics.histogram(
+            'robotd_tick_lateness_seconds',
+            'How long after its deadline each tick ran',
+        )
+        self._missed = metrics.counter(
+            'robotd_tick_missed_deadlines_total',
+            'Number of ticks skipped because the runner was too busy',
+        )
+
+    def start(self, now):
+        """Schedule the first tick for one period after `now`."""
+        self.next_deadline = now + self.period
+
+    def stop(self):
+        """Stop ticking, until `start` is called again."""
+        self.next_deadline = None
+
+    @property
+    def running(self):
+        return self.next_deadline is not None
+
+    def timeout(self, now):
+        """Seconds until the next tick is due, for passing to `select`."""
+        return max(0, self.next_deadline - now)
+
+    def due(self, now):
+        return now >= self.next_deadline
+
+    def advance(self, now):
+        """Record that the due tick is being run at `now`."""
+        lateness = now - self.next_deadline
+        self._lateness.observe(lateness)
+
+        missed = int(lateness // self.period)
+        if missed:
+            self._missed.inc(missed)
+
+        self.next_deadline += (missed + 1) * self.period
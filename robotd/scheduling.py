@@ -0,0 +1,103 @@
+"""
+CPU placement and priority of runner processes.
+
+By default every runner, including the camera's busy vision pipeline, shares
+every core under the normal scheduler, so a burst of marker detection can
+delay a motor command. Each board type can be given:
+
+* a set of CPUs to run on, with ``sched_setaffinity``, so that latency
+  sensitive boards can be kept away from the cores doing vision,
+* a nice level, which only matters among processes in the normal policy,
+* a ``SCHED_FIFO`` priority, which lets the runner preempt any normal
+  process as soon as it has something to do. The runner spends most of its
+  time blocked in `select`, and the kernel's real-time throttling keeps a
+  runaway one from locking up the machine entirely.
+
+Scheduling settings are per thread on Linux, so they're applied at the top
+of `BoardRunner.run`, before the board starts any threads of its own, and
+those threads inherit them.
+"""
+
+import collections
+import logging
+import os
+
+LOGGER = logging.getLogger(__name__)
+
+
+class Scheduling(collections.namedtuple(
+    'Scheduling',
+    ('cpus', 'nice', 'realtime_priority'),
+)):
+    """How to schedule one board type's runners; `None` leaves a setting be."""
+
+    __slots__ = ()
+
+    def __new__(cls, cpus=None, nice=None, realtime_priority=None):
+        return super().__new__(cls, cpus, nice, realtime_priority)
+
+    def apply(self):
+        """
+        Apply these settings to the calling thread.
+
+        Settings which can't be applied, usually for want of privileges, are
+        logged and skipped rather than stopping the runner.
+        """
+        if self.cpus is not None:
+            self._try('CPU affinity', os.sched_setaffinity, 0, self.cpus)
+        if self.nice is not None:
+            self._try('nice level', os.setpriority, os.PRIO_PROCESS, 0, self.nice)
+        if self.realtime_priority is not None:
+            self._try(
+                'SCHED_FIFO priority',
+                os.sched_setscheduler,
+                0,
+                os.SCHED_FIFO,
+                os.sched_param(self.realtime_priority),
+            )
+
+    @staticmethod
+    def _try(description, function, *args):
+        try:
+            function(*args)
+        except OSError as e:
+            LOGGER.warning('Could not set %s: %s', description, e)
+
+
+def parse_cpus(text):
+    """
+    Parse a list of CPUs such as ``0,2-3``, as in ``taskset --cpu-list``.
+
+    Raises `ValueError` if it's malformed.
+    """
+    cpus = set()
+    for part in text.split(','):
+        first, _, last = part.partition('-')
+        first = int(first)
+        last = int(last) if last else first
+        if first < 0 or last < first:
+            raise ValueError('invalid CPU range {!r}'.format(part))
+        cpus.update(range(first, last + 1))
+    return cpus
+
+
+def scheduling_by_board_type(cpus=(), nice=(), realtime_priority=()):
+    """
+    Combine lists of ``(board type ID, value)`` for each setting.
+
+    Returns a dict mapping board type IDs to their `Scheduling`, as taken by
+    `BoardRunner`.
+    """
+    settings = collections.defaultdict(dict)
+    for name, values in (
+        ('cpus', cpus),
+        ('nice', nice),
+        ('realtime_priority', realtime_priority),
+    ):
+        for board_type_id, value in values:
+            settings[board_type_id][name] = value
+
+    return {
+        board_type_id: Scheduling(**kwargs)
+        for board_type_id, kwargs in settings.items()
+    }
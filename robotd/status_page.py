@@ -0,0 +1,208 @@
+"""
+Board statuses published in shared memory.
+
+Each `BoardRunner` keeps its board's latest status in a memory-mapped file
+alongside its socket (``<socket>.status``), so that any number of local
+readers, such as a dashboard, can watch every board without connecting to
+any of them::
+
+    for name, page in open_status_pages('/var/robotd').items():
+        version, status = page.read()
+
+The page is a header followed by the status as JSON. Writes are guarded by
+a sequence lock: the writer makes the sequence number odd before it changes
+anything and even again afterwards, so a reader which sees the same even
+number before and after copying the status knows that it has a consistent
+copy. Python cannot issue memory barriers, so a CRC of the status is also
+checked, which catches a torn read on CPUs which reorder stores.
+
+A runner which restarts replaces its page with a new file, rather than
+truncating the old one under its readers, and readers notice the new file
+and map it instead.
+"""
+
+import json
+import mmap
+import os
+import struct
+import time
+import zlib
+from pathlib import Path
+
+MAGIC = b'RDSTATUS'
+
+# Magic, sequence number, status version, status length, status CRC32
+_HEADER = struct.Struct('<8sQQII')
+_SEQUENCE = struct.Struct('<Q')
+_SEQUENCE_OFFSET = 8
+_CONTENTS = struct.Struct('<QII')
+_CONTENTS_OFFSET = _SEQUENCE_OFFSET + _SEQUENCE.size
+
+DEFAULT_SIZE = 16384
+
+
+class StatusPageBusy(RuntimeError):
+    """A consistent status could not be read, as it kept changing."""
+
+    pass
+
+
+class StatusPage:
+    """The writing end of a status page, owned by a `BoardRunner`."""
+
+    def __init__(self, path, size=DEFAULT_SIZE):
+        self.path = Path(path)
+        self._sequence = 0
+
+        # Readers only ever see a whole page, in a file of its own
+        new_path = self.path.with_name(self.path.name + '.new')
+        fd = os.open(str(new_path), os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.ftruncate(fd, size)
+            self._map = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+
+        _HEADER.pack_into(self._map, 0, MAGIC, 0, 0, 0, 0)
+        os.replace(str(new_path), str(self.path))
+
+    def close(self):
+        self._map.close()
+
+    def publish(self, version, payload):
+        """Publish a status, already encoded as JSON, with its version."""
+        needed = _HEADER.size + len(payload)
+        if needed > len(self._map):
+            # Readers notice the larger length, and map the file again
+            self._map.resize(max(needed, 2 * len(self._map)))
+
+        self._sequence += 1
+        _SEQUENCE.pack_into(self._map, _SEQUENCE_OFFSET, self._sequence)
+
+        self._map[_HEADER.size:needed] = payload
+        _CONTENTS.pack_into(
+            self._map,
+            _CONTENTS_OFFSET,
+            version,
+            len(payload),
+            zlib.crc32(payload),
+        )
+
+        self._sequence += 1
+        _SEQUENCE.pack_into(self._map, _SEQUENCE_OFFSET, self._sequence)
+
+
+class StatusPageReader:
+    """
+    The reading end of a status page.
+
+    Reading is a copy out of shared memory: the only system calls are to
+    check every `REPLACED_CHECK_INTERVAL` seconds whether a restarted runner
+    has replaced the page, and to map it again if so or if it has grown.
+    """
+
+    REPLACED_CHECK_INTERVAL = 0.1
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._map = None
+        self._file_id = None
+        self._next_replaced_check = None
+        self._remap()
+
+        if self._map[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError('{} is not a status page'.format(path))
+
+    def _remap(self):
+        if self._map is not None:
+            self._map.close()
+
+        with open(str(self.path), 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            stat = os.fstat(f.fileno())
+        self._file_id = (stat.st_dev, stat.st_ino)
+        self._next_replaced_check = time.monotonic() + self.REPLACED_CHECK_INTERVAL
+
+    def _check_replaced(self):
+        now = time.monotonic()
+        if now < self._next_replaced_check:
+            return
+        self._next_replaced_check = now + self.REPLACED_CHECK_INTERVAL
+
+        try:
+            stat = os.stat(str(self.path))
+        except FileNotFoundError:
+            # The runner has stopped; keep its last status until another
+            # one starts
+            return
+        if (stat.st_dev, stat.st_ino) != self._file_id:
+            self._remap()
+
+    def close(self):
+        self._map.close()
+
+    def version(self):
+        """The version of the latest status, without reading it."""
+        self._check_replaced()
+        return _CONTENTS.unpack_from(self._map, _CONTENTS_OFFSET)[0]
+
+    def read(self, if_newer_than=None, attempts=1000):
+        """
+        Read the latest status.
+
+        Returns a ``(version, status)`` tuple, in which `status` is ``None``
+        if the runner hasn't published anything yet. If `if_newer_than` is
+        given and the version is still the same, returns ``None`` instead,
+        without decoding anything.
+        """
+        self._check_replaced()
+        for _ in range(attempts):
+            (sequence,) = _SEQUENCE.unpack_from(self._map, _SEQUENCE_OFFSET)
+            if sequence % 2:
+                # Mid-write
+                time.sleep(0)
+                continue
+
+            version, length, crc = _CONTENTS.unpack_from(
+                self._map,
+                _CONTENTS_OFFSET,
+            )
+
+            if if_newer_than is not None and version == if_newer_than:
+                return None
+
+            if _HEADER.size + length > len(self._map):
+                self._remap()
+                continue
+
+            payload = self._map[_HEADER.size:_HEADER.size + length]
+
+            (after,) = _SEQUENCE.unpack_from(self._map, _SEQUENCE_OFFSET)
+            if after != sequence or zlib.crc32(payload) != crc:
+                continue
+
+            if not length:
+                return version, None
+            return version, json.loads(payload.decode('utf-8'))
+
+        raise StatusPageBusy('{} kept changing while being read'.format(
+            self.path,
+        ))
+
+
+def open_status_pages(root_dir):
+    """
+    Open the status pages of all the boards under `root_dir`.
+
+    Returns a dict of `StatusPageReader`s, keyed by ``<type>/<id>``.
+    """
+    pages = {}
+    for path in sorted(Path(root_dir).glob('*/*.status')):
+        name = '{}/{}'.format(path.parent.name, path.name[:-len('.status')])
+        try:
+            pages[name] = StatusPageReader(path)
+        except (OSError, ValueError):
+            # Probably a runner which is just starting or stopping
+            continue
+    return pages
@@ -0,0 +1,55 @@
+"""
+Talking to systemd, without depending on its libraries or tools.
+
+The master tells systemd when it's ready by sending a datagram to the socket
+named in ``$NOTIFY_SOCKET``, as ``sd_notify(3)`` does, rather than running
+``systemd-notify``: that's a process to start at the very moment we're in a
+hurry, and systemd may not attribute its message to robotd's service anyway.
+"""
+
+import os
+import socket
+
+
+def notify(*fields):
+    """
+    Send state `fields` (such as ``'READY=1'``) to systemd.
+
+    Returns whether there was anything to send them to; outside systemd, or
+    in a service which isn't ``Type=notify``, there isn't.
+    """
+    address = os.environ.get('NOTIFY_SOCKET')
+    if not address:
+        return False
+
+    if address.startswith('@'):
+        # An address in the abstract namespace
+        address = '\0' + address[1:]
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+        sock.connect(address)
+        sock.sendall('\n'.join(fields).encode('utf-8'))
+    return True
+
+
+def process_age():
+    """
+    Seconds since this process was started by the kernel.
+
+    This includes the interpreter's own start-up and imports, which happen
+    before any of our code runs. Returns `None` where ``/proc`` isn't
+    available.
+    """
+    try:
+        with open('/proc/self/stat') as f:
+            stat = f.read()
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+    except OSError:
+        return None
+
+    # The command name in parentheses may itself contain spaces, so the
+    # fields are counted from the end of it; the start time is field 22.
+    fields = stat.rsplit(')', 1)[1].split()
+    start_ticks = int(fields[19])
+    return uptime - start_ticks / os.sysconf('SC_CLK_TCK')
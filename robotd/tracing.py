@@ -0,0 +1,143 @@
+"""
+Always-on tracing of the hot path.
+
+Every process keeps its most recent span events in a fixed-size ring buffer,
+which can be dumped in the Chrome trace-event format (open it in
+``chrome://tracing`` or https://ui.perfetto.dev) to see where the time went
+when a robot stutters.
+
+Recording a span costs two clock reads and a tuple store, with a budget of
+`OVERHEAD_BUDGET` per span; ``python -m benchmarks.tracing`` checks it.
+"""
+
+import json
+import os
+import threading
+import time
+
+# Number of events kept in the ring buffer
+BUFFER_SIZE = 8192
+
+# Upper bound on the cost of recording one span, in seconds
+OVERHEAD_BUDGET = 5e-6
+
+
+class _Span:
+    __slots__ = ('tracer', 'name', 'args', 'start')
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.tracer.record(
+            self.name,
+            self.start,
+            time.perf_counter() - self.start,
+            self.args,
+        )
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """A fixed-size ring buffer of timed span events."""
+
+    def __init__(self, size=BUFFER_SIZE):
+        self.size = size
+        self.enabled = True
+        self.clear()
+
+    def clear(self):
+        """Forget all recorded events."""
+        self._events = [None] * self.size
+        self._count = 0
+
+    def record(self, name, start, duration, args=None):
+        """Record an event which started at the `time.perf_counter` `start`."""
+        self._events[self._count % self.size] = (
+            name,
+            start,
+            duration,
+            threading.get_ident(),
+            args,
+        )
+        self._count += 1
+
+    def span(self, name, args=None):
+        """Context manager which records its block as an event."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, args)
+
+    def events(self):
+        """All events in the buffer, oldest first."""
+        if self._count <= self.size:
+            return self._events[:self._count]
+
+        split = self._count % self.size
+        return self._events[split:] + self._events[:split]
+
+    def chrome_trace(self, process_name=None):
+        """The buffer's contents as a Chrome trace-event JSON object."""
+        pid = os.getpid()
+        trace_events = []
+
+        if process_name is not None:
+            trace_events.append({
+                'name': 'process_name',
+                'ph': 'M',
+                'pid': pid,
+                'args': {'name': process_name},
+            })
+
+        for name, start, duration, thread_id, args in self.events():
+            event = {
+                'name': name,
+                'ph': 'X',
+                'ts': start * 1e6,
+                'dur': duration * 1e6,
+                'pid': pid,
+                'tid': thread_id,
+            }
+            if args is not None:
+                event['args'] = args
+            trace_events.append(event)
+
+        return {
+            'traceEvents': trace_events,
+            'displayTimeUnit': 'ms',
+            'otherData': {
+                'recorded': self._count,
+                'dropped': max(0, self._count - self.size),
+            },
+        }
+
+    def dump(self, path, process_name=None):
+        """Write the buffer to `path` as Chrome trace-event JSON."""
+        trace = self.chrome_trace(process_name)
+        with open(str(path), 'w') as f:
+            json.dump(trace, f)
+        return len(trace['traceEvents'])
+
+
+# The tracer for this process
+TRACER = Tracer()
+
+span = TRACER.span
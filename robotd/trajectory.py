@@ -0,0 +1,89 @@
+"""Timed setpoint profiles, played out by a board between commands."""
+
+import bisect
+import numbers
+
+
+class InvalidTrajectory(ValueError):
+    """A trajectory given by a client could not be understood."""
+
+    pass
+
+
+class Trajectory:
+    """
+    A piecewise-linear profile of a motor's speed over time.
+
+    `points` is a list of ``(seconds, speed)`` pairs, with times relative to
+    the start of the trajectory and in increasing order. The speed is
+    interpolated linearly between points and held at the last point's speed
+    once the trajectory is over.
+    """
+
+    def __init__(self, points):
+        if not points:
+            raise InvalidTrajectory('A trajectory needs at least one point')
+
+        self.times = []
+        self.speeds = []
+        for point in points:
+            try:
+                seconds, speed = point
+            except (TypeError, ValueError):
+                raise InvalidTrajectory(
+                    'Trajectory points must be [seconds, speed] pairs, '
+                    'not {!r}'.format(point),
+                ) from None
+
+            if not isinstance(seconds, numbers.Real) or seconds < 0:
+                raise InvalidTrajectory('Invalid time: {!r}'.format(seconds))
+            if self.times and seconds < self.times[-1]:
+                raise InvalidTrajectory('Trajectory times must not go backwards')
+            if not isinstance(speed, numbers.Real) or not -1 <= speed <= 1:
+                raise InvalidTrajectory('Invalid speed: {!r}'.format(speed))
+
+            self.times.append(seconds)
+            self.speeds.append(speed)
+
+    @classmethod
+    def from_spec(cls, spec, initial_speed=0):
+        """
+        Build a trajectory from a client's description of it.
+
+        This is either a list of ``[seconds, speed]`` points, or a ramp of
+        the form ``{"to": <speed>, "duration": <seconds>}``, which starts
+        from ``"from"`` if given and `initial_speed` otherwise.
+        """
+        if isinstance(spec, list):
+            return cls(spec)
+
+        if isinstance(spec, dict):
+            try:
+                return cls([
+                    (0, spec.get('from', initial_speed)),
+                    (spec['duration'], spec['to']),
+                ])
+            except KeyError as e:
+                raise InvalidTrajectory(
+                    'Ramp is missing {!r}'.format(e.args[0]),
+                ) from None
+
+        raise InvalidTrajectory('Unknown trajectory: {!r}'.format(spec))
+
+    @property
+    def duration(self):
+        return self.times[-1]
+
+    def speed_at(self, elapsed):
+        """The speed `elapsed` seconds after the trajectory started."""
+        index = bisect.bisect_right(self.times, elapsed)
+        if index == 0:
+            return self.speeds[0]
+        if index == len(self.times):
+            return self.speeds[-1]
+
+        start, end = self.times[index - 1], self.times[index]
+        fraction = (elapsed - start) / (end - start)
+        return self.speeds[index - 1] + fraction * (
+            self.speeds[index] - self.speeds[index - 1]
+        )
@@ -4,9 +4,19 @@ import atexit
 
 from .native import _usb
 
-context = _usb.ffi.new('struct libusb_context**')
-_usb.lib.libusb_init(context)
-atexit.register(_usb.lib.libusb_exit, context[0])
+_context = None
+
+
+def _get_context():
+    """Get the libusb context, initialising libusb on first use."""
+    global _context
+
+    if _context is None:
+        _context = _usb.ffi.new('struct libusb_context**')
+        _usb.lib.libusb_init(_context)
+        atexit.register(_usb.lib.libusb_exit, _context[0])
+
+    return _context[0]
 
 
 class Device:
@@ -103,7 +113,7 @@ def enumerate_devices():
     """Enumerate through all USB devices returning a list."""
 
     devs = _usb.ffi.new('struct libusb_device***')
-    num_devs = _usb.lib.libusb_get_device_list(context[0], devs)
+    num_devs = _usb.lib.libusb_get_device_list(_get_context(), devs)
 
     return [
         Device(devs, i)
@@ -9,7 +9,7 @@ setup(
     description="Daemon for vision code for Source Bots",
     author="SourceBots",
     author_email='',
-    packages=find_packages(),
+    packages=find_packages(exclude=['benchmarks', 'benchmarks.*']),
     setup_requires=[
         'cffi>=1.4.0',
     ],
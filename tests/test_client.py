@@ -0,0 +1,139 @@
+import asyncio
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from robotd.client import Client, SyncClient, discover
+from robotd.devices_base import Board
+from robotd.runner import BoardRunner
+
+
+class EchoBoard(Board):
+    board_type_id = 'echo'
+    enabled = False
+
+    @classmethod
+    def name(cls, node):
+        return node['name']
+
+    def start(self):
+        self.last = None
+
+    def command(self, cmd):
+        if 'shout' in cmd:
+            self.broadcast({'shout': cmd['shout']})
+        self.last = cmd
+        return cmd.get('echo')
+
+    def status(self):
+        return {'last': self.last}
+
+
+class ClientTests(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.root_dir = Path(temp_dir.name)
+
+        for name in ('a', 'b'):
+            runner = BoardRunner(EchoBoard({'name': name}), self.root_dir)
+            runner.start()
+            self.addCleanup(runner.join)
+            self.addCleanup(runner.terminate)
+            self.wait_for_path(runner.socket_path)
+
+        self.client = SyncClient(self.root_dir, timeout=5)
+        self.addCleanup(self.client.close)
+
+    def wait_for_path(self, path):
+        deadline = time.monotonic() + 5
+        while not path.exists():
+            if time.monotonic() > deadline:
+                self.fail('{} was never created'.format(path))
+            time.sleep(0.01)
+
+    def test_discover(self):
+        boards = discover(self.root_dir)
+        self.assertEqual(['echo/a', 'echo/b'], sorted(boards.keys()))
+        self.assertEqual(self.root_dir / 'echo' / 'a', boards['echo/a'])
+
+    def test_request(self):
+        reply = self.client.request('echo/a', {'echo': 'hi'})
+        self.assertEqual('hi', reply.response)
+        self.assertEqual({'echo': 'hi'}, reply.status['last'])
+
+    def test_request_many(self):
+        replies = self.client.request_many({
+            'echo/a': {'echo': 1},
+            'echo/b': {'echo': 2},
+        })
+        self.assertEqual(1, replies['echo/a'].response)
+        self.assertEqual(2, replies['echo/b'].response)
+
+    def test_poll_uses_cached_status(self):
+        self.client.request('echo/a', {'echo': 'hi'})
+        status = self.client.poll('echo/a')
+        self.assertEqual({'echo': 'hi'}, status['last'])
+        self.assertNotIn('not-modified', status)
+
+    def test_broadcasts_are_separate_from_replies(self):
+        reply = self.client.request('echo/a', {'shout': 'hey', 'echo': 'hi'})
+        self.assertEqual('hi', reply.response)
+
+        broadcast = self.client.next_broadcast('echo/a', timeout=5)
+        self.assertEqual('hey', broadcast['shout'])
+        self.assertTrue(broadcast['broadcast'])
+
+    def test_timed_out_wait_does_not_take_next_broadcast(self):
+        with self.assertRaises(asyncio.TimeoutError):
+            self.client.next_broadcast('echo/a', timeout=0.05)
+
+        self.client.request('echo/a', {'shout': 'hey'})
+        broadcast = self.client.next_broadcast('echo/a', timeout=5)
+        self.assertEqual('hey', broadcast['shout'])
+
+    def test_broadcasts_forwarded_once_from_pool(self):
+        client = SyncClient(self.root_dir, pool_size=3, timeout=5)
+        self.addCleanup(client.close)
+
+        for _ in range(3):
+            client.request('echo/a', {})
+        client.request('echo/a', {'shout': 1})
+        client.request('echo/a', {'shout': 2})
+
+        self.assertEqual(1, client.next_broadcast('echo/a', timeout=5)['shout'])
+        self.assertEqual(2, client.next_broadcast('echo/a', timeout=5)['shout'])
+
+    def test_subscription(self):
+        response = self.client.subscribe('echo/a', ['last'], max_rate=100)
+        self.assertEqual({'status': 'ok', 'fields': ['last'], 'max-rate': 100}, response)
+
+        # The current value is pushed first, and then each change
+        push = self.client.next_broadcast('echo/a', timeout=5)
+        self.assertEqual({'last': None}, push['subscription'])
+
+        self.client.request('echo/a', {'echo': 1})
+        push = self.client.next_broadcast('echo/a', timeout=5)
+        self.assertEqual({'last': {'echo': 1}}, push['subscription'])
+        self.assertIn('version', push)
+
+    def test_pipelined_requests(self):
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+
+        async def run():
+            client = Client(self.root_dir, loop=loop)
+            connection = await client.connection('echo/a')
+            replies = await asyncio.gather(*[
+                connection.request({'echo': n})
+                for n in range(50)
+            ])
+            await client.close()
+            return replies
+
+        replies = loop.run_until_complete(run())
+
+        # Every reply is matched up with its own command, in order
+        self.assertEqual(list(range(50)), [reply.response for reply in replies])
+        self.assertEqual({'echo': 49}, replies[-1].status['last'])
@@ -0,0 +1,149 @@
+import socket
+import unittest
+
+from robotd.runner import Connection, SeqpacketConnection, SlowConsumerError
+from robotd.scheduler import RejectedMessage
+
+
+class ConnectionTests(unittest.TestCase):
+    def setUp(self):
+        self.server_socket, self.client_socket = socket.socketpair(
+            socket.AF_UNIX,
+            socket.SOCK_STREAM,
+        )
+        self.addCleanup(self.server_socket.close)
+        self.addCleanup(self.client_socket.close)
+
+        # Keep the kernel's buffers small so that they fill up quickly
+        for sock in (self.server_socket, self.client_socket):
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4096)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+
+    def connection(self, **kwargs):
+        return Connection(self.server_socket, **kwargs)
+
+    def fill_socket(self, connection):
+        line = b'x' * 39 + b'\n'
+        while not connection.wants_write:
+            connection.send_line(line)
+
+    def read_all(self):
+        self.client_socket.setblocking(False)
+        data = b''
+        while True:
+            try:
+                chunk = self.client_socket.recv(65536)
+            except BlockingIOError:
+                return data
+            data += chunk
+
+    def test_round_trip(self):
+        connection = self.connection()
+        connection.send({'hello': 'world'})
+
+        client = Connection(self.client_socket)
+        self.assertEqual({'hello': 'world'}, client.receive())
+
+    def test_send_does_not_block(self):
+        connection = self.connection(max_queued_bytes=10 ** 6)
+        self.fill_socket(connection)
+
+        connection.send({'more': True})
+
+        self.assertTrue(connection.wants_write)
+        self.assertGreater(connection.queued_bytes, 0)
+
+    def test_flush_after_reading(self):
+        connection = self.connection(max_queued_bytes=10 ** 6)
+        self.fill_socket(connection)
+        connection.send_line(b'last\n')
+
+        data = b''
+        while connection.wants_write:
+            data += self.read_all()
+            connection.flush()
+        data += self.read_all()
+
+        self.assertTrue(data.endswith(b'\nlast\n'))
+        self.assertEqual(0, connection.queued_bytes)
+
+    def test_drop_oldest_drops_broadcasts(self):
+        connection = self.connection(max_queued_bytes=100)
+        self.fill_socket(connection)
+
+        connection.send_line(b'a' * 59 + b'\n', droppable=True)
+        connection.send_line(b'b' * 59 + b'\n', droppable=True)
+
+        self.assertEqual(1, connection.dropped_messages)
+        self.assertLessEqual(connection.queued_bytes, 100)
+
+    def test_drop_oldest_never_drops_replies(self):
+        connection = self.connection(max_queued_bytes=100)
+        self.fill_socket(connection)
+
+        with self.assertRaises(SlowConsumerError):
+            for _ in range(10):
+                connection.send_line(b'r' * 59 + b'\n')
+
+    def test_disconnect_policy(self):
+        connection = self.connection(
+            max_queued_bytes=100,
+            slow_consumer_policy=Connection.DISCONNECT,
+        )
+        self.fill_socket(connection)
+
+        with self.assertRaises(SlowConsumerError):
+            connection.send_line(b'a' * 200 + b'\n', droppable=True)
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            self.connection(slow_consumer_policy='ignore')
+
+
+class SeqpacketConnectionTests(unittest.TestCase):
+    def setUp(self):
+        self.server_socket, self.client_socket = socket.socketpair(
+            socket.AF_UNIX,
+            socket.SOCK_SEQPACKET,
+        )
+        self.addCleanup(self.server_socket.close)
+        self.addCleanup(self.client_socket.close)
+        self.connection = SeqpacketConnection(self.server_socket)
+
+    def test_one_message_per_datagram(self):
+        self.connection.send({'a': 1})
+        self.connection.send({'b': 2})
+
+        self.assertEqual(b'{"a": 1}\n', self.client_socket.recv(100))
+        self.assertEqual(b'{"b": 2}\n', self.client_socket.recv(100))
+
+    def test_receive_available(self):
+        self.client_socket.send(b'{"a": 1}')
+        self.client_socket.send(b'{"b": 2}\n')
+
+        self.assertEqual([{'a': 1}, {'b': 2}], self.connection.receive_available())
+
+    def test_rejects_oversized_messages(self):
+        self.client_socket.send(b' ' * (SeqpacketConnection.MAX_MESSAGE_SIZE + 1))
+        self.client_socket.send(b'{}')
+
+        with self.assertLogs('robotd.runner', 'WARNING'):
+            rejected, message = self.connection.receive_available()
+
+        # Kept in its place, to be answered with an error
+        self.assertIsInstance(rejected, RejectedMessage)
+        self.assertEqual('MessageTooLong', rejected.response['type'])
+        self.assertEqual({}, message)
+
+    def test_receive_rejects_oversized_message(self):
+        self.client_socket.send(b' ' * (SeqpacketConnection.MAX_MESSAGE_SIZE + 1))
+
+        with self.assertLogs('robotd.runner', 'WARNING'):
+            self.assertIsInstance(self.connection.receive(), RejectedMessage)
+
+    def test_end_of_file(self):
+        self.client_socket.send(b'{}')
+        self.client_socket.shutdown(socket.SHUT_WR)
+
+        self.assertEqual([{}], self.connection.receive_available())
+        self.assertIsNone(self.connection.receive_available())
@@ -0,0 +1,29 @@
+import subprocess
+import sys
+import unittest
+
+from robotd.devices_base import LazyModule
+
+
+class LazyModuleTests(unittest.TestCase):
+    def test_attribute_access(self):
+        json = LazyModule('json')
+        self.assertEqual('[]', json.dumps([]))
+
+    def test_missing_module(self):
+        module = LazyModule('robotd.no_such_module')
+        with self.assertRaises(ImportError):
+            module.anything
+
+    def test_master_does_not_import_backends(self):
+        backends = ('serial', 'robotd.usb', 'sb_vision')
+        output = subprocess.check_output([
+            sys.executable,
+            '-c',
+            'import sys, robotd.master; '
+            'print(",".join(x for x in {!r} if x in sys.modules))'.format(
+                backends,
+            ),
+        ], universal_newlines=True)
+
+        self.assertEqual('', output.strip())
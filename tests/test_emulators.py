@@ -0,0 +1,192 @@
+import time
+import unittest
+
+from robotd.devices import (
+    CommandError,
+    CommandTimeout,
+    MotorBoard,
+    ServoAssembly,
+)
+from robotd.emulators import MotorBoardEmulator, ServoAssemblyEmulator
+
+
+def wait_for(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError('Timed out waiting for the emulator')
+        time.sleep(0.005)
+
+
+class MotorBoardEmulatorTests(unittest.TestCase):
+    def setUp(self):
+        self.emulator = MotorBoardEmulator()
+        self.emulator.start()
+        self.addCleanup(self.emulator.stop)
+
+        self.board = MotorBoard({'DEVNAME': self.emulator.device})
+        self.board.start()
+        self.addCleanup(self.board.connection.close)
+
+    def test_start_resets_and_brakes(self):
+        wait_for(lambda: self.emulator.speeds == {'m0': 'brake', 'm1': 'brake'})
+        self.assertEqual(1, self.emulator.resets)
+
+    def test_speeds(self):
+        self.board.command({'m0': 0.5, 'm1': -1})
+
+        wait_for(lambda: self.emulator.speeds == {'m0': 0.5, 'm1': -1})
+
+    def test_trajectory(self):
+        self.board.command({'trajectory': {'m0': {'to': 1, 'duration': 1}}})
+        start = time.monotonic()
+        wait_for(lambda: self.emulator.speeds['m0'] == 0)
+
+        self.board.tick(start + 0.5)
+        wait_for(lambda: self.emulator.speeds['m0'] == 0.5)
+
+        self.board.tick(start + 2)
+        wait_for(lambda: self.emulator.speeds['m0'] == 1)
+        self.assertEqual(1, self.board.status()['m0'])
+        self.assertEqual('brake', self.emulator.speeds['m1'])
+
+    def test_only_ticks_during_trajectory(self):
+        self.assertFalse(self.board.wants_tick())
+
+        self.board.command({'trajectory': {'m0': {'to': 1, 'duration': 1}}})
+        self.assertTrue(self.board.wants_tick())
+
+        self.board.tick(time.monotonic() + 2)
+        self.assertFalse(self.board.wants_tick())
+
+    def test_speed_preempts_trajectory(self):
+        start = time.monotonic()
+        self.board.command({'trajectory': {'m0': [[0, 0.1], [1, 1]]}})
+        self.board.command({'m0': -0.2})
+
+        self.board.tick(start + 2)
+        self.assertEqual(-0.2, self.board.status()['m0'])
+        wait_for(lambda: self.emulator.speeds['m0'] == -0.2)
+
+    def test_cancel_trajectory(self):
+        start = time.monotonic()
+        self.board.command({'trajectory': {'m0': [[0, 0.3], [1, 1]]}})
+        self.board.command({'trajectory': None})
+
+        self.board.tick(start + 2)
+        self.assertEqual(0.3, self.board.status()['m0'])
+
+    def test_invalid_trajectory(self):
+        response = self.board.command({'trajectory': {'m2': [[0, 1]]}})
+
+        self.assertEqual('error', response['status'])
+        self.assertEqual('InvalidTrajectory', response['type'])
+
+
+class ServoAssemblyEmulatorTests(unittest.TestCase):
+    def board(self, **kwargs):
+        emulator = ServoAssemblyEmulator(**kwargs)
+        emulator.start()
+        self.addCleanup(emulator.stop)
+
+        board = ServoAssembly({'DEVNAME': emulator.device, 'MINOR': '0'})
+        board.start()
+        self.addCleanup(board.connection.close)
+        return board, emulator
+
+    def test_start(self):
+        board, emulator = self.board()
+
+        self.assertEqual(ServoAssemblyEmulator.VERSION, board.fw_version)
+        self.assertEqual(0, emulator.servos[15])
+        self.assertEqual('Z', emulator.pins[13])
+
+    def test_commands(self):
+        board, emulator = self.board()
+        emulator.pin_values[4] = 'H'
+        emulator.ultrasound_mm = 250
+
+        board.command({
+            'servos': {'3': 1},
+            'read-pins': [4],
+            'read-ultrasound': [2, 3],
+        })
+
+        self.assertEqual(550, emulator.servos[3])
+        self.assertEqual({4: 'H'}, board.status()['pin-values'])
+        self.assertEqual(0.25, board.status()['ultrasound'])
+
+    def test_generic_command_error(self):
+        board, _ = self.board()
+
+        response = board.command({'command': ['Q']})
+
+        self.assertEqual('error', response['status'])
+        self.assertEqual(CommandError.__name__, response['type'])
+
+    def test_generic_command_with_odd_name(self):
+        board, _ = self.board()
+
+        for command in (['V'], 'X0', 'X1'):
+            response = board.command({'command': [command, 1]})
+            self.assertEqual('error', response['status'])
+
+        # Unknown commands share one round-trip time estimate
+        self.assertEqual(
+            {'V', 'S', 'W', None},
+            set(board._round_trip_times.keys()),
+        )
+
+    def test_retries_dropped_replies(self):
+        board, emulator = self.board(drop_rate=0.3, seed=4)
+
+        board.command({'servos': {'0': 0}})
+
+        self.assertGreater(emulator.replies_dropped, 0)
+        self.assertEqual(
+            emulator.replies_dropped,
+            board.metrics.counter('robotd_servo_command_retries_total', '').value,
+        )
+
+    def test_timeout_adapts_to_link(self):
+        board, _ = self.board()
+
+        self.assertLess(board.connection.timeout, ServoAssembly.INITIAL_TIMEOUT)
+
+    def test_gives_up_after_max_attempts(self):
+        board, emulator = self.board()
+        emulator.drop_rate = 1
+
+        response = board.command({'servos': {'0': 0}})
+
+        self.assertEqual('error', response['status'])
+        self.assertEqual(CommandTimeout.__name__, response['type'])
+
+        def count(name):
+            return board.metrics.counter(name, '').value
+
+        self.assertEqual(
+            ServoAssembly.MAX_ATTEMPTS,
+            count('robotd_servo_read_timeouts_total'),
+        )
+        self.assertEqual(1, count('robotd_servo_command_failures_total'))
+
+    def test_make_safe_gives_up_on_unanswering_board(self):
+        board, emulator = self.board()
+        emulator.drop_rate = 1
+
+        board.make_safe()
+
+        # Only the first servo is tried, rather than every output in turn
+        self.assertEqual(
+            ServoAssembly.MAX_ATTEMPTS,
+            board.metrics.counter('robotd_servo_read_timeouts_total', '').value,
+        )
+
+    def test_generic_command_timeout_is_reported(self):
+        board, emulator = self.board()
+        emulator.drop_rate = 1
+
+        response = board.command({'command': ['V']})
+
+        self.assertEqual('CommandTimeout', response['type'])
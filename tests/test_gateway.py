@@ -0,0 +1,139 @@
+import json
+import socket
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from robotd.devices_base import Board
+from robotd.gateway import Gateway
+from robotd.runner import BoardRunner
+
+
+class EchoBoard(Board):
+    board_type_id = 'echo'
+    enabled = False
+
+    @classmethod
+    def name(cls, node):
+        return node['name']
+
+    def start(self):
+        self.last = None
+
+    def command(self, cmd):
+        time.sleep(cmd.get('sleep', 0))
+        self.last = cmd
+        return cmd.get('echo')
+
+    def status(self):
+        return {'last': self.last}
+
+
+class GatewayTests(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.root_dir = Path(temp_dir.name)
+
+        for name in ('a', 'b'):
+            runner = BoardRunner(EchoBoard({'name': name}), self.root_dir)
+            runner.start()
+            self.addCleanup(runner.join)
+            self.addCleanup(runner.terminate)
+            self.wait_for_path(runner.socket_path)
+
+        self.gateway = Gateway(self.root_dir, self.root_dir / 'gateway')
+        self.gateway.start()
+        self.addCleanup(self.gateway.stop)
+
+        self.client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.client.connect(str(self.root_dir / 'gateway'))
+        self.addCleanup(self.client.close)
+        self.replies = self.client.makefile('rb')
+        self.addCleanup(self.replies.close)
+
+    def wait_for_path(self, path):
+        deadline = time.monotonic() + 5
+        while not path.exists():
+            if time.monotonic() > deadline:
+                self.fail('{} was never created'.format(path))
+            time.sleep(0.01)
+
+    def request(self, message):
+        self.client.sendall(json.dumps(message).encode('utf-8') + b'\n')
+        replies = json.loads(self.replies.readline().decode('utf-8'))
+
+        # Status versions depend on the time, so leave them out
+        for reply in replies if isinstance(replies, list) else [replies]:
+            if 'status' in reply:
+                self.assertIn('version', reply['status'])
+                del reply['status']['version']
+
+        return replies
+
+    def test_single_message(self):
+        self.assertEqual(
+            {'board': 'echo/a', 'response': 1, 'status': {'last': {'echo': 1}}},
+            self.request({'board': 'echo/a', 'echo': 1}),
+        )
+
+    def test_hung_board_times_out(self):
+        self.gateway.reply_timeout = 0.2
+
+        replies = self.request([
+            {'board': 'echo/a', 'sleep': 1},
+            {'board': 'echo/b', 'echo': 2},
+        ])
+
+        self.assertEqual('timeout', replies[0]['error']['type'])
+        self.assertEqual(2, replies[1]['response'])
+
+        # The other board's connection carries on as before
+        self.assertEqual(3, self.request({'board': 'echo/b', 'echo': 3})['response'])
+
+    def test_board_not_serving_yet_times_out(self):
+        self.gateway.reply_timeout = 0.2
+        # Bound by the master, but with no runner accepting connections
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.addCleanup(listener.close)
+        listener.bind(str(self.root_dir / 'echo' / 'c'))
+        listener.listen(5)
+
+        replies = self.request([
+            {'board': 'echo/a', 'echo': 1},
+            {'board': 'echo/c', 'echo': 2},
+        ])
+
+        self.assertEqual(1, replies[0]['response'])
+        self.assertEqual('timeout', replies[1]['error']['type'])
+
+    def test_batch(self):
+        replies = self.request([
+            {'board': 'echo/a', 'echo': 1},
+            {'board': 'echo/b', 'echo': 2},
+            {'board': 'echo/a'},
+        ])
+
+        self.assertEqual(
+            [
+                {'board': 'echo/a', 'response': 1, 'status': {'last': {'echo': 1}}},
+                {'board': 'echo/b', 'response': 2, 'status': {'last': {'echo': 2}}},
+                {'board': 'echo/a', 'status': {'last': {'echo': 1}}},
+            ],
+            replies,
+        )
+
+    def test_errors_are_per_message(self):
+        replies = self.request([
+            {'board': 'echo/missing'},
+            {'board': '../echo/a'},
+            {'echo': 1},
+            {'board': 'echo/b', 'echo': 2},
+        ])
+
+        self.assertEqual(
+            ['unavailable', 'invalid-address', 'invalid-address'],
+            [reply['error']['type'] for reply in replies[:3]],
+        )
+        self.assertEqual(2, replies[3]['response'])
@@ -0,0 +1,165 @@
+import json
+import socket
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from robotd.devices_base import Board, NodeSnapshot
+from robotd.host import HostedRunner, RunnerHost
+from robotd.master import MasterProcess
+from robotd.runner import BoardRunner
+
+
+class QuietBoard(Board):
+    board_type_id = 'quiet'
+    enabled = False
+
+    @classmethod
+    def name(cls, node):
+        return node.sys_name
+
+    def command(self, cmd):
+        return cmd.get('echo')
+
+
+class BrokenBoard(QuietBoard):
+    board_type_id = 'broken'
+
+    def start(self):
+        raise RuntimeError('no such board')
+
+
+class SilentHost(RunnerHost):
+    REQUEST_TIMEOUT = 0.1
+
+    def run(self):
+        # Never answers
+        time.sleep(60)
+
+
+def node(name):
+    return NodeSnapshot({}, name, '/sys/' + name, '/devices/' + name)
+
+
+def request(socket_path, command):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(5)
+        sock.connect(str(socket_path))
+        stream = sock.makefile('rwb')
+        stream.readline()
+        stream.write(json.dumps(command).encode('utf-8') + b'\n')
+        stream.flush()
+        return json.loads(stream.readline().decode('utf-8'))
+
+
+class HostTests(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.root_dir = Path(temp_dir.name)
+
+        self.host = RunnerHost()
+        self.host.start()
+        self.addCleanup(self.host.join, 5)
+        self.addCleanup(self.host.stop)
+
+    def start_runner(self, board):
+        runner = HostedRunner(self.host, BoardRunner(board, self.root_dir))
+        runner.bind()
+        runner.start()
+        runner.close_server_socket()
+        return runner
+
+    def test_runners_share_process(self):
+        first = self.start_runner(QuietBoard(node('a')))
+        second = self.start_runner(QuietBoard(node('b')))
+
+        self.assertEqual('a', request(first.socket_path, {'echo': 'a'})['response'])
+        self.assertEqual('b', request(second.socket_path, {'echo': 'b'})['response'])
+        self.assertEqual(self.host.pid, first.pid)
+        self.assertEqual(self.host.pid, second.pid)
+
+    def test_stop_runner(self):
+        first = self.start_runner(QuietBoard(node('a')))
+        second = self.start_runner(QuietBoard(node('b')))
+        self.assertTrue(first.is_alive())
+
+        first.terminate()
+        first.join(5)
+        self.assertFalse(first.is_alive())
+        first.cleanup()
+        self.assertFalse(first.socket_path.exists())
+
+        # The other runner, and the host, carry on
+        self.assertEqual('b', request(second.socket_path, {'echo': 'b'})['response'])
+        self.assertTrue(self.host.is_alive())
+
+    def test_failed_runner(self):
+        runner = self.start_runner(BrokenBoard(node('a')))
+        runner.join(5)
+        self.assertFalse(runner.is_alive())
+        self.assertTrue(self.host.is_alive())
+
+
+class SilentHostTests(unittest.TestCase):
+    def test_host_stopped_when_not_replying(self):
+        host = SilentHost()
+        host.start()
+        self.addCleanup(host.join, 5)
+        self.addCleanup(host.terminate)
+
+        with self.assertRaises(TimeoutError):
+            host.request('alive', 'a')
+
+        self.assertTrue(host.closed)
+        self.assertFalse(host.is_alive())
+
+        runner = HostedRunner(host, mock.Mock())
+        self.assertFalse(runner.is_alive())
+
+
+class MasterHostingTests(unittest.TestCase):
+    def test_hosted_board_types(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+
+        with mock.patch('robotd.master.BOARDS', []):
+            master = MasterProcess(temp_dir.name, hosted_board_types={'quiet'})
+        self.addCleanup(master._executor.shutdown)
+
+        master._reconcile({QuietBoard: [node('a'), node('b')]})
+        self.addCleanup(master._host.join, 5)
+        self.addCleanup(master._host.stop)
+        runners = list(master.runners[QuietBoard].values())
+        self.assertEqual(2, len(runners))
+        for runner in runners:
+            self.assertIsInstance(runner, HostedRunner)
+            self.assertEqual(master._host.pid, runner.pid)
+            self.assertEqual(1, request(runner.socket_path, {'echo': 1})['response'])
+
+        master._reconcile({QuietBoard: []})
+        self.assertEqual({}, master.runners[QuietBoard])
+
+    def test_host_replaced_once_given_up_on(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+
+        with mock.patch('robotd.master.BOARDS', []):
+            master = MasterProcess(temp_dir.name, hosted_board_types={'quiet'})
+        self.addCleanup(master._executor.shutdown)
+
+        with mock.patch('robotd.master.RunnerHost', SilentHost):
+            silent_host = master._runner_host()
+        self.addCleanup(silent_host.join, 5)
+        self.addCleanup(silent_host.terminate)
+        with self.assertRaises(TimeoutError):
+            silent_host.request('alive', 'a')
+
+        host = master._runner_host()
+        self.addCleanup(host.join, 5)
+        self.addCleanup(host.stop)
+        self.assertIsNot(silent_host, host)
+        self.assertFalse(host.closed)
+        self.assertTrue(host.is_alive())
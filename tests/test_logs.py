@@ -0,0 +1,157 @@
+import io
+import logging
+import queue
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from robotd.devices_base import Board
+from robotd.logs import (
+    DroppingQueueHandler,
+    Limit,
+    LogConfig,
+    LogQueue,
+    SamplingFilter,
+    limits_by_logger,
+    start_listener,
+)
+from robotd.runner import BoardRunner
+
+
+class LoggingBoard(Board):
+    board_type_id = 'logging'
+    enabled = False
+
+    @classmethod
+    def name(cls, node):
+        return 'board'
+
+
+def make_record(name, level=logging.DEBUG):
+    return logging.LogRecord(name, level, __file__, 0, 'message', (), None)
+
+
+class SamplingFilterTests(unittest.TestCase):
+    def test_rate_limit(self):
+        drops = []
+        sampling = SamplingFilter(
+            {'robotd': Limit(rate=2)},
+            on_drop=lambda: drops.append(True),
+        )
+
+        with mock.patch('time.monotonic', return_value=100):
+            passed = [sampling.filter(make_record('robotd.runner')) for _ in range(4)]
+        self.assertEqual([True, True, False, False], passed)
+        self.assertEqual(2, len(drops))
+
+        # Each logger has its own allowance
+        with mock.patch('time.monotonic', return_value=100):
+            self.assertTrue(sampling.filter(make_record('robotd.devices')))
+
+        with mock.patch('time.monotonic', return_value=100.5):
+            self.assertTrue(sampling.filter(make_record('robotd.runner')))
+            self.assertFalse(sampling.filter(make_record('robotd.runner')))
+
+    def test_sample(self):
+        sampling = SamplingFilter({'robotd': Limit(sample=0.25)})
+        with mock.patch('random.random', side_effect=[0.1, 0.5]):
+            self.assertTrue(sampling.filter(make_record('robotd.runner')))
+            self.assertFalse(sampling.filter(make_record('robotd.runner')))
+
+    def test_most_specific_limit(self):
+        sampling = SamplingFilter({
+            'robotd': Limit(sample=0),
+            'robotd.devices': Limit(),
+        })
+        self.assertFalse(sampling.filter(make_record('robotd.runner')))
+        self.assertTrue(sampling.filter(make_record('robotd.devices')))
+        self.assertTrue(sampling.filter(make_record('robotd.devices.motor')))
+        self.assertTrue(sampling.filter(make_record('other')))
+
+    def test_info_and_above_always_pass(self):
+        sampling = SamplingFilter({'robotd': Limit(sample=0)})
+        self.assertTrue(sampling.filter(make_record('robotd.runner', logging.INFO)))
+        self.assertTrue(sampling.filter(make_record('robotd.runner', logging.ERROR)))
+
+    def test_limits_by_logger(self):
+        limits = limits_by_logger(
+            rates=[('robotd.runner', 5)],
+            samples=[('robotd.runner', 0.5), ('robotd.devices', 0.1)],
+            defaults={'robotd': Limit(rate=50)},
+        )
+        self.assertEqual({
+            'robotd': Limit(rate=50),
+            'robotd.runner': Limit(sample=0.5, rate=5),
+            'robotd.devices': Limit(sample=0.1),
+        }, limits)
+
+
+class QueueTests(unittest.TestCase):
+    def setUp(self):
+        root = logging.getLogger()
+        handlers = list(root.handlers)
+        level = root.level
+
+        def restore():
+            root.handlers[:] = handlers
+            root.setLevel(level)
+        self.addCleanup(restore)
+
+    def test_log_queue(self):
+        log_queue = LogQueue()
+        record = make_record('robotd.runner', logging.WARNING)
+        record.msg = 'Hello'
+        log_queue.put_nowait(record)
+
+        received = log_queue.get()
+        self.assertEqual('robotd.runner', received.name)
+        self.assertEqual(logging.WARNING, received.levelno)
+        self.assertEqual('Hello', received.getMessage())
+
+        log_queue.put_nowait(None)
+        self.assertIsNone(log_queue.get())
+
+        record.msg = 'x' * LogQueue.MAX_RECORD_SIZE
+        with self.assertRaises(queue.Full):
+            log_queue.put_nowait(record)
+
+    def test_full_queue_drops_records(self):
+        drops = []
+        handler = DroppingQueueHandler(queue.Queue(1), lambda: drops.append(True))
+        handler.handle(make_record('robotd', logging.INFO))
+        handler.handle(make_record('robotd', logging.INFO))
+        self.assertEqual(1, handler.queue.qsize())
+        self.assertEqual(1, len(drops))
+
+    def test_apply(self):
+        log_queue = queue.Queue()
+        LogConfig(log_queue, logging.DEBUG, {'robotd': Limit(sample=0)}).apply()
+
+        logging.getLogger('robotd.runner').debug('Dropped')
+        logging.getLogger('robotd.runner').info('Kept %d', 1)
+
+        record = log_queue.get_nowait()
+        self.assertEqual('Kept 1', record.getMessage())
+        self.assertTrue(log_queue.empty())
+
+    def test_runner_logs_through_master(self):
+        stream = io.StringIO()
+        log_config, listener = start_listener(stream=stream)
+        log_config.apply()
+
+        with tempfile.TemporaryDirectory() as root_dir:
+            runner = BoardRunner(LoggingBoard({}), root_dir, log_config=log_config)
+            runner.start()
+            try:
+                deadline = time.monotonic() + 5
+                while 'Listening on' not in stream.getvalue():
+                    if time.monotonic() > deadline:
+                        self.fail('runner never logged')
+                    time.sleep(0.01)
+            finally:
+                runner.terminate()
+                runner.join()
+                listener.stop()
+
+        self.assertIn('BoardRunner', stream.getvalue())
@@ -0,0 +1,180 @@
+import multiprocessing
+import signal
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from robotd.devices_base import Board, NodeSnapshot
+from robotd.master import MasterProcess
+from robotd.processes import stop_process
+
+
+def _sleep_forever(ignore_sigterm):
+    if ignore_sigterm:
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    while True:
+        time.sleep(1)
+
+
+class StubbornBoard(Board):
+    board_type_id = 'stubborn'
+    enabled = False
+
+    @classmethod
+    def name(cls, node):
+        return node.sys_name
+
+    def start(self):
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+
+
+def node(name):
+    return NodeSnapshot({}, name, '/sys/' + name, '/devices/' + name)
+
+
+class StopProcessTests(unittest.TestCase):
+    def start_process(self, ignore_sigterm):
+        process = multiprocessing.Process(
+            target=_sleep_forever,
+            args=(ignore_sigterm,),
+        )
+        process.start()
+        # Give it a chance to install its signal handler
+        time.sleep(0.1)
+        return process
+
+    def test_terminates(self):
+        process = self.start_process(ignore_sigterm=False)
+
+        self.assertFalse(stop_process(process, 5, 5))
+        self.assertFalse(process.is_alive())
+
+    def test_kills_if_terminate_ignored(self):
+        process = self.start_process(ignore_sigterm=True)
+
+        self.assertTrue(stop_process(process, 0.1, 5))
+        self.assertFalse(process.is_alive())
+
+
+class ReconcileTests(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+
+        with mock.patch('robotd.master.BOARDS', []):
+            self.master = MasterProcess(temp_dir.name)
+        self.master.TERMINATE_TIMEOUT = 0.5
+        self.addCleanup(self.master._executor.shutdown)
+
+    def test_starts_and_stops_concurrently(self):
+        self.master._reconcile({StubbornBoard: [node('a'), node('b')]})
+        self.assertEqual(
+            {'/devices/a', '/devices/b'},
+            set(self.master.runners[StubbornBoard].keys()),
+        )
+        # Let the runners start ignoring SIGTERM
+        time.sleep(0.5)
+
+        start = time.monotonic()
+        self.master._reconcile({StubbornBoard: []})
+        duration = time.monotonic() - start
+
+        self.assertEqual({}, self.master.runners[StubbornBoard])
+        self.assertEqual(set(), self.master.pending_operations)
+        self.assertEqual(2, self.master._killed_runners.value)
+        # Each runner took TERMINATE_TIMEOUT to give up on, but in parallel
+        self.assertLess(duration, 2 * self.master.TERMINATE_TIMEOUT)
+
+    def test_leaves_pending_operations_alone(self):
+        self.master.pending_operations.add((StubbornBoard, '/devices/a'))
+
+        self.master._reconcile({StubbornBoard: [node('a')]})
+
+        self.assertEqual({}, self.master.runners[StubbornBoard])
+
+    def test_liveness_checked_without_lock(self):
+        master = self.master
+        runner = mock.Mock()
+        runner.is_alive.side_effect = lambda: master.runners_lock.locked()
+        master.runners[StubbornBoard]['/devices/a'] = runner
+        master._scan_needed = False
+
+        master._reap_dead_runners()
+
+        self.assertEqual({}, master.runners[StubbornBoard])
+        self.assertTrue(master._scan_needed)
+
+
+class CountingBoard(Board):
+    board_type_id = 'counting'
+    enabled = False
+    lookup_keys = {'subsystem': 'counting'}
+    included_calls = 0
+
+    @classmethod
+    def included(cls, node):
+        cls.included_calls += 1
+        return node.sys_name != 'excluded'
+
+
+def initialized_node(name):
+    snapshot = node(name)
+    snapshot.is_initialized = True
+    return snapshot
+
+
+class TickTests(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+
+        patcher = mock.patch('robotd.master.BOARDS', [CountingBoard])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.context = mock.Mock()
+        self.context.list_devices.return_value = [
+            initialized_node('a'),
+            initialized_node('excluded'),
+        ]
+        udev_events = mock.Mock()
+        udev_events.poll.return_value = None
+        with mock.patch.object(
+            MasterProcess,
+            '_open_udev_events',
+            return_value=udev_events,
+        ):
+            self.master = MasterProcess(temp_dir.name, context=self.context)
+        self.addCleanup(self.master._executor.shutdown)
+        self.master._reconcile = mock.Mock()
+        CountingBoard.included_calls = 0
+
+    def test_included_remembered(self):
+        self.master.udev_events = None
+
+        self.master.tick()
+        self.master.tick()
+
+        self.assertEqual(2, CountingBoard.included_calls)
+        (device_lists,), _ = self.master._reconcile.call_args
+        self.assertEqual(
+            ['/devices/a'],
+            [n.device_path for n in device_lists[CountingBoard]],
+        )
+
+    def test_only_lists_devices_after_events(self):
+        self.master.tick()
+        self.master.tick()
+        self.assertEqual(1, self.context.list_devices.call_count)
+
+        self.master.udev_events.poll.side_effect = ['event', None]
+        self.master.tick()
+        self.assertEqual(2, self.context.list_devices.call_count)
+
+    def test_lists_devices_after_runner_failure(self):
+        self.master.tick()
+        self.master._scan_needed = True
+        self.master.tick()
+
+        self.assertEqual(2, self.context.list_devices.call_count)
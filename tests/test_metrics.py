@@ -0,0 +1,76 @@
+import unittest
+
+from robotd.metrics import Registry, merge_expositions
+
+
+class HistogramTests(unittest.TestCase):
+    def setUp(self):
+        self.histogram = Registry().histogram(
+            'test_seconds',
+            'A test histogram',
+            buckets=(0.1, 1),
+        )
+
+    def test_counts_into_buckets(self):
+        for value in (0.05, 0.1, 0.5, 2):
+            self.histogram.observe(value)
+
+        self.assertEqual([2, 1, 1], self.histogram.counts)
+        self.assertEqual(4, self.histogram.count)
+        self.assertAlmostEqual(2.65, self.histogram.sum)
+
+    def test_time(self):
+        with self.histogram.time():
+            pass
+
+        self.assertEqual(1, self.histogram.counts[0])
+
+
+class RegistryTests(unittest.TestCase):
+    def test_get_or_create(self):
+        registry = Registry()
+        counter = registry.counter('things_total', 'Things')
+        self.assertIs(counter, registry.counter('things_total', 'Things'))
+
+    def test_type_conflict(self):
+        registry = Registry()
+        registry.counter('things', 'Things')
+        with self.assertRaises(ValueError):
+            registry.gauge('things', 'Things')
+
+    def test_render(self):
+        registry = Registry()
+        registry.counter('things_total', 'Things').inc(3)
+        registry.histogram('test_seconds', 'Time', buckets=(1,)).observe(0.5)
+
+        self.assertEqual(
+            '# HELP things_total Things\n'
+            '# TYPE things_total counter\n'
+            'things_total{board="a\\"b"} 3\n'
+            '# HELP test_seconds Time\n'
+            '# TYPE test_seconds histogram\n'
+            'test_seconds_bucket{board="a\\"b",le="1"} 1\n'
+            'test_seconds_bucket{board="a\\"b",le="+Inf"} 1\n'
+            'test_seconds_sum{board="a\\"b"} 0.5\n'
+            'test_seconds_count{board="a\\"b"} 1\n',
+            registry.render(labels={'board': 'a"b'}),
+        )
+
+
+class MergeExpositionsTests(unittest.TestCase):
+    def test_groups_families(self):
+        registry = Registry()
+        registry.counter('things_total', 'Things').inc()
+
+        merged = merge_expositions([
+            registry.render(labels={'board': 'a'}),
+            registry.render(labels={'board': 'b'}),
+        ])
+
+        self.assertEqual(
+            '# HELP things_total Things\n'
+            '# TYPE things_total counter\n'
+            'things_total{board="a"} 1\n'
+            'things_total{board="b"} 1\n',
+            merged,
+        )
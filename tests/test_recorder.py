@@ -0,0 +1,77 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from robotd.recorder import Recorder, RecordKind, is_recording, read_records
+
+
+class RecorderTests(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.path = Path(temp_dir.name) / 'board.rec'
+
+    def recorder(self, **kwargs):
+        recorder = Recorder(self.path, **kwargs)
+        self.addCleanup(recorder.close)
+        return recorder
+
+    def messages(self, path):
+        return [
+            (record.connection, record.kind, record.message)
+            for record in read_records(path)
+        ]
+
+    def test_round_trip(self):
+        recorder = self.recorder()
+        recorder.record(RecordKind.CONNECT, 3)
+        recorder.record_message(RecordKind.COMMAND, 3, {'m0': 0.5})
+        recorder.record(RecordKind.STATUS, 3, b'{"m0": 0.5}')
+
+        self.assertEqual(
+            [
+                (3, RecordKind.CONNECT, None),
+                (3, RecordKind.COMMAND, {'m0': 0.5}),
+                (3, RecordKind.STATUS, {'m0': 0.5}),
+            ],
+            self.messages(self.path),
+        )
+
+    def test_timestamps_increase(self):
+        recorder = self.recorder()
+        for _ in range(3):
+            recorder.record(RecordKind.CONNECT, 0)
+
+        timestamps = [record.timestamp for record in read_records(self.path)]
+        self.assertEqual(sorted(timestamps), timestamps)
+
+    def test_rotates_when_full(self):
+        recorder = self.recorder(max_bytes=200, backups=2)
+        for index in range(20):
+            recorder.record_message(RecordKind.COMMAND, 0, {'n': index})
+
+        current = self.messages(self.path)
+        previous = self.messages(self.path.with_name('board.rec.1'))
+        self.assertEqual({'n': 19}, current[-1][2])
+        self.assertEqual(current[0][2]['n'] - 1, previous[-1][2]['n'])
+        self.assertTrue(self.path.with_name('board.rec.2').exists())
+        self.assertFalse(self.path.with_name('board.rec.3').exists())
+
+    def test_keeps_existing_recording(self):
+        first = self.recorder()
+        first.record(RecordKind.CONNECT, 1)
+        first.close()
+
+        self.recorder().record(RecordKind.CONNECT, 2)
+
+        self.assertEqual(
+            [(1, RecordKind.CONNECT, None)],
+            self.messages(self.path.with_name('board.rec.1')),
+        )
+        self.assertEqual([(2, RecordKind.CONNECT, None)], self.messages(self.path))
+
+    def test_is_recording(self):
+        self.assertTrue(is_recording('motor/ABC.rec'))
+        self.assertTrue(is_recording('motor/ABC.rec.2'))
+        self.assertFalse(is_recording('motor/ABC.metrics'))
+        self.assertFalse(is_recording('motor/ABC'))
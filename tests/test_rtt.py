@@ -0,0 +1,38 @@
+import unittest
+
+from robotd.rtt import RttEstimator
+
+
+class RttEstimatorTests(unittest.TestCase):
+    def setUp(self):
+        self.estimator = RttEstimator(0.2, 0.01, 1)
+
+    def test_initial_timeout(self):
+        self.assertEqual(0.2, self.estimator.timeout)
+
+    def test_first_sample(self):
+        self.estimator.sample(0.04)
+
+        self.assertEqual(0.04, self.estimator.srtt)
+        self.assertAlmostEqual(0.04 + 4 * 0.02, self.estimator.timeout)
+
+    def test_converges_on_steady_link(self):
+        for _ in range(100):
+            self.estimator.sample(0.005)
+
+        self.assertAlmostEqual(0.005, self.estimator.srtt)
+        self.assertEqual(0.01, self.estimator.timeout)
+
+    def test_jitter_raises_timeout(self):
+        for index in range(100):
+            self.estimator.sample(0.005 if index % 2 else 0.025)
+
+        self.assertGreater(self.estimator.timeout, 0.025)
+
+    def test_backoff(self):
+        self.estimator.backoff()
+        self.assertEqual(0.4, self.estimator.timeout)
+
+        for _ in range(5):
+            self.estimator.backoff()
+        self.assertEqual(1, self.estimator.timeout)
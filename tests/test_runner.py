@@ -0,0 +1,299 @@
+import json
+import pstats
+import socket
+import tempfile
+import time
+import tracemalloc
+import unittest
+
+from robotd.devices_base import Board
+from robotd.runner import BoardRunner, SeqpacketConnection, Subscription
+
+
+class TrackingBoard(Board):
+    board_type_id = 'tracking'
+    enabled = False
+    tracks_status_changes = True
+
+    @classmethod
+    def name(cls, node):
+        return 'board'
+
+    def __init__(self, node):
+        super().__init__(node)
+        self.value = 0
+        self.status_calls = 0
+
+    def status(self):
+        self.status_calls += 1
+        return {'value': self.value}
+
+
+class UntrackedBoard(TrackingBoard):
+    tracks_status_changes = False
+
+
+class StatusVersionTests(unittest.TestCase):
+    def runner(self, board):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        return BoardRunner(board, temp_dir.name)
+
+    def test_includes_version(self):
+        runner = self.runner(TrackingBoard({}))
+
+        version, line = runner._current_status()
+
+        self.assertEqual({'value': 0, 'version': version}, json.loads(line.decode()))
+
+    def test_tracking_board_only_fetched_on_change(self):
+        board = TrackingBoard({})
+        runner = self.runner(board)
+
+        version, _ = runner._current_status()
+        self.assertEqual(version, runner._current_status()[0])
+        self.assertEqual(1, board.status_calls)
+
+        board.value = 1
+        board.status_changed()
+
+        new_version, line = runner._current_status()
+        self.assertGreater(new_version, version)
+        self.assertEqual(1, json.loads(line.decode())['value'])
+        self.assertEqual(2, board.status_calls)
+
+    def test_untracked_board_compared(self):
+        board = UntrackedBoard({})
+        runner = self.runner(board)
+
+        version, line = runner._current_status()
+        self.assertEqual((version, line), runner._current_status())
+
+        board.value = 1
+        self.assertGreater(runner._current_status()[0], version)
+
+
+class SubscriptionTests(unittest.TestCase):
+    def test_first_check_pushes_everything(self):
+        subscription = Subscription(['a', 'b', 'missing'], 10, 0)
+
+        self.assertEqual(
+            {'a': 1, 'b': 2},
+            subscription.changes(1, {'a': 1, 'b': 2, 'c': 3}),
+        )
+
+    def test_only_changes_pushed(self):
+        subscription = Subscription(['a', 'b'], 10, 0)
+        subscription.changes(1, {'a': 1, 'b': 2})
+
+        self.assertEqual({}, subscription.changes(1, {'a': 5, 'b': 2}))
+        self.assertEqual({}, subscription.changes(2, {'a': 1, 'b': 2, 'c': 3}))
+        self.assertEqual({'b': 3}, subscription.changes(3, {'a': 1, 'b': 3}))
+
+    def test_values_copied(self):
+        subscription = Subscription(['pins'], 10, 0)
+        pins = {'1': 'H'}
+        subscription.changes(1, {'pins': pins})
+
+        pins['1'] = 'L'
+        self.assertEqual({'pins': {'1': 'L'}}, subscription.changes(2, {'pins': pins}))
+
+    def test_runner_validates(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        runner = BoardRunner(TrackingBoard({}), temp_dir.name)
+
+        for command in (
+            {'subscribe': 'value'},
+            {'subscribe': [1]},
+            {'subscribe': ['value'], 'max-rate': 0},
+            {'subscribe': ['value'], 'max-rate': 'fast'},
+        ):
+            with self.subTest(command=command):
+                response = runner._subscribe('connection', command)
+                self.assertEqual('InvalidSubscription', response['type'])
+
+        self.assertEqual(
+            'ok',
+            runner._subscribe('connection', {'subscribe': ['value']})['status'],
+        )
+        self.assertIn('connection', runner.subscriptions)
+
+        runner._subscribe('connection', {'subscribe': []})
+        self.assertNotIn('connection', runner.subscriptions)
+
+
+class CaptureTests(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.runner = BoardRunner(TrackingBoard({}), temp_dir.name)
+        self.runner.socket_path.parent.mkdir(parents=True, exist_ok=True)
+
+    def test_profile(self):
+        response = self.runner._admin_command({'admin': 'profile', 'seconds': 5})
+        self.assertEqual('ok', response['status'])
+        self.runner._current_status()
+
+        response = self.runner._admin_command({'admin': 'stop-profile'})
+
+        stats = pstats.Stats(response['path'])
+        self.assertTrue(any(
+            function == '_current_status'
+            for _, _, function in stats.stats.keys()
+        ))
+
+    def test_trace_memory_ends_after_seconds(self):
+        self.runner._admin_command({'admin': 'trace-memory', 'seconds': 0.01})
+        self.assertTrue(tracemalloc.is_tracing())
+
+        time.sleep(0.02)
+        self.runner._finish_captures()
+
+        self.assertFalse(tracemalloc.is_tracing())
+        capture = self.runner.captures['trace-memory']
+        self.assertFalse(capture.running)
+        tracemalloc.Snapshot.load(str(capture.path))
+
+    def test_errors(self):
+        for command, error_type in (
+            ({'admin': 'stop-profile'}, 'CaptureNotRunning'),
+            ({'admin': 'profile', 'seconds': -1}, 'InvalidCapture'),
+            ({'admin': ['profile']}, 'UnknownAdminCommand'),
+        ):
+            with self.subTest(command=command):
+                response = self.runner._admin_command(command)
+                self.assertEqual(error_type, response['type'])
+
+        self.runner._admin_command({'admin': 'profile'})
+        self.addCleanup(self.runner._stop_capture, 'profile')
+        response = self.runner._admin_command({'admin': 'profile'})
+        self.assertEqual('CaptureRunning', response['type'])
+
+
+class BindTests(unittest.TestCase):
+    def test_clients_connect_before_start(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        runner = BoardRunner(TrackingBoard({}), temp_dir.name)
+
+        runner.bind()
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.addCleanup(client.close)
+        client.connect(str(runner.socket_path))
+
+        runner.start()
+        runner.close_server_socket()
+        self.addCleanup(runner.join)
+        self.addCleanup(runner.terminate)
+
+        client.settimeout(5)
+        greeting = json.loads(client.makefile('rb').readline().decode('utf-8'))
+        self.assertEqual(0, greeting['value'])
+
+
+class SeqpacketTests(unittest.TestCase):
+    def test_oversized_message_answered_in_turn(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        runner = BoardRunner(TrackingBoard({}), temp_dir.name, seqpacket=True)
+        runner.start()
+        self.addCleanup(runner.join)
+        self.addCleanup(runner.terminate)
+
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        self.addCleanup(client.close)
+        client.settimeout(5)
+        deadline = time.monotonic() + 5
+        while True:
+            try:
+                client.connect(str(runner.seqpacket_path))
+                break
+            except (FileNotFoundError, ConnectionRefusedError):
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.01)
+
+        def receive():
+            return json.loads(client.recv(65536).decode('utf-8'))
+
+        receive()  # greeting
+        client.send(b' ' * (SeqpacketConnection.MAX_MESSAGE_SIZE + 1))
+        client.send(b'{"admin": "connections"}')
+
+        self.assertEqual('MessageTooLong', receive()['response']['type'])
+        self.assertIn('version', receive())
+        self.assertEqual('ok', receive()['response']['status'])
+        self.assertIn('version', receive())
+
+
+class ConditionalPollTests(unittest.TestCase):
+    def test_command_with_if_newer_than_rejected(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        runner = BoardRunner(TrackingBoard({}), temp_dir.name)
+        runner.bind()
+        runner.start()
+        runner.close_server_socket()
+        self.addCleanup(runner.join)
+        self.addCleanup(runner.terminate)
+
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.addCleanup(client.close)
+        client.settimeout(5)
+        client.connect(str(runner.socket_path))
+        stream = client.makefile('rwb')
+        self.addCleanup(stream.close)
+
+        def receive():
+            return json.loads(stream.readline().decode('utf-8'))
+
+        version = receive()['version']
+        stream.write(json.dumps({'value': 1, 'if-newer-than': version}).encode())
+        stream.write(b'\n')
+        stream.flush()
+
+        self.assertEqual('InvalidCommand', receive()['response']['type'])
+        self.assertEqual({'version': version, 'not-modified': True}, receive())
+
+
+class IdleBoard(TrackingBoard):
+    tick_rate = 10
+
+    def __init__(self, node):
+        super().__init__(node)
+        self.active = False
+        self.ticks = 0
+
+    def wants_tick(self):
+        return self.active
+
+    def tick(self, now):
+        self.ticks += 1
+
+
+class IdleTickTests(unittest.TestCase):
+    def test_idle_board_not_ticked(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        board = IdleBoard({})
+        runner = BoardRunner(board, temp_dir.name)
+        runner.ticker.start(time.monotonic())
+
+        time.sleep(0.25)
+        runner._run_tick()
+        self.assertEqual(0, board.ticks)
+        self.assertFalse(runner.ticker.running)
+
+        # Starts a period after there's something to do, having missed
+        # nothing meanwhile
+        board.active = True
+        runner._run_tick()
+        self.assertEqual(0, board.ticks)
+        time.sleep(0.12)
+        runner._run_tick()
+        self.assertEqual(1, board.ticks)
+        self.assertEqual(
+            0,
+            board.metrics.counter('robotd_tick_missed_deadlines_total', '').value,
+        )
@@ -0,0 +1,156 @@
+import unittest
+
+from robotd.devices_base import Board, Priority, merge_setpoints
+from robotd.metrics import Registry
+from robotd.scheduler import CommandScheduler, TickScheduler
+
+
+class FakeBoard(Board):
+    enabled = False
+
+    def command_priority(self, cmd):
+        if cmd.get('speed') == 'brake':
+            return Priority.SAFETY
+        if 'read' in cmd:
+            return Priority.BULK
+        return Priority.NORMAL
+
+    def coalesce_commands(self, older, newer):
+        if older.keys() == newer.keys() == {'speed'}:
+            return merge_setpoints(older, newer)
+        return None
+
+
+class CommandSchedulerTests(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = CommandScheduler(FakeBoard({}), Registry())
+
+    def test_empty(self):
+        self.assertFalse(self.scheduler)
+        self.assertIsNone(self.scheduler.pop())
+
+    def test_fifo_per_connection(self):
+        self.scheduler.add('a', {'read': 1})
+        self.scheduler.add('a', {'speed': 'brake'})
+
+        self.assertEqual(('a', {'read': 1}, 1), self.scheduler.pop())
+        self.assertEqual(('a', {'speed': 'brake'}, 1), self.scheduler.pop())
+
+    def test_priority_between_connections(self):
+        self.scheduler.add('a', {'read': 1})
+        self.scheduler.add('b', {'other': 1})
+        self.scheduler.add('c', {'speed': 'brake'})
+
+        self.assertEqual(
+            ['c', 'b', 'a'],
+            [self.scheduler.pop()[0] for _ in range(3)],
+        )
+
+    def test_arrival_order_within_priority(self):
+        self.scheduler.add('b', {'other': 1})
+        self.scheduler.add('a', {'other': 2})
+
+        self.assertEqual('b', self.scheduler.pop()[0])
+
+    def test_coalesces_setpoints(self):
+        self.scheduler.add('a', {'speed': 1})
+        self.scheduler.add('a', {'speed': 2})
+        self.scheduler.add('a', {'speed': 3})
+
+        self.assertEqual(('a', {'speed': 3}, 3), self.scheduler.pop())
+        self.assertIsNone(self.scheduler.pop())
+
+    def test_only_coalesces_with_tail(self):
+        self.scheduler.add('a', {'speed': 1})
+        self.scheduler.add('a', {'read': 1})
+        self.scheduler.add('a', {'speed': 2})
+
+        self.assertEqual(3, self.scheduler.depth('a'))
+        self.assertEqual(3, self.scheduler.max_depth('a'))
+
+    def test_coalesces_polls(self):
+        self.scheduler.add('a', {})
+        self.scheduler.add('a', {})
+
+        self.assertEqual(('a', {}, 2), self.scheduler.pop())
+
+    def test_coalesces_identical_conditional_polls(self):
+        self.scheduler.add('a', {'if-newer-than': 3})
+        self.scheduler.add('a', {'if-newer-than': 3})
+        self.scheduler.add('a', {'if-newer-than': 4})
+        self.scheduler.add('a', {})
+
+        self.assertEqual(('a', {'if-newer-than': 3}, 2), self.scheduler.pop())
+        self.assertEqual(('a', {'if-newer-than': 4}, 1), self.scheduler.pop())
+        self.assertEqual(('a', {}, 1), self.scheduler.pop())
+
+    def test_never_coalesces_polls_with_commands(self):
+        self.scheduler.add('a', {'speed': 1})
+        self.scheduler.add('a', {'if-newer-than': 3})
+
+        self.assertEqual(2, self.scheduler.depth('a'))
+
+    def test_conditional_poll_with_command_is_not_a_poll(self):
+        self.scheduler.add('a', {'if-newer-than': 3})
+        self.scheduler.add('a', {'if-newer-than': 3, 'speed': 1})
+
+        self.assertEqual(2, self.scheduler.depth('a'))
+
+    def test_never_coalesces_admin(self):
+        self.scheduler.add('a', {'admin': 'connections'})
+        self.scheduler.add('a', {'admin': 'connections'})
+
+        self.assertEqual(2, self.scheduler.depth('a'))
+
+    def test_never_coalesces_subscriptions(self):
+        self.scheduler.add('a', {'subscribe': ['speed']})
+        self.scheduler.add('a', {'speed': 1})
+
+        self.assertEqual(2, self.scheduler.depth('a'))
+
+    def test_remove(self):
+        self.scheduler.add('a', {'speed': 1})
+        self.scheduler.remove('a')
+
+        self.assertFalse(self.scheduler)
+
+
+class TickSchedulerTests(unittest.TestCase):
+    def setUp(self):
+        self.metrics = Registry()
+        self.ticker = TickScheduler(10, self.metrics)
+        self.ticker.start(100)
+
+    def missed(self):
+        return self.metrics.counter('robotd_tick_missed_deadlines_total', '').value
+
+    def test_first_tick_after_one_period(self):
+        self.assertFalse(self.ticker.due(100.05))
+        self.assertAlmostEqual(0.05, self.ticker.timeout(100.05))
+        self.assertTrue(self.ticker.due(100.1))
+
+    def test_deadlines_do_not_drift(self):
+        self.ticker.advance(100.13)
+
+        self.assertAlmostEqual(100.2, self.ticker.next_deadline)
+        self.assertEqual(0, self.missed())
+
+    def test_timeout_never_negative(self):
+        self.assertEqual(0, self.ticker.timeout(101))
+
+    def test_skips_missed_deadlines(self):
+        self.ticker.advance(100.35)
+
+        self.assertAlmostEqual(100.4, self.ticker.next_deadline)
+        self.assertEqual(2, self.missed())
+
+        lateness = self.metrics.histogram('robotd_tick_lateness_seconds', '')
+        self.assertEqual(1, lateness.count)
+
+
+class MergeSetpointsTests(unittest.TestCase):
+    def test_merges_nested(self):
+        self.assertEqual(
+            {'servos': {'0': 1, '1': 0.5}},
+            merge_setpoints({'servos': {'0': 0, '1': 0.5}}, {'servos': {'0': 1}}),
+        )
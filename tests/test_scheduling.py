@@ -0,0 +1,73 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from robotd.devices_base import Board
+from robotd.runner import BoardRunner
+from robotd.scheduling import Scheduling, parse_cpus, scheduling_by_board_type
+
+
+class ExampleBoard(Board):
+    board_type_id = 'example'
+    enabled = False
+
+    @classmethod
+    def name(cls, node):
+        return 'board'
+
+
+class SchedulingTests(unittest.TestCase):
+    def test_parse_cpus(self):
+        self.assertEqual({0}, parse_cpus('0'))
+        self.assertEqual({0, 2, 3, 4}, parse_cpus('0,2-4'))
+        for text in ('', 'a', '3-1', '-1'):
+            with self.subTest(text=text):
+                with self.assertRaises(ValueError):
+                    parse_cpus(text)
+
+    def test_by_board_type(self):
+        scheduling = scheduling_by_board_type(
+            cpus=[('motor', {2})],
+            nice=[('camera', 10)],
+            realtime_priority=[('motor', 50)],
+        )
+        self.assertEqual({
+            'motor': Scheduling(cpus={2}, realtime_priority=50),
+            'camera': Scheduling(nice=10),
+        }, scheduling)
+
+    def test_runner_takes_its_board_types_settings(self):
+        with tempfile.TemporaryDirectory() as root_dir:
+            runner = BoardRunner(ExampleBoard({}), root_dir, scheduling={
+                'example': Scheduling(nice=5),
+                'other': Scheduling(nice=10),
+            })
+            self.assertEqual(Scheduling(nice=5), runner.scheduling)
+
+            runner = BoardRunner(ExampleBoard({}), root_dir)
+            self.assertEqual(Scheduling(), runner.scheduling)
+
+    @mock.patch('os.sched_setscheduler')
+    @mock.patch('os.setpriority')
+    @mock.patch('os.sched_setaffinity')
+    def test_apply(self, sched_setaffinity, setpriority, sched_setscheduler):
+        Scheduling(cpus={1}, nice=-5, realtime_priority=20).apply()
+
+        sched_setaffinity.assert_called_once_with(0, {1})
+        setpriority.assert_called_once_with(os.PRIO_PROCESS, 0, -5)
+        (_, policy, param), _ = sched_setscheduler.call_args
+        self.assertEqual(os.SCHED_FIFO, policy)
+        self.assertEqual(20, param.sched_priority)
+
+    @mock.patch('os.sched_setaffinity')
+    def test_apply_nothing(self, sched_setaffinity):
+        Scheduling().apply()
+        sched_setaffinity.assert_not_called()
+
+    @mock.patch('os.sched_setaffinity')
+    @mock.patch('os.sched_setscheduler', side_effect=PermissionError)
+    def test_unprivileged(self, sched_setscheduler, sched_setaffinity):
+        with self.assertLogs('robotd.scheduling', 'WARNING'):
+            Scheduling(cpus={0}, realtime_priority=20).apply()
+        sched_setaffinity.assert_called_once_with(0, {0})
@@ -0,0 +1,204 @@
+import json
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from robotd.devices_base import Board
+from robotd.runner import BoardRunner
+from robotd.status_page import (
+    StatusPage,
+    StatusPageBusy,
+    StatusPageReader,
+    open_status_pages,
+)
+
+
+class CountingBoard(Board):
+    board_type_id = 'counting'
+    enabled = False
+    tick_rate = 100
+
+    @classmethod
+    def name(cls, node):
+        return 'board'
+
+    def start(self):
+        self.ticks = 0
+
+    def tick(self, now):
+        self.ticks += 1
+
+    def status(self):
+        return {'ticks': self.ticks}
+
+
+class CallCountingBoard(Board):
+    board_type_id = 'call-counting'
+    enabled = False
+
+    @classmethod
+    def name(cls, node):
+        return 'board'
+
+    def start(self):
+        self.calls = 0
+
+    def status(self):
+        # A new status every time it's asked for
+        self.calls += 1
+        return {'calls': self.calls}
+
+
+class StatusPageTests(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.root_dir = Path(temp_dir.name)
+        self.path = self.root_dir / 'board.status'
+
+    def page(self, **kwargs):
+        page = StatusPage(self.path, **kwargs)
+        self.addCleanup(page.close)
+        return page
+
+    def reader(self):
+        reader = StatusPageReader(self.path)
+        self.addCleanup(reader.close)
+        return reader
+
+    def publish(self, page, version, status):
+        page.publish(version, json.dumps(status).encode('utf-8'))
+
+    def test_nothing_published(self):
+        self.page()
+        self.assertEqual((0, None), self.reader().read())
+
+    def test_round_trip(self):
+        page = self.page()
+        reader = self.reader()
+
+        self.publish(page, 3, {'m0': 0.5})
+        self.assertEqual((3, {'m0': 0.5}), reader.read())
+        self.assertEqual(3, reader.version())
+
+        self.publish(page, 4, {})
+        self.assertEqual((4, {}), reader.read())
+
+    def test_if_newer_than(self):
+        page = self.page()
+        reader = self.reader()
+        self.publish(page, 3, {'m0': 0.5})
+
+        self.assertIsNone(reader.read(if_newer_than=3))
+        self.assertEqual((3, {'m0': 0.5}), reader.read(if_newer_than=2))
+
+    def test_grows(self):
+        page = self.page(size=64)
+        reader = self.reader()
+
+        status = {'markers': ['x' * 100] * 10}
+        self.publish(page, 1, status)
+
+        self.assertEqual((1, status), reader.read())
+
+    @mock.patch.object(StatusPageReader, 'REPLACED_CHECK_INTERVAL', 0)
+    def test_replaced_by_restarted_runner(self):
+        page = self.page()
+        reader = self.reader()
+        self.publish(page, 5, {'m0': 0.5})
+        self.assertEqual((5, {'m0': 0.5}), reader.read())
+
+        # Stopped and cleaned up, then started again
+        page.close()
+        self.path.unlink()
+        self.assertEqual((5, {'m0': 0.5}), reader.read())
+        page = self.page()
+        self.publish(page, 1, {'m0': 0})
+
+        self.assertEqual((1, {'m0': 0}), reader.read())
+
+        # Or started again without being cleaned up
+        page = self.page()
+        self.publish(page, 1, {'m0': 1})
+
+        self.assertEqual((1, {'m0': 1}), reader.read())
+
+    def test_busy_while_writing(self):
+        page = self.page()
+        reader = self.reader()
+
+        # Leave the sequence number odd, as if the writer had stopped halfway
+        page._sequence += 1
+        page._map[8:16] = page._sequence.to_bytes(8, 'little')
+
+        with self.assertRaises(StatusPageBusy):
+            reader.read(attempts=10)
+
+    def test_not_a_status_page(self):
+        self.path.write_bytes(b'\0' * 64)
+
+        with self.assertRaises(ValueError):
+            StatusPageReader(self.path)
+
+    def test_published_by_runner(self):
+        runner = BoardRunner(CountingBoard({}), self.root_dir)
+        runner.start()
+        self.addCleanup(runner.join)
+        self.addCleanup(runner.terminate)
+
+        page = self.wait_for_page('counting/board')
+        version, status = page.read()
+        time.sleep(0.3)
+        new_version, new_status = page.read()
+
+        self.assertGreater(new_version, version)
+        self.assertGreater(new_status['ticks'], status['ticks'])
+        self.assertEqual(new_version, new_status['version'])
+
+    def wait_for_page(self, name):
+        deadline = time.monotonic() + 5
+        while True:
+            page = open_status_pages(self.root_dir).get(name)
+            if page is not None:
+                self.addCleanup(page.close)
+                if page.version():
+                    return page
+            if time.monotonic() > deadline:
+                self.fail('The runner never published its status')
+            time.sleep(0.01)
+
+    def test_untracked_board_polled_without_clients(self):
+        runner = BoardRunner(
+            CallCountingBoard({}),
+            self.root_dir,
+            status_page_interval=0.05,
+        )
+        runner.start()
+        self.addCleanup(runner.join)
+        self.addCleanup(runner.terminate)
+
+        page = self.wait_for_page('call-counting/board')
+        version, _ = page.read()
+        time.sleep(0.3)
+
+        new_version, status = page.read()
+        self.assertGreater(new_version, version)
+        self.assertEqual(new_version, status['version'])
+
+    def test_idle_runner_does_not_poll(self):
+        runner = BoardRunner(
+            CallCountingBoard({}),
+            self.root_dir,
+            status_page_interval=None,
+        )
+        runner.start()
+        self.addCleanup(runner.join)
+        self.addCleanup(runner.terminate)
+
+        page = self.wait_for_page('call-counting/board')
+        version, _ = page.read()
+        time.sleep(0.3)
+
+        self.assertEqual(version, page.read()[0])
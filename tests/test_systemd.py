@@ -0,0 +1,39 @@
+import os
+import socket
+import tempfile
+import unittest
+from unittest import mock
+
+from robotd.systemd import notify, process_age
+
+
+class NotifyTests(unittest.TestCase):
+    def test_notify(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        path = os.path.join(temp_dir.name, 'notify')
+
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as receiver:
+            receiver.bind(path)
+            with mock.patch.dict(os.environ, {'NOTIFY_SOCKET': path}):
+                self.assertTrue(notify('READY=1', 'STATUS=Ready'))
+            self.assertEqual(b'READY=1\nSTATUS=Ready', receiver.recv(4096))
+
+    def test_abstract_address(self):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as receiver:
+            receiver.bind('\0robotd-test-notify-{}'.format(os.getpid()))
+            with mock.patch.dict(os.environ, {
+                'NOTIFY_SOCKET': '@robotd-test-notify-{}'.format(os.getpid()),
+            }):
+                notify('READY=1')
+            self.assertEqual(b'READY=1', receiver.recv(4096))
+
+    def test_not_under_systemd(self):
+        with mock.patch.dict(os.environ):
+            os.environ.pop('NOTIFY_SOCKET', None)
+            self.assertFalse(notify('READY=1'))
+
+    def test_process_age(self):
+        age = process_age()
+        self.assertGreaterEqual(age, 0)
+        self.assertLess(age, 24 * 60 * 60)
@@ -0,0 +1,62 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from robotd.tracing import Tracer
+
+
+class TracerTests(unittest.TestCase):
+    def test_records_spans(self):
+        tracer = Tracer(size=4)
+        with tracer.span('command', args={'m0': 1}):
+            pass
+
+        (event,) = tracer.events()
+        name, start, duration, _, args = event
+        self.assertEqual('command', name)
+        self.assertGreaterEqual(duration, 0)
+        self.assertEqual({'m0': 1}, args)
+
+    def test_ring_buffer_keeps_newest(self):
+        tracer = Tracer(size=3)
+        for index in range(5):
+            tracer.record(str(index), index, 0)
+
+        self.assertEqual(
+            ['2', '3', '4'],
+            [event[0] for event in tracer.events()],
+        )
+
+    def test_disabled(self):
+        tracer = Tracer()
+        tracer.enabled = False
+        with tracer.span('command'):
+            pass
+
+        self.assertEqual([], tracer.events())
+
+    def test_chrome_trace(self):
+        tracer = Tracer(size=2)
+        for index in range(3):
+            tracer.record('status', index, 0.5)
+
+        trace = tracer.chrome_trace(process_name='robotd test')
+        metadata, *events = trace['traceEvents']
+
+        self.assertEqual('M', metadata['ph'])
+        self.assertEqual({'name': 'robotd test'}, metadata['args'])
+        self.assertEqual([1e6, 2e6], [event['ts'] for event in events])
+        self.assertEqual([5e5, 5e5], [event['dur'] for event in events])
+        self.assertEqual(1, trace['otherData']['dropped'])
+
+    def test_dump(self):
+        tracer = Tracer()
+        tracer.record('select', 0, 1)
+
+        with tempfile.TemporaryDirectory() as tempdir:
+            path = Path(tempdir) / 'trace.json'
+            tracer.dump(path)
+            trace = json.loads(path.read_text())
+
+        self.assertEqual('select', trace['traceEvents'][0]['name'])
@@ -0,0 +1,52 @@
+import unittest
+
+from robotd.trajectory import InvalidTrajectory, Trajectory
+
+
+class TrajectoryTests(unittest.TestCase):
+    def test_interpolates_between_points(self):
+        trajectory = Trajectory([[0, 0], [1, 1], [2, -1]])
+
+        self.assertEqual(0, trajectory.speed_at(0))
+        self.assertAlmostEqual(0.5, trajectory.speed_at(0.5))
+        self.assertAlmostEqual(0, trajectory.speed_at(1.5))
+        self.assertEqual(2, trajectory.duration)
+
+    def test_holds_ends(self):
+        trajectory = Trajectory([[0.5, 0.2], [1, 0.4]])
+
+        self.assertEqual(0.2, trajectory.speed_at(0))
+        self.assertEqual(0.4, trajectory.speed_at(10))
+
+    def test_step(self):
+        trajectory = Trajectory([[0, 0], [1, 0], [1, 1]])
+
+        self.assertEqual(0, trajectory.speed_at(0.99))
+        self.assertEqual(1, trajectory.speed_at(1))
+
+    def test_ramp(self):
+        trajectory = Trajectory.from_spec({'to': 1, 'duration': 2}, initial_speed=0.5)
+
+        self.assertEqual(0.5, trajectory.speed_at(0))
+        self.assertAlmostEqual(0.75, trajectory.speed_at(1))
+        self.assertEqual(1, trajectory.speed_at(2))
+
+    def test_ramp_from(self):
+        trajectory = Trajectory.from_spec({'from': -1, 'to': 1, 'duration': 2})
+
+        self.assertEqual(-1, trajectory.speed_at(0))
+
+    def test_invalid(self):
+        for spec in (
+            [],
+            [[0, 2]],
+            [[1, 0], [0, 0]],
+            [[-1, 0]],
+            [[0, 'brake']],
+            [0.5],
+            {'to': 1},
+            'fast',
+        ):
+            with self.subTest(spec=spec):
+                with self.assertRaises(InvalidTrajectory):
+                    Trajectory.from_spec(spec)